@@ -1,22 +1,69 @@
 from flask import Flask
 from flask_migrate import Migrate
+from werkzeug.middleware.proxy_fix import ProxyFix
 import logging_config  # to setup logging
 
 from config import Config
 from models import db  # Import the db instance
-from routes import company, search, info
+from routes import company, companies, search, info, metrics, export, jobs, autocomplete, peers
+from utils import metrics as app_metrics
+from utils import timing
+from utils import database
+from utils import admission
+from utils import rate_limit
+from utils import deadline
+from services import peer_stats, write_behind
+from commands import snapshot, backfill, peers as peers_cli
 
 app = Flask(__name__)
 app.config.from_object(Config)
 
+# Client IPs (rate limiting, logs) from X-Forwarded-For when behind trusted proxies
+if app.config['TRUSTED_PROXY_COUNT']:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['TRUSTED_PROXY_COUNT'])
+
 # Initialize extensions
 db.init_app(app)
+database.init_app(app, db)  # SQLite pragmas / write queue when enabled
 migrate = Migrate(app, db) # Initialize Flask-Migrate
 
 # Register Blueprints for modular routes
 app.register_blueprint(company.bp)
 app.register_blueprint(search.bp)
 app.register_blueprint(info.bp)
+app.register_blueprint(export.bp)
+app.register_blueprint(companies.bp)
+app.register_blueprint(jobs.bp)
+app.register_blueprint(autocomplete.bp)
+app.register_blueprint(peers.bp)
+
+# Request, upstream and DB metrics exposed at /metrics
+if app.config['METRICS_ENABLED']:
+    app_metrics.init_app(app)
+    app.register_blueprint(metrics.bp)
+
+# Per-request deadline shared by every upstream call (504 / stale data when it runs out)
+deadline.init_app(app)
+
+# Early 503s when too many requests are waiting on upstream
+admission.init_app(app)
+
+# Server-Timing headers and guarded per-request profiling
+timing.init_app(app)
+
+# Per-client token-bucket rate limits (RATE_LIMIT_ENABLED)
+rate_limit.init_app(app)
+
+# Search-cache rows written in background batches (SEARCH_CACHE_WRITE_BEHIND)
+write_behind.init_app(app)
+
+# Sector/industry peer statistics recomputed in the background after saves
+peer_stats.init_app(app)
+
+# CLI commands (flask snapshot ..., flask backfill ..., flask peers ...)
+app.cli.add_command(snapshot.cli)
+app.cli.add_command(backfill.cli)
+app.cli.add_command(peers_cli.cli)
 
 if __name__ == "__main__":
     app.logger.info("🇺🇸 US Company Data API Starting...")
@@ -0,0 +1,122 @@
+"""
+Tiny in-memory Redis-protocol server for exercising ``CACHE_BACKEND=redis`` locally.
+
+Supports PING, AUTH, SELECT, GET, SET (with EX/PX), MGET, DEL, EXPIRE, TTL,
+INCR, INCRBY and FLUSHALL, which covers everything the app sends.
+
+    python -m benchmarks.fake_redis --port 6390
+    CACHE_BACKEND=redis CACHE_REDIS_URL=redis://127.0.0.1:6390/0 flask run
+"""
+import argparse
+import socketserver
+import threading
+import time
+
+_store = {}
+_lock = threading.Lock()
+
+
+def _get_live(key, now):
+    entry = _store.get(key)
+    if entry is None:
+        return None
+    value, expires_at = entry
+    if expires_at is not None and expires_at <= now:
+        del _store[key]
+        return None
+    return entry
+
+
+def _bulk(value):
+    if value is None:
+        return b'$-1\r\n'
+    return b'$%d\r\n%s\r\n' % (len(value), value)
+
+
+def handle_command(args):
+    command = args[0].upper()
+    now = time.monotonic()
+    with _lock:
+        if command == b'PING':
+            return b'+PONG\r\n'
+        if command in (b'AUTH', b'SELECT'):
+            return b'+OK\r\n'
+        if command == b'GET':
+            entry = _get_live(args[1], now)
+            return _bulk(entry[0] if entry else None)
+        if command == b'MGET':
+            values = [_get_live(key, now) for key in args[1:]]
+            return b'*%d\r\n' % len(values) + b''.join(_bulk(v[0] if v else None) for v in values)
+        if command == b'SET':
+            expires_at = None
+            options = [a.upper() for a in args[3:]]
+            if b'EX' in options:
+                expires_at = now + int(args[3 + options.index(b'EX') + 1])
+            elif b'PX' in options:
+                expires_at = now + int(args[3 + options.index(b'PX') + 1]) / 1000.0
+            _store[args[1]] = (args[2], expires_at)
+            return b'+OK\r\n'
+        if command == b'DEL':
+            removed = sum(1 for key in args[1:] if _store.pop(key, None) is not None)
+            return b':%d\r\n' % removed
+        if command == b'EXPIRE':
+            entry = _get_live(args[1], now)
+            if not entry:
+                return b':0\r\n'
+            _store[args[1]] = (entry[0], now + int(args[2]))
+            return b':1\r\n'
+        if command == b'TTL':
+            entry = _get_live(args[1], now)
+            if not entry:
+                return b':-2\r\n'
+            return b':%d\r\n' % (-1 if entry[1] is None else int(entry[1] - now))
+        if command in (b'INCR', b'INCRBY'):
+            entry = _get_live(args[1], now)
+            amount = int(args[2]) if command == b'INCRBY' else 1
+            value = (int(entry[0]) if entry else 0) + amount
+            _store[args[1]] = (str(value).encode(), entry[1] if entry else None)
+            return b':%d\r\n' % value
+        if command == b'FLUSHALL':
+            _store.clear()
+            return b'+OK\r\n'
+    return b'-ERR unknown command %s\r\n' % command
+
+
+class RESPHandler(socketserver.StreamRequestHandler):
+    def _read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b'*'):
+            return line.split()
+        args = []
+        for _ in range(int(line[1:-2])):
+            length = int(self.rfile.readline()[1:-2])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def handle(self):
+        while True:
+            args = self._read_command()
+            if args is None:
+                return
+            if args:
+                self.wfile.write(handle_command(args))
+
+
+class ThreadedServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=6390)
+    args = parser.parse_args(argv)
+    with ThreadedServer((args.host, args.port), RESPHandler) as server:
+        server.serve_forever()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,207 @@
+"""
+Local HTTP stand-in for the US data provider.
+
+Implements the endpoints ``USCompanyAPI`` calls (``/search``, ``/profile/<symbols>``,
+``/quote/<symbols>`` (comma-separated), ``/income-statement/<symbol>``, ``/balance-sheet-statement/<symbol>``
+and ``/stock/list``) under any path prefix, so it is selected purely by pointing
+``API_BASE_URL_US`` at it:
+
+    python -m benchmarks.fake_upstream --port 8081 --latency lognormal:4.5,0.6 --error-rate 0.02
+    API_BASE_URL_US=http://127.0.0.1:8081/api/v3 flask run
+
+Modes:
+  synthetic  deterministic generated payloads (default, never touches the network)
+  record     proxy to --target, save every response as a cassette and return it
+  replay     serve cassettes only; unknown requests return 404 (or synthetic data with --fallback)
+
+Latency specs are in milliseconds: ``fixed:50``, ``uniform:20,200``, ``normal:100,30``,
+``exponential:80`` or ``lognormal:mu,sigma`` (parameters of the underlying normal, in log-ms).
+Live call counts are available at ``GET /_stub/stats``.
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import threading
+import time
+from collections import Counter
+
+import requests
+from flask import Flask, jsonify, request
+
+from benchmarks import payloads
+
+CASSETTE_DIR = os.path.join(os.path.dirname(__file__), 'cassettes')
+ENDPOINTS = ('search', 'profile', 'quote', 'income-statement', 'balance-sheet-statement', 'stock')
+
+
+def parse_latency(spec):
+    """Turns a latency spec into a zero-argument callable returning seconds."""
+    if not spec:
+        return lambda: 0.0
+    kind, _, raw = spec.partition(':')
+    args = [float(a) for a in raw.split(',') if a]
+    samplers = {
+        'fixed': lambda: args[0],
+        'uniform': lambda: random.uniform(args[0], args[1]),
+        'normal': lambda: random.gauss(args[0], args[1]),
+        'exponential': lambda: random.expovariate(1.0 / args[0]),
+        'lognormal': lambda: random.lognormvariate(args[0], args[1]),
+    }
+    if kind not in samplers:
+        raise ValueError(f"Unknown latency distribution: {kind}")
+    sampler = samplers[kind]
+    return lambda: max(sampler(), 0.0) / 1000.0
+
+
+def split_endpoint(path):
+    """Returns (endpoint, argument) for a provider path regardless of its prefix."""
+    parts = [p for p in path.split('/') if p]
+    if parts and parts[-1] == 'search':
+        return 'search', None
+    if len(parts) >= 2 and parts[-2] in ENDPOINTS:
+        return parts[-2], parts[-1]
+    return None, None
+
+
+def cassette_name(endpoint, arg, params):
+    key_params = sorted((k, v) for k, v in params.items() if k != 'apikey')
+    digest = hashlib.sha1(json.dumps([endpoint, arg, key_params]).encode('utf-8')).hexdigest()[:12]
+    label = re.sub(r'[^A-Za-z0-9_.-]+', '_', f"{endpoint}-{arg or params.get('query', '')}")[:60]
+    return f"{label}-{digest}.json"
+
+
+def synthetic_response(endpoint, arg, params):
+    limit = int(params.get('limit', 5))
+    if endpoint == 'search':
+        return 200, payloads.search_payload(params.get('query', ''), int(params.get('limit', 10)))
+    if endpoint == 'profile':
+        return 200, [p for s in arg.split(',') for p in payloads.profile_payload(s)]
+    if endpoint == 'quote':
+        return 200, [q for s in arg.split(',') for q in payloads.quote_payload(s)]
+    if endpoint == 'stock':
+        return 200, payloads.stock_list_payload()
+    if endpoint == 'income-statement':
+        return 200, payloads.income_payload(arg, limit)
+    return 200, payloads.balance_payload(arg, limit)
+
+
+def create_app(mode='synthetic', cassette_dir=CASSETTE_DIR, target=None, api_key=None, latency=None,
+               error_rate=0.0, rate_limit_rate=0.0, timeout_rate=0.0, timeout_seconds=15.0,
+               fallback=False, seed=None):
+    if seed is not None:
+        random.seed(seed)
+    if mode == 'record' and not target:
+        raise ValueError('record mode needs --target')
+    if mode == 'record':
+        os.makedirs(cassette_dir, exist_ok=True)
+
+    sample_latency = parse_latency(latency)
+    stats = Counter()
+    stats_lock = threading.Lock()
+    app = Flask(__name__)
+
+    def count(key):
+        with stats_lock:
+            stats[key] += 1
+
+    def load_cassette(name):
+        path = os.path.join(cassette_dir, name)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def record(endpoint, arg, path, params, name):
+        upstream_params = dict(params)
+        if api_key:
+            upstream_params['apikey'] = api_key
+        url = f"{target.rstrip('/')}/{endpoint}" + (f"/{arg}" if arg else '')
+        upstream = requests.get(url, params=upstream_params, timeout=30)
+        body = upstream.json()
+        cassette = {'request': {'endpoint': endpoint, 'path': path, 'params': params},
+                    'status': upstream.status_code, 'body': body}
+        with open(os.path.join(cassette_dir, name), 'w') as f:
+            json.dump(cassette, f)
+        return upstream.status_code, body
+
+    @app.route('/_stub/stats', methods=['GET'])
+    def stub_stats():
+        with stats_lock:
+            return jsonify(dict(stats))
+
+    @app.route('/<path:path>', methods=['GET'])
+    def provider(path):
+        endpoint, arg = split_endpoint(path)
+        if not endpoint:
+            return jsonify({'error': f'Unknown endpoint /{path}'}), 404
+        count(f"requests.{endpoint}")
+
+        delay = sample_latency()
+        roll = random.random()
+        if roll < timeout_rate:
+            count('faults.timeout')
+            time.sleep(timeout_seconds)
+            return jsonify({'error': 'Simulated upstream timeout'}), 504
+        roll -= timeout_rate
+        if delay:
+            time.sleep(delay)
+        if roll < rate_limit_rate:
+            count('faults.429')
+            return jsonify({'error': 'Limit Reach'}), 429, {'Retry-After': '1'}
+        roll -= rate_limit_rate
+        if roll < error_rate:
+            count('faults.500')
+            return jsonify({'error': 'Simulated upstream error'}), 500
+
+        params = request.args.to_dict()
+        name = cassette_name(endpoint, arg, params)
+        if mode == 'synthetic':
+            status, body = synthetic_response(endpoint, arg, params)
+        elif mode == 'record':
+            status, body = record(endpoint, arg, path, params, name)
+            count('cassettes.recorded')
+        else:
+            cassette = load_cassette(name)
+            if cassette:
+                status, body = cassette['status'], cassette['body']
+                count('cassettes.replayed')
+            elif fallback:
+                status, body = synthetic_response(endpoint, arg, params)
+                count('cassettes.fallback')
+            else:
+                count('cassettes.missing')
+                return jsonify({'error': f'No cassette for /{path}', 'cassette': name}), 404
+        return jsonify(body), status
+
+    return app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8081)
+    parser.add_argument('--mode', choices=['synthetic', 'record', 'replay'], default='synthetic')
+    parser.add_argument('--cassette-dir', default=CASSETTE_DIR)
+    parser.add_argument('--target', help='Real provider base URL used in record mode')
+    parser.add_argument('--api-key', default=os.getenv('API_KEY_US'), help='Provider key used in record mode')
+    parser.add_argument('--fallback', action='store_true', help='Serve synthetic data for unknown cassettes')
+    parser.add_argument('--latency', help='Latency distribution, e.g. lognormal:4.5,0.6')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='Fraction of requests answered with 500')
+    parser.add_argument('--rate-limit-rate', type=float, default=0.0, help='Fraction answered with 429')
+    parser.add_argument('--timeout-rate', type=float, default=0.0, help='Fraction that stall past the client timeout')
+    parser.add_argument('--timeout-seconds', type=float, default=15.0)
+    parser.add_argument('--seed', type=int)
+    args = parser.parse_args(argv)
+
+    app = create_app(mode=args.mode, cassette_dir=args.cassette_dir, target=args.target, api_key=args.api_key,
+                     latency=args.latency, error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate,
+                     timeout_rate=args.timeout_rate, timeout_seconds=args.timeout_seconds,
+                     fallback=args.fallback, seed=args.seed)
+    app.run(host=args.host, port=args.port, threaded=True)
+
+
+if __name__ == '__main__':
+    main()
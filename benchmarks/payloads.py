@@ -0,0 +1,76 @@
+"""Deterministic, provider-shaped payloads used by the benchmarks and the upstream stand-in."""
+import zlib
+
+EXCHANGES = ['NASDAQ', 'NYSE']
+SECTORS = ['Technology', 'Healthcare', 'Financial Services', 'Consumer Cyclical', 'Energy']
+
+
+def _seed(symbol):
+    return zlib.crc32(symbol.upper().encode('utf-8'))
+
+
+def search_payload(query, limit=10):
+    base = ''.join(ch for ch in query.upper() if ch.isalnum())[:4] or 'X'
+    return [{
+        'symbol': base if i == 0 else f"{base}{i}",
+        'name': f"{query.title()} Holdings {i}" if i else f"{query.title()} Inc.",
+        'currency': 'USD',
+        'stockExchange': 'NASDAQ Global Select',
+        'exchangeShortName': EXCHANGES[i % len(EXCHANGES)],
+    } for i in range(limit)]
+
+
+def profile_payload(symbol):
+    seed = _seed(symbol)
+    return [{
+        'symbol': symbol.upper(),
+        'companyName': f"{symbol.upper()} Corporation",
+        'exchangeShortName': EXCHANGES[seed % len(EXCHANGES)],
+        'sector': SECTORS[seed % len(SECTORS)],
+        'industry': 'Synthetic Industry',
+        'country': 'US',
+        'website': f"https://www.{symbol.lower()}.example.com",
+        'description': ('Synthetic company used for offline measurements. ' * 20).strip(),
+        'fullTimeEmployees': 1000 + seed % 150000,
+        'mktCap': 10 ** 9 + seed * 1000,
+    }]
+
+
+def stock_list_payload(count=1000):
+    """Provider-wide symbol list (``/stock/list``), mixing exchanges and security types."""
+    return [{
+        'symbol': f"S{i:05d}",
+        'name': f"Synthetic {i} Inc.",
+        'exchangeShortName': (EXCHANGES + ['OTC'])[i % 3],
+        'type': 'etf' if i % 10 == 9 else 'stock',
+    } for i in range(count)]
+
+
+def quote_payload(symbol):
+    seed = _seed(symbol)
+    return [{
+        'symbol': symbol.upper(),
+        'price': 10 + seed % 500,
+        'marketCap': 10 ** 9 + seed * 1000,
+    }]
+
+
+def income_payload(symbol, limit=5, latest_year=2024):
+    seed = _seed(symbol)
+    return [{
+        'symbol': symbol.upper(),
+        'date': f"{latest_year - i}-09-30",
+        'calendarYear': str(latest_year - i),
+        'revenue': 10 ** 9 + seed % 10 ** 6 * (i + 1),
+        'netIncome': 10 ** 8 + seed % 10 ** 5 * (i + 1),
+    } for i in range(limit)]
+
+
+def balance_payload(symbol, limit=5, latest_year=2024):
+    seed = _seed(symbol)
+    return [{
+        'symbol': symbol.upper(),
+        'date': f"{latest_year - i}-09-30",
+        'calendarYear': str(latest_year - i),
+        'commonStock': 10 ** 7 + seed % 10 ** 4 * (i + 1),
+    } for i in range(limit)]
@@ -0,0 +1,193 @@
+"""
+Offline micro-benchmarks for the request hot paths.
+
+Runs against an in-memory SQLite database and a stubbed upstream, prints the
+results as JSON and exits 1 when a stored baseline regresses, or 2 when there
+is no baseline to compare against.
+
+    python -m benchmarks.run                      # run and compare to benchmarks/baseline.json
+    python -m benchmarks.run --save-baseline      # record a new baseline
+    python -m benchmarks.run --threshold 0.5 --output bench_output.txt
+"""
+import argparse
+import gc
+import itertools
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from unittest import mock
+
+# Must be set before config.py is imported so the app never touches app.db or the network.
+os.environ['DATABASE_URL'] = 'sqlite://'
+os.environ['API_BASE_URL_US'] = 'http://upstream.invalid/api/v3'
+os.environ['API_KEY_US'] = 'benchmark'
+
+from benchmarks import payloads  # noqa: E402
+from benchmarks.stub_upstream import StubUpstream  # noqa: E402
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'baseline.json')
+WARM_SYMBOL = 'AAPL'
+WARM_QUERY = 'Apple'
+
+
+def _measure(fn, iterations, warmup):
+    for _ in range(warmup):
+        fn()
+    samples = []
+    gc.disable()
+    try:
+        for _ in range(iterations):
+            start = time.perf_counter_ns()
+            fn()
+            samples.append(time.perf_counter_ns() - start)
+    finally:
+        gc.enable()
+    samples.sort()
+    median = statistics.median(samples)
+    return {
+        'iterations': iterations,
+        'min_us': round(samples[0] / 1000, 3),
+        'median_us': round(median / 1000, 3),
+        'p95_us': round(samples[int(len(samples) * 0.95) - 1] / 1000, 3),
+        'mean_us': round(statistics.fmean(samples) / 1000, 3),
+        'ops_per_sec': round(1e9 / median, 1) if median else None,
+    }
+
+
+def build_cases(app, service):
+    """Returns a dict of benchmark name -> zero-argument callable, all sharing one app context."""
+    from services.queries import company_snapshot
+    from utils.helpers import match_financial_data
+
+    fresh = itertools.count()
+    save_payload = {
+        'profile': payloads.profile_payload('SAVE')[0],
+        'financials': payloads.income_payload('SAVE'),
+        'balance_sheet': payloads.balance_payload('SAVE'),
+    }
+    income, balance = payloads.income_payload(WARM_SYMBOL), payloads.balance_payload(WARM_SYMBOL)
+    profile = payloads.profile_payload(WARM_SYMBOL)[0]
+    client = app.test_client()
+
+    def format_hit():
+        return service._format_data_from_db(company_snapshot(service.country_code, WARM_SYMBOL))
+
+    def request(path):
+        def call():
+            response = client.get(path)
+            assert response.status_code == 200, (path, response.status_code)
+        return call
+
+    return {
+        'search_company_hit': lambda: service.search_company(WARM_QUERY),
+        'search_company_miss': lambda: service.search_company(f"query-{next(fresh)}"),
+        'get_company_data_hit': lambda: service.get_company_data(WARM_SYMBOL),
+        'get_company_data_miss': lambda: service.get_company_data(f"M{next(fresh)}"),
+        'save_to_db': lambda: service._save_to_db('SAVE', save_payload),
+        'format_data_from_db': format_hit,
+        'match_financial_data': lambda: match_financial_data(income, balance, profile),
+        'request_search_hit': request(f"/search/us/{WARM_QUERY}"),
+        'request_company_hit': request(f"/company/us/{WARM_QUERY}"),
+    }
+
+
+def run(iterations, warmup, only=None):
+    from app import app
+    from models import db
+    from services.factory import APIServiceFactory
+    from services.peer_stats import stats_refresher
+    from services.write_behind import search_cache_writer
+
+    stub = StubUpstream()
+    with mock.patch('requests.get', stub), app.app_context():
+        db.create_all()
+        service = APIServiceFactory.get_service('us')
+        # Warm both cache layers so the *_hit cases never reach the stub.
+        service.search_company(WARM_QUERY)
+        service.get_company_data(WARM_SYMBOL)
+        # Write the warm search row now, so that with the shared cache off (the default)
+        # search_company_hit reads the table rather than the pending buffer.
+        if search_cache_writer():
+            search_cache_writer().flush()
+
+        results = {}
+        for name, fn in build_cases(app, service).items():
+            if only and name not in only:
+                continue
+            results[name] = _measure(fn, iterations, warmup)
+        # Stop the background writers before their tables go away
+        for worker in (search_cache_writer(), stats_refresher()):
+            if worker:
+                worker.close()
+        db.session.remove()
+        db.drop_all()
+
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'iterations': iterations,
+            'warmup': warmup,
+            'timestamp': int(time.time()),
+        },
+        'results': results,
+    }
+
+
+def compare(report, baseline, threshold):
+    """Returns a list of regressions where the median slowed down by more than ``threshold``."""
+    regressions = []
+    for name, current in report['results'].items():
+        previous = baseline.get('results', {}).get(name)
+        if not previous or not previous.get('median_us'):
+            continue
+        ratio = current['median_us'] / previous['median_us']
+        current['baseline_median_us'] = previous['median_us']
+        current['ratio'] = round(ratio, 3)
+        if ratio > 1 + threshold:
+            regressions.append({'benchmark': name, 'baseline_median_us': previous['median_us'],
+                                'median_us': current['median_us'], 'ratio': round(ratio, 3)})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--only', nargs='*', help='Run only the named benchmarks')
+    parser.add_argument('--baseline', default=BASELINE_PATH, help='Baseline JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='Allowed median slowdown before failing (0.25 = 25%%)')
+    parser.add_argument('--save-baseline', action='store_true', help='Write the results as the new baseline')
+    parser.add_argument('--output', help='Also write the JSON report to this file')
+    args = parser.parse_args(argv)
+
+    report = run(args.iterations, args.warmup, set(args.only) if args.only else None)
+
+    regressions = []
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+            f.write('\n')
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.threshold)
+    else:
+        print(f"No baseline at {args.baseline}; record one with --save-baseline", file=sys.stderr)
+        return 2
+    report['threshold'] = args.threshold
+    report['regressions'] = regressions
+
+    output = json.dumps(report, indent=2, sort_keys=True)
+    print(output)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
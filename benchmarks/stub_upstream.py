@@ -0,0 +1,41 @@
+"""In-process replacement for ``requests.get`` that answers the provider endpoints offline."""
+from urllib.parse import urlparse
+
+from benchmarks import payloads
+
+
+class StubResponse:
+    def __init__(self, status_code, data):
+        self.status_code = status_code
+        self._data = data
+
+    def json(self):
+        return self._data
+
+
+class StubUpstream:
+    """Callable with the ``requests.get`` signature; counts the calls it answers."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def __call__(self, url, params=None, timeout=None, **kwargs):
+        self.calls += 1
+        params = params or {}
+        parts = urlparse(url).path.rstrip('/').split('/')
+        endpoint, arg = parts[-2], parts[-1]
+        limit = int(params.get('limit', 5))
+
+        if endpoint == 'stock' and arg == 'list':
+            return StubResponse(200, payloads.stock_list_payload())
+        if arg == 'search':
+            return StubResponse(200, payloads.search_payload(params.get('query', ''), limit))
+        if endpoint == 'profile':
+            return StubResponse(200, [p for s in arg.split(',') for p in payloads.profile_payload(s)])
+        if endpoint == 'quote':
+            return StubResponse(200, [q for s in arg.split(',') for q in payloads.quote_payload(s)])
+        if endpoint == 'income-statement':
+            return StubResponse(200, payloads.income_payload(arg, limit))
+        if endpoint == 'balance-sheet-statement':
+            return StubResponse(200, payloads.balance_payload(arg, limit))
+        return StubResponse(404, {'error': f'Unknown endpoint {url}'})
@@ -0,0 +1,289 @@
+"""
+Resumable bulk backfill of company data.
+
+    flask backfill run AAPL MSFT ...                  # explicit symbols
+    flask backfill run --file symbols.txt             # one symbol per line
+    flask backfill run --provider-list --exchange NYSE --exchange NASDAQ --name universe
+    flask backfill status --name universe
+
+Every symbol of a run is checkpointed in the ``backfill_item`` table. Running
+the same ``--name`` again picks up only the symbols that are still pending,
+so an interrupted run resumes where it stopped. Add ``--retry-failed`` to also
+retry failures, up to ``--max-attempts``.
+
+Symbols whose statements are still fresh are skipped. Pending symbols are taken
+in chunks of up to ``UPSTREAM_BATCH_MAX``, and their profiles are prefetched in
+one multi-symbol call per chunk before the workers fetch the statements.
+Upstream calls are paced by a shared token bucket (``--rate`` calls per second
+across all workers).
+After repeated failures, for example when the provider starts answering 429,
+every worker pauses with exponential backoff.
+"""
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import func, insert, select, update
+
+from config import Config
+from models import db, BackfillItem
+from services.factory import APIServiceFactory
+from utils.database import enable_write_queue, is_sqlite, write_lock
+
+# profile + income statement + balance sheet
+UPSTREAM_CALLS_PER_SYMBOL = 3
+CHECKPOINT_EVERY = 100
+PROGRESS_EVERY_SECONDS = 10
+
+cli = AppGroup('backfill', help='Bulk-load company data for many symbols.')
+
+
+class Pacer:
+    """Token bucket shared by all workers, with a global pause after consecutive failures."""
+
+    def __init__(self, rate, burst=UPSTREAM_CALLS_PER_SYMBOL):
+        self.rate = rate
+        self.capacity = max(rate, burst)
+        self.tokens = self.capacity
+        self.last = time.monotonic()
+        self.paused_until = 0.0
+        self.failures = 0
+        self._lock = threading.Lock()
+
+    def acquire(self, n=1):
+        if self.rate <= 0:
+            return
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.last) * self.rate)
+                self.last = now
+                delay = self.paused_until - now
+                if delay <= 0:
+                    if self.tokens >= n:
+                        self.tokens -= n
+                        return
+                    delay = (n - self.tokens) / self.rate
+            time.sleep(delay)
+
+    def succeeded(self):
+        with self._lock:
+            self.failures = 0
+
+    def failed(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= 3:
+                self.paused_until = time.monotonic() + min(60, 5 * 2 ** (self.failures - 3))
+
+
+def _prefetch(service, symbols, pacer):
+    """Loads the chunk's profiles ahead of the workers; they fetch anything this misses themselves."""
+    pacer.acquire(1)
+    try:
+        service.prefetch_company_data(symbols)
+    except Exception as e:
+        db.session.rollback()
+        click.echo(f"  Prefetching {len(symbols)} symbols failed: {e}")
+
+
+def _process(app, service, symbol, pacer):
+    """Backfills one symbol in its own app context; returns ``(status, error)``."""
+    with app.app_context():
+        try:
+            if service.has_fresh_data(symbol):
+                return 'skipped', None
+            pacer.acquire(UPSTREAM_CALLS_PER_SYMBOL)
+            if service.refresh_company(symbol):
+                pacer.succeeded()
+                return 'done', None
+            pacer.failed()
+            return 'failed', 'Provider returned no data'
+        except Exception as e:
+            db.session.rollback()
+            pacer.failed()
+            return 'failed', str(e)[:255]
+
+
+def _register(run_name, country_code, symbols):
+    """Adds symbols not yet part of the run as pending; returns how many were added."""
+    added = 0
+    symbols = list(dict.fromkeys(s.strip().upper() for s in symbols if s.strip()))
+    for i in range(0, len(symbols), 500):
+        chunk = symbols[i:i + 500]
+        existing = set(db.session.execute(
+            select(BackfillItem.symbol).where(BackfillItem.run_name == run_name,
+                                              BackfillItem.country_code == country_code,
+                                              BackfillItem.symbol.in_(chunk))).scalars())
+        new = [{'run_name': run_name, 'country_code': country_code, 'symbol': s, 'status': 'pending',
+                'attempts': 0} for s in chunk if s not in existing]
+        if new:
+            with write_lock():
+                db.session.execute(insert(BackfillItem), new)
+                db.session.commit()
+            added += len(new)
+    return added
+
+
+def _checkpoint(results):
+    if not results:
+        return
+    with write_lock():
+        db.session.execute(update(BackfillItem), results)
+        db.session.commit()
+    results.clear()
+
+
+def _pending(run_name, country_code, after_id, limit):
+    return db.session.execute(
+        select(BackfillItem.id, BackfillItem.symbol, BackfillItem.attempts)
+        .where(BackfillItem.run_name == run_name, BackfillItem.country_code == country_code,
+               BackfillItem.status == 'pending', BackfillItem.id > after_id)
+        .order_by(BackfillItem.id).limit(limit)).all()
+
+
+def _status_counts(run_name, country_code):
+    return dict(db.session.execute(
+        select(BackfillItem.status, func.count())
+        .where(BackfillItem.run_name == run_name, BackfillItem.country_code == country_code)
+        .group_by(BackfillItem.status)).all())
+
+
+@cli.command('run')
+@click.argument('symbols', nargs=-1)
+@click.option('--file', 'symbols_file', type=click.File('r'), help='File with one symbol per line.')
+@click.option('--provider-list', is_flag=True, help="Add every stock on --exchange from the provider's symbol list.")
+@click.option('--exchange', multiple=True, default=('NYSE', 'NASDAQ'), show_default=True)
+@click.option('--country', default='us', show_default=True)
+@click.option('--name', 'run_name', default='default', show_default=True,
+              help='Checkpoint name; running the same name again resumes it.')
+@click.option('--workers', type=int, default=lambda: Config.BACKFILL_WORKERS, show_default='BACKFILL_WORKERS')
+@click.option('--rate', type=float, default=lambda: Config.BACKFILL_UPSTREAM_RATE,
+              show_default='BACKFILL_UPSTREAM_RATE', help='Upstream calls per second across all workers (0 = unpaced).')
+@click.option('--retry-failed', is_flag=True, help='Also retry symbols that failed in earlier attempts.')
+@click.option('--max-attempts', type=int, default=3, show_default=True)
+def run_backfill(symbols, symbols_file, provider_list, exchange, country, run_name, workers, rate,
+                 retry_failed, max_attempts):
+    """Fetch and save company data for many symbols, resuming any earlier run of the same name."""
+    try:
+        service = APIServiceFactory.get_service(country)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    country_code = country.lower()
+    app = current_app._get_current_object()
+    if is_sqlite(app.config['SQLALCHEMY_DATABASE_URI']):
+        # Workers write from several threads; SQLite needs those writes serialised.
+        enable_write_queue()
+
+    requested = list(symbols)
+    if symbols_file:
+        requested.extend(line.split('#')[0] for line in symbols_file)
+    if provider_list:
+        requested.extend(service.list_symbols(exchange))
+    added = _register(run_name, country_code, requested)
+
+    if retry_failed:
+        with write_lock():
+            db.session.execute(update(BackfillItem).where(
+                BackfillItem.run_name == run_name, BackfillItem.country_code == country_code,
+                BackfillItem.status == 'failed', BackfillItem.attempts < max_attempts).values(status='pending'))
+            db.session.commit()
+
+    counts = _status_counts(run_name, country_code)
+    total_pending = counts.get('pending', 0)
+    if not counts:
+        raise click.ClickException(f"Run '{run_name}' has no symbols; pass symbols, --file or --provider-list.")
+    click.echo(f"Backfill '{run_name}': {added} new symbols, {total_pending} pending, "
+               f"{counts.get('done', 0) + counts.get('skipped', 0)} already complete")
+
+    pacer = Pacer(rate)
+    tally = {'done': 0, 'skipped': 0, 'failed': 0}
+    failures = []
+    results = []
+    started = last_report = time.monotonic()
+    last_id = 0
+    in_flight = {}
+    # Refill in chunks large enough to share one profile call, once the workers are running low
+    queue_depth = max(workers * 2, Config.UPSTREAM_BATCH_MAX)
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='backfill')
+    try:
+        while True:
+            if len(in_flight) <= workers:
+                batch = _pending(run_name, country_code, last_id, queue_depth - len(in_flight))
+                if len(batch) > 1:
+                    _prefetch(service, [symbol for _, symbol, _ in batch], pacer)
+                for item_id, symbol, attempts in batch:
+                    future = executor.submit(_process, app, service, symbol, pacer)
+                    in_flight[future] = (item_id, symbol, attempts)
+                    last_id = item_id
+            if not in_flight:
+                break
+            finished, _ = wait(in_flight, timeout=1, return_when=FIRST_COMPLETED)
+            for future in finished:
+                item_id, symbol, attempts = in_flight.pop(future)
+                status, error = future.result()
+                tally[status] += 1
+                if status == 'failed':
+                    failures.append((symbol, error))
+                results.append({'id': item_id, 'status': status, 'error': error,
+                                'attempts': attempts + (status != 'skipped'), 'updated_ts': int(time.time())})
+            if len(results) >= CHECKPOINT_EVERY:
+                _checkpoint(results)
+
+            now = time.monotonic()
+            if now - last_report >= PROGRESS_EVERY_SECONDS:
+                last_report = now
+                processed = sum(tally.values())
+                per_second = processed / (now - started)
+                eta = (total_pending - processed) / per_second if per_second else 0
+                click.echo(f"  {processed}/{total_pending} done={tally['done']} skipped={tally['skipped']} "
+                           f"failed={tally['failed']} {per_second:.1f} symbols/s eta {eta / 60:.0f}m")
+    except KeyboardInterrupt:
+        click.echo(f"Interrupted; finishing {len(in_flight)} in-flight symbols. "
+                   f"Re-run with --name {run_name} to resume.")
+        executor.shutdown(wait=True, cancel_futures=True)
+        for future, (item_id, symbol, attempts) in in_flight.items():
+            if future.done() and not future.cancelled():
+                status, error = future.result()
+                results.append({'id': item_id, 'status': status, 'error': error,
+                                'attempts': attempts + (status != 'skipped'), 'updated_ts': int(time.time())})
+        raise
+    finally:
+        _checkpoint(results)
+        executor.shutdown(wait=False)
+
+    elapsed = time.monotonic() - started
+    processed = sum(tally.values())
+    click.echo(f"Finished '{run_name}' in {elapsed:.1f}s: {tally['done']} fetched, {tally['skipped']} fresh, "
+               f"{tally['failed']} failed ({processed / elapsed if elapsed else 0:.1f} symbols/s)")
+    for symbol, error in failures[:20]:
+        click.echo(f"  FAILED {symbol}: {error}")
+    if len(failures) > 20:
+        click.echo(f"  ... and {len(failures) - 20} more; see "
+                   f"`flask backfill status --name {run_name} --country {country_code}`")
+
+
+@cli.command('status')
+@click.option('--name', 'run_name', default='default', show_default=True)
+@click.option('--country', default='us', show_default=True)
+@click.option('--failures', 'show_failures', is_flag=True, help='List failed symbols with their errors.')
+def backfill_status(run_name, country, show_failures):
+    """Show how far a backfill run has got."""
+    country_code = country.lower()
+    counts = _status_counts(run_name, country_code)
+    if not counts:
+        raise click.ClickException(f"No backfill run named '{run_name}' for {country_code.upper()}")
+    total = sum(counts.values())
+    complete = counts.get('done', 0) + counts.get('skipped', 0)
+    click.echo(f"{run_name}: {complete}/{total} complete ({100 * complete / total:.1f}%), " +
+               ', '.join(f"{status}={count}" for status, count in sorted(counts.items())))
+    if show_failures:
+        stmt = (select(BackfillItem.symbol, BackfillItem.attempts, BackfillItem.error)
+                .where(BackfillItem.run_name == run_name, BackfillItem.country_code == country_code,
+                       BackfillItem.status == 'failed')
+                .order_by(BackfillItem.symbol))
+        for symbol, attempts, error in db.session.execute(stmt):
+            click.echo(f"  {symbol} (attempts={attempts}): {error}")
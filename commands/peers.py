@@ -0,0 +1,32 @@
+"""
+Maintenance of the precomputed sector/industry peer statistics.
+
+    flask peers rebuild [--country us]
+
+Saves keep ``peer_member`` up to date and ``peer_stat`` is refreshed from it in
+the background. A rebuild recomputes both from the company tables, e.g. after
+``flask snapshot import`` or when the tables are first created over existing data.
+"""
+import time
+
+import click
+from flask.cli import AppGroup
+
+from services import peer_stats
+from services.queries import iter_company_batches
+from models import db
+from utils.database import use_primary, write_lock
+
+cli = AppGroup('peers', help='Maintain sector and industry peer statistics.')
+
+
+@cli.command('rebuild')
+@click.option('--country', help='Only rebuild statistics for this country code.')
+@click.option('--batch-size', default=500, show_default=True)
+def rebuild_peers(country, batch_size):
+    """Recompute peer statistics from all stored companies."""
+    started = time.time()
+    with write_lock():
+        use_primary(db.session)
+        written = peer_stats.rebuild(iter_company_batches(country, batch_size), country)
+    click.echo(f"Rebuilt {written} peer statistic rows in {time.time() - started:.1f}s")
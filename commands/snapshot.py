@@ -0,0 +1,202 @@
+"""
+Cache snapshot export/import for warm-starting new nodes.
+
+    flask snapshot export snapshot.ndjson.gz [--country us]
+    flask snapshot import snapshot.ndjson.gz [--replace]
+
+A snapshot is gzip-compressed NDJSON: a header line naming the format version
+and the profile/financial column order, one compact line per company (profile
+and financial rows as positional arrays) or fresh search-cache entry, and a
+trailing line with the record counts. Both directions stream, so memory use
+does not grow with the size of the snapshot.
+"""
+import gzip
+import json
+import time
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import delete, insert, select
+
+from config import Config
+from models import db, Company, CompanyProfile, FinancialStatement, SearchCache
+from services.queries import iter_company_batches, profile_columns, financial_columns
+from utils.database import use_primary, write_lock
+
+SNAPSHOT_FORMAT = 'company-data-snapshot'
+SNAPSHOT_VERSION = 1
+
+cli = AppGroup('snapshot', help='Export and import cache snapshots.')
+
+
+def _dump(f, record):
+    f.write(json.dumps(record, separators=(',', ':')))
+    f.write('\n')
+
+
+@cli.command('export')
+@click.argument('path')
+@click.option('--country', help='Only export companies for this country code.')
+@click.option('--batch-size', default=500, show_default=True)
+def export_snapshot(path, country, batch_size):
+    """Write companies, profiles, financials and fresh search results to PATH."""
+    started = time.time()
+    profile_names = [c.name for c in profile_columns()]
+    financial_names = [c.name for c in financial_columns()]
+    companies = searches = 0
+
+    with gzip.open(path, 'wt', encoding='utf-8') as f:
+        _dump(f, {
+            't': 'header', 'format': SNAPSHOT_FORMAT, 'version': SNAPSHOT_VERSION, 'created_ts': int(started),
+            'profile_columns': profile_names, 'financial_columns': financial_names,
+        })
+        for rows, financials in iter_company_batches(country, batch_size):
+            for row in rows:
+                profile = [getattr(row, name) for name in profile_names]
+                _dump(f, {
+                    't': 'company', 'cc': row.country_code, 's': row.symbol, 'n': row.name,
+                    'p': profile if row.last_updated_ts is not None else None,
+                    'f': [[getattr(fin, name) for name in financial_names] for fin in financials.get(row.id, ())],
+                })
+                companies += 1
+            db.session.expunge_all()
+
+        fresh_after = int(started) - Config.SEARCH_CACHE_TIMEOUT
+        stmt = select(SearchCache.query, SearchCache.country_code, SearchCache.results_json,
+                      SearchCache.last_updated_ts).where(SearchCache.last_updated_ts > fresh_after)
+        if country:
+            stmt = stmt.where(SearchCache.country_code == country)
+        for row in db.session.execute(stmt.execution_options(yield_per=batch_size)):
+            _dump(f, {'t': 'search', 'cc': row.country_code, 'q': row.query, 'r': row.results_json,
+                      'ts': row.last_updated_ts})
+            searches += 1
+
+        _dump(f, {'t': 'end', 'companies': companies, 'searches': searches})
+
+    click.echo(f"Exported {companies} companies and {searches} search results to {path} "
+               f"in {time.time() - started:.1f}s")
+
+
+def _import_companies(records, profile_names, financial_names, replace):
+    """Bulk-loads one batch of company records; returns how many were written."""
+    known_profile = {c.name for c in profile_columns()}
+    known_financial = {c.name for c in financial_columns()}
+    now = int(time.time())
+
+    by_key = {(r['cc'], r['s']): r for r in records}
+    existing = {}
+    for cc in {cc for cc, _ in by_key}:
+        symbols = [s for c, s in by_key if c == cc]
+        stmt = (select(Company.id, Company.symbol, CompanyProfile.last_updated_ts)
+                .outerjoin(CompanyProfile, CompanyProfile.company_id == Company.id)
+                .where(Company.country_code == cc, Company.symbol.in_(symbols)))
+        for row in db.session.execute(stmt):
+            existing[(cc, row.symbol)] = (row.id, row.last_updated_ts)
+
+    to_write = {}
+    for key, record in by_key.items():
+        snapshot_ts = dict(zip(profile_names, record['p'])).get('last_updated_ts') if record['p'] else None
+        current = existing.get(key)
+        if current and not replace and current[1] is not None and (snapshot_ts or 0) <= current[1]:
+            continue
+        to_write[key] = record
+    if not to_write:
+        return 0
+
+    new_keys = [key for key in to_write if key not in existing]
+    if new_keys:
+        db.session.execute(insert(Company), [
+            {'country_code': cc, 'symbol': s, 'name': to_write[(cc, s)]['n']} for cc, s in new_keys
+        ])
+        for cc in {cc for cc, _ in new_keys}:
+            symbols = [s for c, s in new_keys if c == cc]
+            stmt = select(Company.id, Company.symbol).where(Company.country_code == cc, Company.symbol.in_(symbols))
+            for row in db.session.execute(stmt):
+                existing[(cc, row.symbol)] = (row.id, None)
+
+    ids = {key: existing[key][0] for key in to_write}
+    replaced_ids = [ids[key] for key in to_write if key not in new_keys]
+    if replaced_ids:
+        db.session.execute(delete(CompanyProfile).where(CompanyProfile.company_id.in_(replaced_ids)))
+        db.session.execute(delete(FinancialStatement).where(FinancialStatement.company_id.in_(replaced_ids)))
+
+    profiles, statements = [], []
+    for key, record in to_write.items():
+        company_id = ids[key]
+        if record['p']:
+            profile = {k: v for k, v in zip(profile_names, record['p']) if k in known_profile}
+            profile.setdefault('last_updated_ts', now)
+            profiles.append({'company_id': company_id, **profile})
+        for fin in record['f']:
+            statements.append({'company_id': company_id,
+                               **{k: v for k, v in zip(financial_names, fin) if k in known_financial}})
+    if profiles:
+        db.session.execute(insert(CompanyProfile), profiles)
+    if statements:
+        db.session.execute(insert(FinancialStatement), statements)
+    return len(to_write)
+
+
+def _import_searches(records):
+    for cc in {r['cc'] for r in records}:
+        queries = [r['q'] for r in records if r['cc'] == cc]
+        db.session.execute(delete(SearchCache).where(SearchCache.country_code == cc, SearchCache.query.in_(queries)))
+    db.session.execute(insert(SearchCache), [
+        {'query': r['q'], 'country_code': r['cc'], 'results_json': r['r'], 'last_updated_ts': r['ts']}
+        for r in {(r['cc'], r['q']): r for r in records}.values()
+    ])
+
+
+def _flush(batch, kind, header, replace):
+    with write_lock():
+        use_primary(db.session)
+        if kind == 'company':
+            written = _import_companies(batch, header['profile_columns'], header['financial_columns'], replace)
+        else:
+            _import_searches(batch)
+            written = len(batch)
+        db.session.commit()
+    db.session.expunge_all()
+    return written
+
+
+@cli.command('import')
+@click.argument('path')
+@click.option('--batch-size', default=500, show_default=True)
+@click.option('--replace', is_flag=True, help='Overwrite local companies even when their data is newer.')
+def import_snapshot(path, batch_size, replace):
+    """Bulk-load a snapshot from PATH, preserving last_updated_ts."""
+    started = time.time()
+    counts = {'company': 0, 'search': 0}
+    written = {'company': 0, 'search': 0}
+    footer = None
+
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        header = json.loads(f.readline() or '{}')
+        if header.get('format') != SNAPSHOT_FORMAT:
+            raise click.ClickException(f"{path} is not a company-data snapshot")
+        if header.get('version', 0) > SNAPSHOT_VERSION:
+            raise click.ClickException(f"Snapshot version {header['version']} is newer than supported "
+                                       f"version {SNAPSHOT_VERSION}")
+
+        batch, kind = [], None
+        for line in f:
+            record = json.loads(line)
+            if record['t'] == 'end':
+                footer = record
+                break
+            if batch and (record['t'] != kind or len(batch) >= batch_size):
+                written[kind] += _flush(batch, kind, header, replace)
+                batch = []
+            kind = record['t']
+            counts[kind] += 1
+            batch.append(record)
+        if batch:
+            written[kind] += _flush(batch, kind, header, replace)
+
+    if footer is None:
+        raise click.ClickException('Snapshot is truncated (no end record); imported rows were kept.')
+    if footer['companies'] != counts['company'] or footer['searches'] != counts['search']:
+        raise click.ClickException(f"Snapshot record counts do not match its footer: {counts} vs {footer}")
+    click.echo(f"Imported {written['company']} of {counts['company']} companies and {written['search']} "
+               f"search results from {path} in {time.time() - started:.1f}s")
@@ -5,6 +5,19 @@ load_dotenv()  # load .env variables
 
 basedir = os.path.abspath(os.path.dirname(__file__))
 
+
+def _pool_options(prefix):
+    """Engine pool options from <prefix>POOL_SIZE / MAX_OVERFLOW / POOL_TIMEOUT / POOL_RECYCLE, if set."""
+    options = {}
+    for name in ('pool_size', 'max_overflow', 'pool_timeout', 'pool_recycle'):
+        value = os.getenv(prefix + name.upper())
+        if value:
+            options[name] = int(value)
+    if options:
+        options['pool_pre_ping'] = True
+    return options
+
+
 class Config:
     API_BASE_URL_US = os.getenv("API_BASE_URL_US", "<fall-back-us-url>")
     API_KEY_US = os.getenv("API_KEY_US", "<fall-back--us-key>")
@@ -12,8 +25,129 @@ class Config:
     # Database configuration
     SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', 'sqlite:///' + os.path.join(basedir, 'app.db'))
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Primary pool sizing, e.g. DB_POOL_SIZE=10 DB_MAX_OVERFLOW=20
+    SQLALCHEMY_ENGINE_OPTIONS = _pool_options('DB_')
+
+    # Read replicas (comma-separated URIs); sized with DB_REPLICA_POOL_SIZE etc.
+    DATABASE_REPLICA_URLS = [url.strip() for url in os.getenv('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+    SQLALCHEMY_BINDS = {
+        f'replica_{i}': {'url': url, **_pool_options('DB_REPLICA_')} for i, url in enumerate(DATABASE_REPLICA_URLS)
+    }
+    # After a commit that wrote, keep reads on the primary for this long
+    REPLICA_READ_YOUR_WRITES_SECONDS = float(os.getenv('REPLICA_READ_YOUR_WRITES_SECONDS', '5'))
+
+    # SQLite production profile: WAL + tuned pragmas on every connection, writes funneled through one queue
+    SQLITE_PRODUCTION_MODE = os.getenv('SQLITE_PRODUCTION_MODE', 'false').lower() == 'true'
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv('SQLITE_BUSY_TIMEOUT_MS', '5000'))
+    SQLITE_MMAP_SIZE = int(os.getenv('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024)))
+    SQLITE_CACHE_SIZE_KB = int(os.getenv('SQLITE_CACHE_SIZE_KB', '65536'))
     
     # Cache timeout in seconds (e.g., 24 hours)
     CACHE_TIMEOUT = 86400
+    # Quote-like fields (market cap) are refreshed with one cheap quote call after
+    # QUOTE_CACHE_TIMEOUT; profile and statements only after STATEMENT_CACHE_TIMEOUT,
+    # or every STATEMENT_RECHECK_INTERVAL once a new fiscal year's report is due
+    QUOTE_CACHE_TIMEOUT = int(os.getenv('QUOTE_CACHE_TIMEOUT', str(CACHE_TIMEOUT)))
+    STATEMENT_CACHE_TIMEOUT = int(os.getenv('STATEMENT_CACHE_TIMEOUT', str(90 * 86400)))
+    STATEMENT_RECHECK_INTERVAL = int(os.getenv('STATEMENT_RECHECK_INTERVAL', str(7 * 86400)))
+    # Annual periods kept per company, and how often a refresh re-pulls all of them
+    # to catch restatements (refreshes in between only fetch newer periods)
+    STATEMENT_HISTORY_YEARS = int(os.getenv('STATEMENT_HISTORY_YEARS', '5'))
+    STATEMENT_FULL_RECONCILE_INTERVAL = int(os.getenv('STATEMENT_FULL_RECONCILE_INTERVAL', str(30 * 86400)))
     # Cache timeout for search results in seconds (e.g., 1 hour)
     SEARCH_CACHE_TIMEOUT = 3600
+    # Buffer search-cache rows in memory and write them in background batches every
+    # SEARCH_CACHE_FLUSH_INTERVAL seconds, or sooner once SEARCH_CACHE_FLUSH_BATCH are waiting
+    SEARCH_CACHE_WRITE_BEHIND = os.getenv('SEARCH_CACHE_WRITE_BEHIND', 'true').lower() == 'true'
+    SEARCH_CACHE_FLUSH_INTERVAL = float(os.getenv('SEARCH_CACHE_FLUSH_INTERVAL', '1.0'))
+    SEARCH_CACHE_FLUSH_BATCH = int(os.getenv('SEARCH_CACHE_FLUSH_BATCH', '200'))
+    # Rows the write-behind queue holds before further searches are written synchronously
+    SEARCH_CACHE_MAX_PENDING = int(os.getenv('SEARCH_CACHE_MAX_PENDING', '10000'))
+    # Results requested from the upstream search endpoint (pages are served from this list)
+    SEARCH_RESULT_LIMIT = int(os.getenv('SEARCH_RESULT_LIMIT', '10'))
+    # Multi-country search (/search/all/..., /search/us,uk/...): worker threads shared by all
+    # fan-outs, and seconds each provider gets before it is reported as timed out
+    # (SEARCH_FANOUT_TIMEOUTS overrides per country, e.g. "us=1.5,uk=3")
+    SEARCH_FANOUT_WORKERS = int(os.getenv('SEARCH_FANOUT_WORKERS', '16'))
+    SEARCH_FANOUT_TIMEOUT = float(os.getenv('SEARCH_FANOUT_TIMEOUT', '2.0'))
+    SEARCH_FANOUT_TIMEOUTS = os.getenv('SEARCH_FANOUT_TIMEOUTS', '')
+    # Sector/industry groups smaller than this report peer counts but no percentiles
+    PEER_STATS_MIN_PEERS = int(os.getenv('PEER_STATS_MIN_PEERS', '5'))
+    # Seconds a worker reuses a group's peer statistics before reading them again
+    PEER_STATS_MEMO_SECONDS = float(os.getenv('PEER_STATS_MEMO_SECONDS', '60'))
+    # How often groups changed by saves have their peer statistics recomputed in the background
+    PEER_STATS_REFRESH_SECONDS = float(os.getenv('PEER_STATS_REFRESH_SECONDS', '30'))
+    # Admission control for requests that must call upstream (cache hits are never limited):
+    # concurrent upstream-bound requests per route, bounded wait queue and its deadline
+    ADMISSION_CONTROL_ENABLED = os.getenv('ADMISSION_CONTROL_ENABLED', 'true').lower() == 'true'
+    UPSTREAM_MAX_CONCURRENCY = int(os.getenv('UPSTREAM_MAX_CONCURRENCY', '8'))
+    UPSTREAM_ROUTE_LIMITS = os.getenv('UPSTREAM_ROUTE_LIMITS', '')
+    UPSTREAM_MAX_QUEUE = int(os.getenv('UPSTREAM_MAX_QUEUE', '16'))
+    UPSTREAM_QUEUE_TIMEOUT = float(os.getenv('UPSTREAM_QUEUE_TIMEOUT', '2.0'))
+    ADMISSION_RETRY_AFTER = int(os.getenv('ADMISSION_RETRY_AFTER', '5'))
+    # End-to-end budget for a request's upstream work (clients may send REQUEST_DEADLINE_HEADER,
+    # in seconds, up to the max); each upstream call also times out after UPSTREAM_TIMEOUT
+    REQUEST_DEADLINE_SECONDS = float(os.getenv('REQUEST_DEADLINE_SECONDS', '25'))
+    REQUEST_DEADLINE_MAX_SECONDS = float(os.getenv('REQUEST_DEADLINE_MAX_SECONDS', '60'))
+    REQUEST_DEADLINE_HEADER = os.getenv('REQUEST_DEADLINE_HEADER', 'X-Request-Timeout')
+    UPSTREAM_TIMEOUT = float(os.getenv('UPSTREAM_TIMEOUT', '10'))
+    # Profile and quote fetches are combined into multi-symbol upstream calls of at most
+    # UPSTREAM_BATCH_MAX symbols; while a call is in flight, the next batch collects
+    # fetches for up to UPSTREAM_BATCH_WINDOW_MS
+    UPSTREAM_BATCHING_ENABLED = os.getenv('UPSTREAM_BATCHING_ENABLED', 'true').lower() == 'true'
+    UPSTREAM_BATCH_WINDOW_MS = float(os.getenv('UPSTREAM_BATCH_WINDOW_MS', '25'))
+    UPSTREAM_BATCH_MAX = int(os.getenv('UPSTREAM_BATCH_MAX', '50'))
+    # Most symbols one GET /company/<country>?symbols= request may ask for
+    COMPANY_BATCH_MAX = int(os.getenv('COMPANY_BATCH_MAX', '100'))
+    # Per-client (API key header, else IP) token buckets per route, as "count/seconds";
+    # the miss budget is only charged by requests that have to call upstream
+    RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'false').lower() == 'true'
+    RATE_LIMIT_STORAGE = os.getenv('RATE_LIMIT_STORAGE', 'memory').lower()
+    RATE_LIMIT_KEY_HEADER = os.getenv('RATE_LIMIT_KEY_HEADER', 'X-API-Key')
+    # Keys (comma-separated) that get buckets of their own; any other header value is ignored
+    RATE_LIMIT_API_KEYS = {key.strip() for key in os.getenv('RATE_LIMIT_API_KEYS', '').split(',') if key.strip()}
+    RATE_LIMIT_DEFAULT = os.getenv('RATE_LIMIT_DEFAULT', '120/60')
+    RATE_LIMIT_MISS_DEFAULT = os.getenv('RATE_LIMIT_MISS_DEFAULT', '20/60')
+    RATE_LIMITS = os.getenv('RATE_LIMITS', '')
+    RATE_LIMITS_MISS = os.getenv('RATE_LIMITS_MISS', '')
+    # Reverse proxies in front of the app; their X-Forwarded-For gives the client IP
+    TRUSTED_PROXY_COUNT = int(os.getenv('TRUSTED_PROXY_COUNT', '0'))
+    # How often the in-process autocomplete index pulls in companies saved by other workers
+    AUTOCOMPLETE_REFRESH_SECONDS = int(os.getenv('AUTOCOMPLETE_REFRESH_SECONDS', '60'))
+    # flask backfill: worker threads and upstream calls per second across all of them
+    BACKFILL_WORKERS = int(os.getenv('BACKFILL_WORKERS', '8'))
+    BACKFILL_UPSTREAM_RATE = float(os.getenv('BACKFILL_UPSTREAM_RATE', '5'))
+    # Async company lookups (?async=true): worker threads, outstanding-job cap, and
+    # how long finished job results stay pollable at /jobs/<id>
+    JOB_WORKERS = int(os.getenv('JOB_WORKERS', '4'))
+    JOB_MAX_PENDING = int(os.getenv('JOB_MAX_PENDING', '100'))
+    JOB_RESULT_TTL = int(os.getenv('JOB_RESULT_TTL', '600'))
+    # Companies per keyset batch for /export streaming
+    EXPORT_BATCH_SIZE = int(os.getenv('EXPORT_BATCH_SIZE', '500'))
+
+    # Shared cache in front of the DB for search results and rendered company data:
+    # 'none' (off), 'memory' (per process, opt-in), 'redis' (shared across workers/nodes) or 'sql'
+    CACHE_BACKEND = os.getenv('CACHE_BACKEND', 'none')
+    CACHE_REDIS_URL = os.getenv('CACHE_REDIS_URL', 'redis://127.0.0.1:6379/0')
+    CACHE_REDIS_TIMEOUT = float(os.getenv('CACHE_REDIS_TIMEOUT', '0.25'))
+    CACHE_MEMORY_MAX_ENTRIES = int(os.getenv('CACHE_MEMORY_MAX_ENTRIES', '10000'))
+    # Bump to invalidate every cached entry, e.g. when the response format changes
+    CACHE_KEY_VERSION = int(os.getenv('CACHE_KEY_VERSION', '1'))
+
+    # Expose Prometheus metrics at /metrics
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+
+    # Include span timings in JSON bodies for ?debug=timing or X-Debug-Timing: 1
+    TIMING_DEBUG_ENABLED = os.getenv('TIMING_DEBUG_ENABLED', 'false').lower() == 'true'
+    # cProfile capture: requests carrying X-Profile-Token, plus a random sample of the rest
+    PROFILING_ENABLED = os.getenv('PROFILING_ENABLED', 'false').lower() == 'true'
+    PROFILING_TOKEN = os.getenv('PROFILING_TOKEN', '')
+    PROFILE_SAMPLE_RATE = float(os.getenv('PROFILE_SAMPLE_RATE', '0'))
+    PROFILE_DIR = os.getenv('PROFILE_DIR', os.path.join(basedir, 'profiles'))
+
+    # Logging: JSON or text lines written by a background thread from a bounded queue
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+    LOG_FORMAT = os.getenv('LOG_FORMAT', 'json').lower()
+    LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', '10000'))
+    # Per-logger sampling, e.g. "services.us_api.cache=0.1" keeps 10% of cache HIT/MISS lines
+    LOG_SAMPLE_RATES = os.getenv('LOG_SAMPLE_RATES', 'services.us_api.cache=0.1')
@@ -1,6 +1,113 @@
+"""
+Non-blocking logging setup.
+
+Request threads only append records to a bounded in-memory queue; a background
+QueueListener thread formats them (JSON by default) and writes them out. When
+the queue is full, records are dropped instead of blocking the request.
+
+High-volume loggers can be sampled through ``LOG_SAMPLE_RATES``
+("logger.name=0.05,other.logger=0.5"). ``get_sampled_logger`` decides before a
+record is built, so an unsampled call costs one random() draw.
+"""
+import atexit
+import json
 import logging
+import logging.handlers
+import queue
+import random
+import time
+
+from config import Config
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; messages are interpolated here, on the writer thread."""
+
+    def format(self, record):
+        payload = {
+            'ts': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'thread': record.threadName,
+        }
+        if getattr(record, 'sample_rate', None) is not None:
+            payload['sample_rate'] = record.sample_rate
+        if record.exc_info:
+            payload['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """Enqueues records untouched and drops them when the queue is full."""
+
+    dropped = 0
+
+    def prepare(self, record):
+        # The default implementation formats the message on the calling thread;
+        # the listener formats it instead.
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            DroppingQueueHandler.dropped += 1
+
+
+class SampledLogger(logging.LoggerAdapter):
+    """Logger adapter that only emits a ``rate`` fraction of calls."""
+
+    def __init__(self, logger, rate):
+        super().__init__(logger, {'sample_rate': rate})
+        self.rate = rate
+
+    def isEnabledFor(self, level):
+        if self.rate < 1.0 and random.random() >= self.rate:
+            return False
+        return self.logger.isEnabledFor(level)
+
+
+def _parse_sample_rates(spec):
+    rates = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        name, _, rate = item.partition('=')
+        rates[name.strip()] = float(rate)
+    return rates
+
+
+_sample_rates = _parse_sample_rates(Config.LOG_SAMPLE_RATES)
+
+
+def get_sampled_logger(name):
+    """Returns a logger for ``name`` sampled at its configured rate (plain logger if unsampled)."""
+    logger = logging.getLogger(name)
+    rate = _sample_rates.get(name)
+    if rate is None or rate >= 1.0:
+        return logger
+    return SampledLogger(logger, rate)
+
+
+def _configure():
+    stream_handler = logging.StreamHandler()
+    if Config.LOG_FORMAT == 'json':
+        stream_handler.setFormatter(JsonFormatter())
+    else:
+        stream_handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
+
+    log_queue = queue.Queue(maxsize=Config.LOG_QUEUE_SIZE)
+    listener = logging.handlers.QueueListener(log_queue, stream_handler, respect_handler_level=True)
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(DroppingQueueHandler(log_queue))
+    root.setLevel(Config.LOG_LEVEL)
+
+    listener.start()
+    # Drain whatever is still queued when the process exits.
+    atexit.register(listener.stop)
+    return listener
+
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+listener = _configure()
@@ -3,9 +3,11 @@ from sqlalchemy import UniqueConstraint, Text
 from sqlalchemy.dialects.postgresql import JSONB
 import time
 import json
+from utils.database import RoutingSession
 
-# Create the database instance but don't attach it to an app yet
-db = SQLAlchemy()
+# Create the database instance but don't attach it to an app yet.
+# RoutingSession sends pure reads to replicas when DATABASE_REPLICA_URLS is set.
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 
 class SearchCache(db.Model):
     """Stores cached search query results."""
@@ -20,7 +22,11 @@ class SearchCache(db.Model):
     
     last_updated_ts = db.Column(db.Integer, nullable=False, default=lambda: int(time.time()))
 
-    __table_args__ = (UniqueConstraint('query', 'country_code', name='_query_country_uc'),)
+    # The (country_code, last_updated_ts) index serves the autocomplete delta refresh.
+    __table_args__ = (
+        UniqueConstraint('query', 'country_code', name='_query_country_uc'),
+        db.Index('ix_search_cache_country_updated', 'country_code', 'last_updated_ts'),
+    )
 
     def is_stale(self, timeout):
         """Checks if the cache for this entry has expired."""
@@ -35,6 +41,73 @@ class SearchCache(db.Model):
         return json.loads(self.results_json)
 
 
+class CacheEntry(db.Model):
+    """Key/value rows backing the 'sql' shared cache backend."""
+    __tablename__ = 'cache_entry'
+    key = db.Column(db.String(255), primary_key=True)
+    value = db.Column(Text, nullable=False)
+    expires_ts = db.Column(db.Integer, nullable=False, index=True)
+
+
+class BackfillItem(db.Model):
+    """Per-symbol checkpoint of a ``flask backfill`` run, so an interrupted run resumes where it stopped."""
+    __tablename__ = 'backfill_item'
+    id = db.Column(db.Integer, primary_key=True)
+    run_name = db.Column(db.String(100), nullable=False)
+    country_code = db.Column(db.String(5), nullable=False)
+    symbol = db.Column(db.String(20), nullable=False)
+    # pending / done / skipped (already fresh) / failed
+    status = db.Column(db.String(10), nullable=False, default='pending')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.String(255))
+    updated_ts = db.Column(db.Integer)
+
+    __table_args__ = (
+        UniqueConstraint('run_name', 'country_code', 'symbol', name='_backfill_run_symbol_uc'),
+        db.Index('ix_backfill_run_status', 'run_name', 'status', 'id'),
+    )
+
+
+class PeerMember(db.Model):
+    """One company's value of one metric in one of its peer groups (sector or industry) for one fiscal year."""
+    __tablename__ = 'peer_member'
+    id = db.Column(db.Integer, primary_key=True)
+    country_code = db.Column(db.String(5), nullable=False)
+    group_kind = db.Column(db.String(10), nullable=False)  # sector / industry
+    group_name = db.Column(db.String(100), nullable=False)
+    # Fiscal year; '' for point-in-time metrics (market cap)
+    year = db.Column(db.String(4), nullable=False)
+    metric = db.Column(db.String(30), nullable=False)
+    company_id = db.Column(db.Integer, db.ForeignKey('company.id'), nullable=False, index=True)
+    value = db.Column(db.Float, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint('country_code', 'group_kind', 'group_name', 'year', 'metric', 'company_id',
+                         name='_peer_member_uc'),
+    )
+
+
+class PeerStat(db.Model):
+    """Precomputed distribution of one metric across a sector or industry for one fiscal year."""
+    __tablename__ = 'peer_stat'
+    id = db.Column(db.Integer, primary_key=True)
+    country_code = db.Column(db.String(5), nullable=False)
+    group_kind = db.Column(db.String(10), nullable=False)  # sector / industry
+    group_name = db.Column(db.String(100), nullable=False)
+    # Fiscal year; '' for point-in-time metrics (market cap)
+    year = db.Column(db.String(4), nullable=False)
+    metric = db.Column(db.String(30), nullable=False)
+    peer_count = db.Column(db.Integer, nullable=False)
+    mean_value = db.Column(db.Float)
+    # 101 breakpoints p0..p100, read to place a company in the distribution
+    quantiles_json = db.Column(Text, nullable=False)
+    updated_ts = db.Column(db.Integer, nullable=False, default=lambda: int(time.time()))
+
+    __table_args__ = (
+        UniqueConstraint('country_code', 'group_kind', 'group_name', 'year', 'metric', name='_peer_stat_uc'),
+    )
+
+
 class Company(db.Model):
     """Stores the core, unique information for a company."""
     __tablename__ = 'company'
@@ -43,8 +116,12 @@ class Company(db.Model):
     name = db.Column(db.String(255), nullable=False)
     country_code = db.Column(db.String(5), nullable=False, index=True) # e.g., 'us', 'uk'
 
-    # A company is unique by its symbol within a country
-    __table_args__ = (UniqueConstraint('symbol', 'country_code', name='_symbol_country_uc'),)
+    # A company is unique by its symbol within a country; the (country_code, symbol)
+    # index serves keyset pagination of listings in symbol order.
+    __table_args__ = (
+        UniqueConstraint('symbol', 'country_code', name='_symbol_country_uc'),
+        db.Index('ix_company_country_symbol', 'country_code', 'symbol'),
+    )
 
     # Relationships
     profile = db.relationship('CompanyProfile', backref='company', uselist=False, cascade="all, delete-orphan")
@@ -59,8 +136,8 @@ class CompanyProfile(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     company_id = db.Column(db.Integer, db.ForeignKey('company.id'), nullable=False, unique=True)
     
-    exchange = db.Column(db.String(50))
-    sector = db.Column(db.String(100))
+    exchange = db.Column(db.String(50), index=True)
+    sector = db.Column(db.String(100), index=True)
     industry = db.Column(db.String(100))
     description = db.Column(db.Text)
     website = db.Column(db.String(255))
@@ -69,6 +146,10 @@ class CompanyProfile(db.Model):
 
     # Caching timestamp
     last_updated_ts = db.Column(db.Integer, nullable=False, default=lambda: int(time.time()))
+    # Last time the full statement history was re-downloaded (refreshes in between are incremental)
+    last_full_refresh_ts = db.Column(db.Integer)
+    # When profile and statements are next re-fetched; until then only the quote is refreshed
+    statements_due_ts = db.Column(db.Integer)
 
     def is_stale(self, timeout):
         """Checks if the cache for this entry has expired."""
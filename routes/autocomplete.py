@@ -0,0 +1,22 @@
+from flask import Blueprint, jsonify, current_app, request
+from services import autocomplete
+from services.factory import APIServiceFactory
+from utils.pagination import page_limit
+from utils.timing import span
+
+bp = Blueprint('autocomplete', __name__, url_prefix='/autocomplete')
+
+@bp.route('/<country>', methods=['GET'])
+def autocomplete_companies(country):
+    """Typeahead suggestions from the in-process prefix index; never calls upstream."""
+    try:
+        APIServiceFactory.get_service(country)
+    except ValueError as e:
+        current_app.logger.error("%s", e)
+        return jsonify({'error': str(e)}), 404
+
+    query = request.args.get('q', '')
+    limit = page_limit(request.args.get('limit'), 10, 50)
+    with span('autocomplete'):
+        results = autocomplete.suggest(country.lower(), query, limit)
+    return jsonify({'query': query, 'results': results})
@@ -0,0 +1,47 @@
+from flask import Blueprint, jsonify, current_app, request
+from services.factory import APIServiceFactory
+from services.queries import list_companies
+from utils.pagination import decode_cursor, encode_cursor, page_limit
+
+bp = Blueprint('companies', __name__, url_prefix='/companies')
+
+@bp.route('/<country>', methods=['GET'])
+def list_country_companies(country):
+    """Lists cached companies in symbol order with opaque keyset cursors."""
+    try:
+        APIServiceFactory.get_service(country)
+    except ValueError as e:
+        current_app.logger.error("%s", e)
+        return jsonify({'error': str(e)}), 404
+
+    country_code = country.lower()
+    limit = page_limit(request.args.get('limit'), 50, 200)
+    sector = request.args.get('sector')
+    exchange = request.args.get('exchange')
+
+    after_symbol = None
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            cursor_country, after_symbol = decode_cursor(cursor, 2)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        if cursor_country != country_code:
+            return jsonify({'error': 'Cursor belongs to a different country'}), 400
+
+    rows = list_companies(country_code, limit, after_symbol, sector, exchange)
+    page, has_more = rows[:limit], len(rows) > limit
+
+    return jsonify({
+        'country': country_code.upper(),
+        'filters': {'sector': sector, 'exchange': exchange},
+        'results': [{
+            'symbol': row.symbol,
+            'name': row.name,
+            'exchange': row.exchange,
+            'sector': row.sector,
+            'industry': row.industry,
+            'market_cap_usd': row.market_cap_usd
+        } for row in page],
+        'next_cursor': encode_cursor(country_code, page[-1].symbol) if has_more else None
+    })
@@ -1,25 +1,120 @@
-from flask import Blueprint, jsonify, current_app
+from flask import Blueprint, jsonify, current_app, request, url_for
+from config import Config
+from services import autocomplete
+from services.base_api import NotCachedError
 from services.factory import APIServiceFactory
+from services.jobs import JobQueueFull, get_job_runner
+from utils.fields import FieldSelection
+from utils.rate_limit import charge_miss
+from utils.timing import span
 
 bp = Blueprint('company', __name__, url_prefix='/company')
 
 @bp.route('/<country>/<company_name>', methods=['GET'])
 def get_company_metrics(country, company_name):
-    current_app.logger.info(f"Request for company '{company_name}' in country '{country}'")
+    current_app.logger.info("Request for company '%s' in country '%s'", company_name, country)
 
     try:
         api_service = APIServiceFactory.get_service(country)
     except ValueError as e:
-        current_app.logger.error(str(e))
+        current_app.logger.error("%s", e)
         return jsonify({'error': str(e)}), 404
 
+    # Optional sparse response: ?fields=sector,revenue_usd&years=3
+    try:
+        selection = FieldSelection.parse(request.args.get('fields'), request.args.get('years'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    if _wants_async():
+        return _respond_async(api_service, country, company_name, selection)
+
+    result, status = build_company_response(api_service, country, company_name, selection)
+    with span('serialize'):
+        return jsonify(result), status
+
+
+@bp.route('/<country>', methods=['GET'])
+def get_many_company_metrics(country):
+    """Data for several symbols at once (``?symbols=AAPL,MSFT``); cold ones are fetched in batched upstream calls."""
+    try:
+        api_service = APIServiceFactory.get_service(country)
+    except ValueError as e:
+        current_app.logger.error("%s", e)
+        return jsonify({'error': str(e)}), 404
+
+    symbols = list(dict.fromkeys(s.strip().upper() for s in request.args.get('symbols', '').split(',') if s.strip()))
+    if not symbols:
+        return jsonify({'error': 'Pass one or more comma-separated symbols in ?symbols='}), 400
+    if len(symbols) > Config.COMPANY_BATCH_MAX:
+        return jsonify({'error': f'At most {Config.COMPANY_BATCH_MAX} symbols per request'}), 400
+    try:
+        selection = FieldSelection.parse(request.args.get('fields'), request.args.get('years'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    with span('company_data'):
+        found = api_service.get_many_company_data(symbols)
+    results = []
+    for symbol in symbols:
+        if found.get(symbol):
+            autocomplete.record_hit(country.lower(), symbol)
+            results.append(format_company_result(country, symbol, symbol, found[symbol], selection))
+    with span('serialize'):
+        return jsonify({
+            'country': country.upper(),
+            'results': results,
+            'not_found': [symbol for symbol in symbols if not found.get(symbol)],
+        })
+
+
+def _wants_async():
+    return (request.args.get('async', '').lower() in ('1', 'true')
+            or 'respond-async' in request.headers.get('Prefer', ''))
+
+
+def _respond_async(api_service, country, company_name, selection):
+    """Answers from cache when possible; otherwise queues the lookup and returns 202 with a job to poll."""
+    try:
+        result, status = build_company_response(api_service, country, company_name, selection, allow_fetch=False)
+        with span('serialize'):
+            return jsonify(result), status
+    except NotCachedError:
+        pass
+
+    charge_miss()  # a queued lookup costs the same miss budget as a synchronous one
+    dedupe_key = ('company', country.lower(), company_name,
+                  request.args.get('fields'), request.args.get('years'))
+    try:
+        job = get_job_runner().submit(current_app._get_current_object(), dedupe_key, build_company_response,
+                                      api_service, country, company_name, selection)
+    except JobQueueFull:
+        response = jsonify({'error': 'Too many lookups in progress, please retry shortly'})
+        response.headers['Retry-After'] = '5'
+        return response, 503
+
+    job_url = url_for('jobs.get_job', job_id=job['job_id'])
+    response = jsonify({**job, 'status_url': job_url})
+    response.headers['Location'] = job_url
+    response.headers['Retry-After'] = '1'
+    return response, 202
+
+
+def build_company_response(api_service, country, company_name, selection=None, allow_fetch=True):
+    """
+    Resolves a company name and returns ``(body, status_code)``.
+
+    With ``allow_fetch=False`` only cached data is used and NotCachedError is raised
+    when the upstream provider would have to be called.
+    """
     # Search for the company to get the correct symbol
-    search_results = api_service.search_company(company_name)
+    with span('search'):
+        search_results = api_service.search_company(company_name, allow_fetch=allow_fetch)
     if not search_results:
-        return jsonify({
+        return {
             'error': f'Company "{company_name}" not found in {country.upper()}',
             'suggestion': 'Try: Apple, Microsoft, Tesla, Amazon, Google, Meta, Netflix, Nike'
-        }), 404
+        }, 404
 
     # --- REVISED LOGIC FOR CHOOSING BEST MATCH ---
     primary_exchanges = ['NASDAQ', 'NYSE']
@@ -29,7 +124,7 @@ def get_company_metrics(country, company_name):
     for c in search_results:
         if c.get('symbol', '').upper() == company_name.upper() and c.get('exchangeShortName', '') in primary_exchanges:
             best_match = c
-            current_app.logger.info(f"Found best match by exact symbol on primary exchange: {best_match.get('symbol')}")
+            current_app.logger.debug("Found best match by exact symbol on primary exchange: %s", best_match.get('symbol'))
             break
 
     # 2. If not found, prioritize name match on primary exchanges
@@ -37,28 +132,33 @@ def get_company_metrics(country, company_name):
         for c in search_results:
             if company_name.lower() in c.get('name', '').lower() and c.get('exchangeShortName', '') in primary_exchanges:
                 best_match = c
-                current_app.logger.info(f"Found best match by name on primary exchange: {best_match.get('symbol')}")
+                current_app.logger.debug("Found best match by name on primary exchange: %s", best_match.get('symbol'))
                 break
 
     # 3. As a fallback, take the first result from the API list (often the most relevant)
     if not best_match and search_results:
         best_match = search_results[0]
-        current_app.logger.info(f"Using first search result as fallback: {best_match.get('symbol')}")
+        current_app.logger.debug("Using first search result as fallback: %s", best_match.get('symbol'))
 
 
     if not best_match:
-        return jsonify({'error': 'Could not determine a best match from search results.'}), 404
+        return {'error': 'Could not determine a best match from search results.'}, 404
 
     symbol = best_match.get('symbol')
     if not symbol:
-        return jsonify({'error': 'Stock symbol not available for the best match.'}), 400
+        return {'error': 'Stock symbol not available for the best match.'}, 400
 
     # The service layer now handles caching internally
-    processed_data = api_service.get_company_data(symbol)
+    with span('company_data'):
+        processed_data = api_service.get_company_data(symbol, selection, allow_fetch=allow_fetch)
     if not processed_data:
-        return jsonify({'error': f'Failed to fetch or process data for symbol {symbol}'}), 500
+        return {'error': f'Failed to fetch or process data for symbol {symbol}'}, 500
+    autocomplete.record_hit(country.lower(), symbol)
+    return format_company_result(country, company_name, symbol, processed_data, selection), 200
+
 
-    # The data is already processed, we just need to format the final response
+def format_company_result(country, company_name, symbol, processed_data, selection=None):
+    """The response body for one company's data from ``get_company_data``."""
     profile = processed_data['profile']
     year_wise_data = processed_data['year_wise_financials']
 
@@ -77,8 +177,14 @@ def get_company_metrics(country, company_name):
             'description': (profile.get('description', '')[:200] + '...') if profile.get('description') else ''
         },
         'year_wise_financials': year_wise_data,
+        'peer_percentiles': processed_data.get('peer_percentiles'),
         'data_quality': {
             'data_source': f'Cached {country.upper()} API Data'
         }
     }
-    return jsonify(result)
+    if processed_data.get('degraded'):
+        # The request deadline ran out: 'stale' stored data or a 'partial' profile without statements
+        result['data_quality']['degraded'] = processed_data['degraded']
+    if selection is not None:
+        result = selection.apply(result)
+    return result
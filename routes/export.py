@@ -0,0 +1,57 @@
+import json
+from flask import Blueprint, Response, jsonify, current_app, request, stream_with_context
+from services.factory import APIServiceFactory
+from services.queries import iter_company_batches
+
+bp = Blueprint('export', __name__, url_prefix='/export')
+
+
+def _company_record(row, financials):
+    return {
+        'symbol': row.symbol,
+        'name': row.name,
+        'country': row.country_code.upper(),
+        'profile': {
+            'exchange': row.exchange,
+            'sector': row.sector,
+            'industry': row.industry,
+            'website': row.website,
+            'description': row.description,
+            'employees': row.full_time_employees,
+            'market_cap_usd': row.market_cap_usd,
+            'last_updated_ts': row.last_updated_ts,
+        },
+        'year_wise_financials': [{
+            'year': fin.year,
+            'employees': row.full_time_employees,
+            'revenue_usd': fin.revenue_usd,
+            'profit_usd': fin.profit_usd,
+            'share_capital_usd': fin.share_capital_usd,
+            'market_cap_usd': row.market_cap_usd,
+        } for fin in financials],
+    }
+
+
+@bp.route('/<country>', methods=['GET'])
+def export_companies(country):
+    """Streams every cached company for a country as NDJSON, one company per line."""
+    try:
+        APIServiceFactory.get_service(country)
+    except ValueError as e:
+        current_app.logger.error("%s", e)
+        return jsonify({'error': str(e)}), 404
+
+    updated_since = request.args.get('updated_since', type=int)
+    batch_size = current_app.config['EXPORT_BATCH_SIZE']
+    country_code = country.lower()
+    current_app.logger.info("Export requested for country '%s' (updated_since=%s)", country_code, updated_since)
+
+    def generate():
+        # One chunk per keyset batch keeps memory flat and writes reasonably sized.
+        for rows, financials in iter_company_batches(country_code, batch_size, updated_since):
+            yield ''.join(
+                json.dumps(_company_record(row, financials.get(row.id, ())), separators=(',', ':')) + '\n'
+                for row in rows if row.last_updated_ts is not None
+            )
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
@@ -70,7 +70,7 @@ def get_examples():
 @bp.route('/test', methods=['GET'])
 def quick_test():
     test_company = 'Apple'
-    current_app.logger.info(f"Running quick test with company: {test_company}")
+    current_app.logger.info("Running quick test with company: %s", test_company)
     search_results = us_api.search_company(test_company)
     if search_results:
         return jsonify({
@@ -0,0 +1,16 @@
+from flask import Blueprint, jsonify
+from services.jobs import get_job_runner
+
+bp = Blueprint('jobs', __name__, url_prefix='/jobs')
+
+
+@bp.route('/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Status of an async company lookup; ``result`` and ``result_status`` are set once it is done or failed."""
+    job = get_job_runner().get(job_id)
+    if job is None:
+        return jsonify({'error': f'Unknown or expired job {job_id}'}), 404
+    response = jsonify(job)
+    if job['status'] in ('queued', 'running'):
+        response.headers['Retry-After'] = '1'
+    return response
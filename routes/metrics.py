@@ -0,0 +1,8 @@
+from flask import Blueprint, Response
+from utils.metrics import REGISTRY
+
+bp = Blueprint('metrics', __name__)
+
+@bp.route('/metrics', methods=['GET'])
+def metrics():
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,28 @@
+from flask import Blueprint, jsonify, current_app, request
+from services import peer_stats
+from services.factory import APIServiceFactory
+from utils.timing import span
+
+bp = Blueprint('peers', __name__, url_prefix='/peers')
+
+@bp.route('/<country>', methods=['GET'])
+def get_peer_statistics(country):
+    """Precomputed distribution of revenue, profit and market cap for one sector (?sector=) or industry (?industry=)."""
+    try:
+        APIServiceFactory.get_service(country)
+    except ValueError as e:
+        current_app.logger.error("%s", e)
+        return jsonify({'error': str(e)}), 404
+
+    sector = request.args.get('sector')
+    industry = request.args.get('industry')
+    if bool(sector) == bool(industry):
+        return jsonify({'error': 'Pass exactly one of sector or industry'}), 400
+    kind, name = ('sector', sector) if sector else ('industry', industry)
+    year = request.args.get('year')
+
+    with span('peer_stats'):
+        stats = peer_stats.group_summary(country.lower(), kind, name, year)
+    if not stats:
+        return jsonify({'error': f'No peer statistics for {kind} "{name}" in {country.upper()}'}), 404
+    return jsonify({'country': country.upper(), kind: name, 'year': year, 'statistics': stats})
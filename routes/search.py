@@ -1,32 +1,65 @@
-from flask import Blueprint, jsonify, current_app
+from flask import Blueprint, jsonify, current_app, request
+from services import fanout
 from services.factory import APIServiceFactory
+from utils.pagination import decode_cursor, encode_cursor, page_limit
+from utils.timing import span
 
 bp = Blueprint('search', __name__, url_prefix='/search')
 
 @bp.route('/<country>/<company_name>', methods=['GET'])
 def search_companies(country, company_name):
-    current_app.logger.info(f"Search request for '{company_name}' in country '{country}'")
+    """Searches one country, or several at once with ``all`` or a comma-separated list (``us,uk``)."""
+    current_app.logger.info("Search request for '%s' in country '%s'", company_name, country)
     try:
-        api_service = APIServiceFactory.get_service(country)
+        countries = fanout.parse_countries(country)
     except ValueError as e:
-        current_app.logger.error(str(e))
+        current_app.logger.error("%s", e)
         return jsonify({'error': str(e)}), 404
 
-    search_results = api_service.search_company(company_name)
+    extra = {}
+    if country.lower() == 'all' or len(countries) > 1:
+        with span('search'):
+            result = fanout.search_countries(countries, company_name)
+        search_results = result.results
+        extra = {'countries': countries, 'timed_out': result.timed_out, 'failed': result.failed}
+    else:
+        with span('search'):
+            search_results = APIServiceFactory.get_service(countries[0]).search_company(company_name)
     if not search_results:
         return jsonify({
             'query': company_name,
             'message': f'No companies found in {country.upper()}',
-            'suggestions': ['Apple', 'Microsoft', 'Tesla', 'Amazon']
+            'suggestions': ['Apple', 'Microsoft', 'Tesla', 'Amazon'],
+            **extra
         })
+    # Pages keep the (provider or merged) ranking; the cursor is the (country, symbol) of the
+    # last result served, so a page resumes right after it rather than at an offset.
+    limit = page_limit(request.args.get('limit'), 10, 100)
+    start = 0
+    cursor = request.args.get('cursor')
+    if cursor:
+        try:
+            after = tuple(decode_cursor(cursor, 2))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        positions = [(c.get('country', countries[0]), c.get('symbol')) for c in search_results]
+        # If the result list was refreshed and no longer holds the symbol, the walk is over.
+        start = positions.index(after) + 1 if after in positions else len(positions)
+
+    page = search_results[start:start + limit]
     formatted_results = [{
         'name': c.get('name', ''),
         'symbol': c.get('symbol', ''),
         'exchange': c.get('exchangeShortName', ''),
-        'type': c.get('type', '')
-    } for c in search_results[:10]]
+        'type': c.get('type', ''),
+        **({'country': c['country']} if extra else {})
+    } for c in page]
+    has_more = start + limit < len(search_results)
+    last = page[-1] if page else None
     return jsonify({
         'query': company_name,
         'total_results': len(search_results),
-        'results': formatted_results
+        'results': formatted_results,
+        'next_cursor': encode_cursor(last.get('country', countries[0]), last.get('symbol')) if last and has_more else None,
+        **extra
     })
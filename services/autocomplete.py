@@ -0,0 +1,248 @@
+"""
+In-process typeahead index over company names and symbols.
+
+Each country has one ``PrefixIndex``: the normalised symbol, full name and every
+word start of the name (so "plat" finds "Meta Platforms") kept in one sorted
+list of strings, with a parallel list of entry ids. A prefix lookup is a
+``bisect`` range over that list. This is the flattened form of a compressed
+trie, and costs two list slots per key instead of a node object per character.
+Matches are ranked by popularity: company lookups served by this process,
+then market cap. Very short prefixes match thousands of keys, so their top
+results are memoised for a few seconds.
+
+The index is built lazily from the ``company`` table and cached search results.
+After that it grows incrementally. Companies and search results saved by this
+process are added as they are written; a company that comes back under a new
+name loses its old name's keys. Every ``AUTOCOMPLETE_REFRESH_SECONDS``,
+companies added and searches cached by other workers are pulled in with two
+delta queries: on ``company.id`` (the primary key) and on
+``search_cache (country_code, last_updated_ts)``.
+"""
+import heapq
+import json
+import re
+import threading
+import time
+from bisect import bisect_left
+
+from sqlalchemy import select
+
+from config import Config
+from models import db, Company, CompanyProfile, SearchCache
+
+_NON_WORD = re.compile(r'[^0-9a-z]+')
+
+# Prefix ranges longer than this use a short-lived memo of their top results
+_SCAN_LIMIT = 256
+_TOP_MEMO_SECONDS = 5.0
+_TOP_MEMO_SIZE = 50
+
+
+def normalize(text):
+    return _NON_WORD.sub(' ', (text or '').casefold()).strip()
+
+
+class PrefixIndex:
+    """Sorted-key prefix index with popularity ranking. All methods are thread-safe."""
+
+    def __init__(self):
+        self._keys = []
+        self._key_entries = []
+        self._by_symbol = {}
+        # Parallel per-entry columns
+        self._symbols = []
+        self._names = []
+        self._exchanges = []
+        self._market_caps = []
+        self._hits = []
+        self._top_memo = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._symbols)
+
+    def add(self, symbol, name, exchange=None, market_cap=None):
+        """Adds a company, or fills in details for one already indexed."""
+        self.add_many([(symbol, name, exchange, market_cap)])
+
+    def add_many(self, companies):
+        """Adds ``(symbol, name, exchange, market_cap)`` tuples; large batches are merged with one sort."""
+        with self._lock:
+            new_keys, stale_keys = [], []
+            for symbol, name, exchange, market_cap in companies:
+                if not symbol:
+                    continue
+                entry = self._by_symbol.get(symbol)
+                if entry is not None:
+                    if market_cap is not None:
+                        self._market_caps[entry] = market_cap
+                    if exchange and not self._exchanges[entry]:
+                        self._exchanges[entry] = exchange
+                    if name and normalize(name) != normalize(self._names[entry]):
+                        # Renamed: the old name's keys must stop matching
+                        old, new = self._name_keys(self._names[entry]), self._name_keys(name)
+                        own = {normalize(symbol)}
+                        stale_keys.extend((key, entry) for key in old - new - own)
+                        new_keys.extend((key, entry) for key in new - old - own)
+                        self._names[entry] = name
+                    continue
+                entry = len(self._symbols)
+                self._by_symbol[symbol] = entry
+                self._symbols.append(symbol)
+                self._names.append(name or '')
+                self._exchanges.append(exchange)
+                self._market_caps.append(market_cap or 0)
+                self._hits.append(0)
+                new_keys.extend((key, entry) for key in {normalize(symbol)} | self._name_keys(name))
+            self._remove_keys(stale_keys)
+            self._insert_keys(new_keys)
+
+    def record_hit(self, symbol):
+        with self._lock:
+            entry = self._by_symbol.get(symbol)
+            if entry is not None:
+                self._hits[entry] += 1
+
+    def search(self, query, limit):
+        prefix = normalize(query)
+        if not prefix:
+            return []
+        with self._lock:
+            lo = bisect_left(self._keys, prefix)
+            hi = bisect_left(self._keys, prefix + '\uffff', lo)
+            if hi - lo > _SCAN_LIMIT and limit <= _TOP_MEMO_SIZE:
+                memo = self._top_memo.get(prefix)
+                if memo is None or memo[0] < time.monotonic():
+                    memo = (time.monotonic() + _TOP_MEMO_SECONDS, self._top(lo, hi, _TOP_MEMO_SIZE))
+                    self._top_memo[prefix] = memo
+                entries = memo[1][:limit]
+            else:
+                entries = self._top(lo, hi, limit)
+            return [{'symbol': self._symbols[e], 'name': self._names[e], 'exchange': self._exchanges[e]}
+                    for e in entries]
+
+    def _top(self, lo, hi, limit):
+        candidates = set(self._key_entries[lo:hi])
+        hits, caps = self._hits, self._market_caps
+        return heapq.nlargest(limit, candidates, key=lambda e: (hits[e], caps[e]))
+
+    @staticmethod
+    def _name_keys(name):
+        words = normalize(name).split(' ')
+        return {' '.join(words[i:]) for i in range(len(words)) if words[i]}
+
+    def _remove_keys(self, pairs):
+        if not pairs:
+            return
+        if len(pairs) < 64:
+            for key, entry in pairs:
+                i = bisect_left(self._keys, key)
+                while i < len(self._keys) and self._keys[i] == key:
+                    if self._key_entries[i] == entry:
+                        del self._keys[i]
+                        del self._key_entries[i]
+                        break
+                    i += 1
+        else:
+            stale = set(pairs)
+            kept = [pair for pair in zip(self._keys, self._key_entries) if pair not in stale]
+            self._keys = [key for key, _ in kept]
+            self._key_entries = [entry for _, entry in kept]
+        self._top_memo.clear()
+
+    def _insert_keys(self, pairs):
+        if not pairs:
+            return
+        if len(pairs) < 64:
+            for key, entry in pairs:
+                i = bisect_left(self._keys, key)
+                self._keys.insert(i, key)
+                self._key_entries.insert(i, entry)
+        else:
+            merged = sorted([*zip(self._keys, self._key_entries), *pairs])
+            self._keys = [key for key, _ in merged]
+            self._key_entries = [entry for _, entry in merged]
+        self._top_memo.clear()
+
+
+class _CountryIndex:
+    def __init__(self, country_code):
+        self.country_code = country_code
+        self.index = PrefixIndex()
+        self.loaded = False
+        self.refreshed_at = 0.0
+        self.last_company_id = 0
+        self.last_search_ts = 0
+        self.lock = threading.Lock()
+
+    def refresh(self):
+        """Pulls companies and search results written since the last refresh (everything on first use)."""
+        if self.loaded and time.monotonic() - self.refreshed_at < Config.AUTOCOMPLETE_REFRESH_SECONDS:
+            return
+        # Once loaded, keystrokes keep using the current index while one request refreshes it.
+        if not self.lock.acquire(blocking=not self.loaded):
+            return
+        try:
+            if self.loaded and time.monotonic() - self.refreshed_at < Config.AUTOCOMPLETE_REFRESH_SECONDS:
+                return
+            stmt = (select(Company.id, Company.symbol, Company.name, CompanyProfile.exchange,
+                           CompanyProfile.market_cap_usd)
+                    .outerjoin(CompanyProfile, CompanyProfile.company_id == Company.id)
+                    .where(Company.country_code == self.country_code, Company.id > self.last_company_id)
+                    .order_by(Company.id))
+            rows = db.session.execute(stmt).all()
+            self.index.add_many((row.symbol, row.name, row.exchange, row.market_cap_usd) for row in rows)
+            if rows:
+                self.last_company_id = rows[-1].id
+
+            stmt = (select(SearchCache.results_json, SearchCache.last_updated_ts)
+                    .where(SearchCache.country_code == self.country_code,
+                           SearchCache.last_updated_ts >= self.last_search_ts))
+            for row in db.session.execute(stmt):
+                self.index.add_many((r.get('symbol'), r.get('name'), r.get('exchangeShortName'), None)
+                                    for r in json.loads(row.results_json))
+                self.last_search_ts = max(self.last_search_ts, row.last_updated_ts)
+
+            self.loaded = True
+            self.refreshed_at = time.monotonic()
+        finally:
+            self.lock.release()
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def _country(country_code):
+    country = _indexes.get(country_code)
+    if country is None:
+        with _indexes_lock:
+            country = _indexes.setdefault(country_code, _CountryIndex(country_code))
+    return country
+
+
+def suggest(country_code, query, limit=10):
+    """Top ``limit`` companies whose symbol, name or a word of the name starts with ``query``."""
+    country = _country(country_code)
+    country.refresh()
+    return country.index.search(query, limit)
+
+
+def add_company(country_code, symbol, name, exchange=None, market_cap=None):
+    """Called when a company is saved so it is suggested without waiting for a refresh."""
+    country = _indexes.get(country_code)
+    if country is not None:
+        country.index.add(symbol, name, exchange, market_cap)
+
+
+def add_search_results(country_code, results):
+    country = _indexes.get(country_code)
+    if country is not None:
+        country.index.add_many((r.get('symbol'), r.get('name'), r.get('exchangeShortName'), None) for r in results)
+
+
+def record_hit(country_code, symbol):
+    """Counts a served company lookup towards its suggestion ranking."""
+    country = _indexes.get(country_code)
+    if country is not None:
+        country.index.record_hit(symbol)
@@ -1,11 +1,38 @@
 from abc import ABC, abstractmethod
 
+
+class NotCachedError(Exception):
+    """Raised with ``allow_fetch=False`` when answering would need the upstream provider."""
+    pass
+
+
 class BaseCompanyAPI(ABC):
 
     @abstractmethod
-    def search_company(self, company_name):
+    def search_company(self, company_name, allow_fetch=True):
+        pass
+
+    @abstractmethod
+    def get_company_data(self, symbol, selection=None, allow_fetch=True):
+        """``selection`` is an optional utils.fields.FieldSelection limiting what is read."""
+        pass
+
+    # Used by ``flask backfill``
+    @abstractmethod
+    def list_symbols(self, exchanges):
+        """All stock symbols the provider lists on ``exchanges``."""
         pass
 
     @abstractmethod
-    def get_company_data(self, symbol):
+    def has_fresh_data(self, symbol):
+        """True when the stored profile and statements for ``symbol`` do not need a refresh."""
+        pass
+
+    @abstractmethod
+    def refresh_company(self, symbol):
+        """Fetches and saves ``symbol`` from upstream; returns False if the provider had no data."""
+        pass
+
+    def prefetch_company_data(self, symbols):
+        """Hint that ``symbols`` are about to be looked up; services that batch upstream calls load them ahead."""
         pass
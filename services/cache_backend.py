@@ -0,0 +1,302 @@
+"""
+Shared cache backends for search results and rendered company data.
+
+All backends speak the same small interface (``get_many`` / ``set_many`` /
+``delete``, plus single-key helpers) and store JSON-serialisable values with a
+TTL in seconds. Keys are built with ``make_key`` so bumping
+``Config.CACHE_KEY_VERSION`` invalidates every node's entries at once.
+
+Select one with ``CACHE_BACKEND``:
+  none    caching disabled; every lookup falls through to the database (default)
+  memory  per-process LRU dict (not shared between workers, so it can serve data another worker has replaced)
+  redis   any Redis-protocol server at ``CACHE_REDIS_URL`` (shared by all workers and nodes)
+  sql     the ``cache_entry`` table in the application database (shared, no extra service)
+
+The shared backends fail open: a read error is a miss and a write error is logged.
+"""
+import json
+import logging
+import queue
+import socket
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+from sqlalchemy import delete, insert, select
+from sqlalchemy.exc import SQLAlchemyError
+
+from config import Config
+from utils.database import write_lock
+from models import db, CacheEntry
+
+logger = logging.getLogger(__name__)
+
+
+def make_key(namespace, *parts):
+    """Builds a versioned cache key, e.g. ``cd:v1:company:us:AAPL``."""
+    return ':'.join(['cd', f"v{Config.CACHE_KEY_VERSION}", namespace, *(str(p) for p in parts)])
+
+
+class BaseCacheBackend(ABC):
+
+    @abstractmethod
+    def get_many(self, keys):
+        """Returns a dict with the keys that were found and not expired."""
+        pass
+
+    @abstractmethod
+    def set_many(self, mapping, ttl):
+        pass
+
+    @abstractmethod
+    def delete(self, key):
+        pass
+
+    def get(self, key):
+        return self.get_many([key]).get(key)
+
+    def set(self, key, value, ttl):
+        self.set_many({key: value}, ttl)
+
+
+class NullCacheBackend(BaseCacheBackend):
+    def get_many(self, keys):
+        return {}
+
+    def set_many(self, mapping, ttl):
+        pass
+
+    def delete(self, key):
+        pass
+
+
+class InProcessCacheBackend(BaseCacheBackend):
+    """Thread-safe LRU dict. Values are shared, not copied, so callers must not mutate them."""
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys):
+        now = time.monotonic()
+        found = {}
+        with self._lock:
+            for key in keys:
+                entry = self._data.get(key)
+                if entry is None:
+                    continue
+                expires_at, value = entry
+                if expires_at <= now:
+                    del self._data[key]
+                    continue
+                self._data.move_to_end(key)
+                found[key] = value
+        return found
+
+    def set_many(self, mapping, ttl):
+        if ttl <= 0:
+            return
+        expires_at = time.monotonic() + ttl
+        with self._lock:
+            for key, value in mapping.items():
+                self._data[key] = (expires_at, value)
+                self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+
+class RedisError(Exception):
+    pass
+
+
+class _RedisConnection:
+    """A single RESP connection; just enough protocol for the commands used here."""
+
+    def __init__(self, host, port, timeout):
+        self.sock = socket.create_connection((host, port), timeout=timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.reader = self.sock.makefile('rb')
+
+    @staticmethod
+    def _encode(args):
+        out = [b'*%d\r\n' % len(args)]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode('utf-8')
+            out.append(b'$%d\r\n%s\r\n' % (len(arg), arg))
+        return b''.join(out)
+
+    def _read_reply(self):
+        line = self.reader.readline()
+        if not line:
+            raise ConnectionError('Connection closed by cache server')
+        kind, rest = line[:1], line[1:-2]
+        if kind == b'+':
+            return rest.decode('utf-8')
+        if kind == b'-':
+            raise RedisError(rest.decode('utf-8'))
+        if kind == b':':
+            return int(rest)
+        if kind == b'$':
+            length = int(rest)
+            if length == -1:
+                return None
+            data = self.reader.read(length + 2)
+            return data[:-2]
+        if kind == b'*':
+            length = int(rest)
+            if length == -1:
+                return None
+            return [self._read_reply() for _ in range(length)]
+        raise RedisError(f"Unexpected reply type: {line!r}")
+
+    def pipeline(self, commands):
+        """Sends all commands in one write and reads one reply per command."""
+        self.sock.sendall(b''.join(self._encode(c) for c in commands))
+        return [self._read_reply() for _ in commands]
+
+    def close(self):
+        try:
+            self.reader.close()
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class RedisCacheBackend(BaseCacheBackend):
+    """Redis-protocol backend with a small connection pool. Errors degrade to cache misses."""
+
+    def __init__(self, url, timeout=0.25, pool_size=10):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or '127.0.0.1'
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db_index = int(parsed.path.lstrip('/') or 0)
+        self.timeout = timeout
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+
+    def _connect(self):
+        conn = _RedisConnection(self.host, self.port, self.timeout)
+        setup = []
+        if self.password:
+            setup.append(['AUTH', self.password])
+        if self.db_index:
+            setup.append(['SELECT', self.db_index])
+        if setup:
+            conn.pipeline(setup)
+        return conn
+
+    def execute(self, commands):
+        try:
+            conn = self._pool.get_nowait()
+        except queue.Empty:
+            conn = self._connect()
+        try:
+            replies = conn.pipeline(commands)
+        except (OSError, ConnectionError, RedisError):
+            # The connection may still hold unread replies; never reuse it.
+            conn.close()
+            raise
+        try:
+            self._pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+        return replies
+
+    def get_many(self, keys):
+        keys = list(keys)
+        if not keys:
+            return {}
+        try:
+            values = self.execute([['MGET', *keys]])[0]
+        except (OSError, ConnectionError, RedisError) as e:
+            logger.warning("Cache backend read failed: %s", e)
+            return {}
+        return {key: json.loads(value) for key, value in zip(keys, values) if value is not None}
+
+    def set_many(self, mapping, ttl):
+        ttl = int(ttl)
+        if not mapping or ttl <= 0:
+            return
+        commands = [['SET', key, json.dumps(value), 'EX', ttl] for key, value in mapping.items()]
+        try:
+            self.execute(commands)
+        except (OSError, ConnectionError, RedisError) as e:
+            logger.warning("Cache backend write failed: %s", e)
+
+    def delete(self, key):
+        try:
+            self.execute([['DEL', key]])
+        except (OSError, ConnectionError, RedisError) as e:
+            logger.warning("Cache backend delete failed: %s", e)
+
+
+class SQLCacheBackend(BaseCacheBackend):
+    """Stores entries in the ``cache_entry`` table using short Core transactions on the engine. Errors degrade to cache misses."""
+
+    def get_many(self, keys):
+        keys = list(keys)
+        if not keys:
+            return {}
+        stmt = select(CacheEntry.key, CacheEntry.value).where(
+            CacheEntry.key.in_(keys), CacheEntry.expires_ts > int(time.time())
+        )
+        try:
+            with db.engine.connect() as conn:
+                return {key: json.loads(value) for key, value in conn.execute(stmt)}
+        except SQLAlchemyError as e:
+            logger.warning("Cache backend read failed: %s", e)
+            return {}
+
+    def set_many(self, mapping, ttl):
+        if not mapping or ttl <= 0:
+            return
+        expires_ts = int(time.time() + ttl)
+        rows = [{'key': key, 'value': json.dumps(value), 'expires_ts': expires_ts} for key, value in mapping.items()]
+        try:
+            with write_lock(), db.engine.begin() as conn:
+                conn.execute(delete(CacheEntry).where(CacheEntry.key.in_(list(mapping))))
+                conn.execute(insert(CacheEntry), rows)
+        except SQLAlchemyError as e:
+            logger.warning("Cache backend write failed: %s", e)
+
+    def delete(self, key):
+        try:
+            with write_lock(), db.engine.begin() as conn:
+                conn.execute(delete(CacheEntry).where(CacheEntry.key == key))
+        except SQLAlchemyError as e:
+            logger.warning("Cache backend delete failed: %s", e)
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def create_cache_backend(name):
+    name = (name or 'none').lower()
+    if name == 'memory':
+        return InProcessCacheBackend(Config.CACHE_MEMORY_MAX_ENTRIES)
+    if name == 'redis':
+        return RedisCacheBackend(Config.CACHE_REDIS_URL, timeout=Config.CACHE_REDIS_TIMEOUT)
+    if name == 'sql':
+        return SQLCacheBackend()
+    if name == 'none':
+        return NullCacheBackend()
+    raise ValueError(f"Unknown cache backend: {name}")
+
+
+def get_cache_backend():
+    """Returns the process-wide backend selected by ``Config.CACHE_BACKEND``."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = create_cache_backend(Config.CACHE_BACKEND)
+    return _backend
@@ -15,3 +15,8 @@ class APIServiceFactory:
         if not service:
             raise ValueError(f"No service found for country code: {country_code}")
         return service
+
+    @classmethod
+    def countries(cls):
+        """Country codes of every registered service."""
+        return list(cls._services)
@@ -0,0 +1,153 @@
+"""
+Concurrent search across several country providers.
+
+``search_countries`` runs ``search_company`` for every requested country at the
+same time on a shared thread pool. Each provider goes through its own caches as
+usual. Each provider has its own deadline, measured from the start of the
+fan-out: ``SEARCH_FANOUT_TIMEOUT`` seconds by default, overridable per country
+with ``SEARCH_FANOUT_TIMEOUTS`` ("us=1.5,uk=3"), and never later than the
+request's own deadline. A slow provider is reported as timed out instead of
+holding up the response. Its search keeps running in the background, so its
+cache is warm for the next request.
+
+A provider whose search is shed by admission control or rate limited fails the
+whole fan-out with that error, so the client gets the 503 or 429 rather than
+an empty result. When no provider answered before the request's own deadline
+ran out, DeadlineExceeded is raised too.
+
+Results are merged into one list, de-duplicated by symbol and ranked by how
+well the symbol or name matches the query, then by each provider's own order.
+"""
+import logging
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from config import Config
+from services.autocomplete import normalize
+from services.factory import APIServiceFactory
+from utils import deadline
+from utils.admission import Overloaded
+from utils.concurrency import in_current_context
+from utils.deadline import DeadlineExceeded
+from utils.metrics import SEARCH_FANOUT
+from utils.rate_limit import RateLimited
+
+logger = logging.getLogger(__name__)
+
+FanOut = namedtuple('FanOut', 'results timed_out failed')
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def _parse_timeouts(spec):
+    timeouts = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        country, _, seconds = item.partition('=')
+        timeouts[country.strip().lower()] = float(seconds)
+    return timeouts
+
+
+_timeouts = _parse_timeouts(Config.SEARCH_FANOUT_TIMEOUTS)
+
+
+def _pool():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=Config.SEARCH_FANOUT_WORKERS,
+                                               thread_name_prefix='search-fanout')
+    return _executor
+
+
+def parse_countries(spec):
+    """
+    ``"all"`` or ``"us,uk"`` -> list of country codes; a single code gives a one-item list.
+
+    Raises ValueError for an unknown country.
+    """
+    if spec.lower() == 'all':
+        return APIServiceFactory.countries()
+    countries = list(dict.fromkeys(c.strip().lower() for c in spec.split(',') if c.strip()))
+    if not countries:
+        raise ValueError(f"No service found for country code: {spec}")
+    for country in countries:
+        APIServiceFactory.get_service(country)
+    return countries
+
+
+def _submit(country, company_name):
+    search = APIServiceFactory.get_service(country).search_company
+    return _pool().submit(in_current_context(search), company_name)
+
+
+def search_countries(countries, company_name):
+    """Searches ``countries`` concurrently; returns a FanOut of merged results and late/failed providers."""
+    started = time.monotonic()
+    budget = deadline.remaining()
+    futures = {country: _submit(country, company_name) for country in countries}
+
+    def timeout_for(country):
+        timeout = _timeouts.get(country, Config.SEARCH_FANOUT_TIMEOUT)
+        return timeout if budget is None else min(timeout, budget)
+
+    per_country, timed_out, failed = {}, [], []
+    for country in sorted(countries, key=timeout_for):
+        due = started + timeout_for(country)
+        try:
+            per_country[country] = futures[country].result(timeout=max(0.0, due - time.monotonic())) or []
+            SEARCH_FANOUT.inc(country, 'ok')
+        except (Overloaded, RateLimited):
+            SEARCH_FANOUT.inc(country, 'rejected')
+            raise
+        except (TimeoutError, DeadlineExceeded):
+            timed_out.append(country)
+            SEARCH_FANOUT.inc(country, 'timeout')
+            logger.warning("Search for '%s' in '%s' missed its deadline", company_name, country)
+        except Exception as e:
+            failed.append(country)
+            SEARCH_FANOUT.inc(country, 'error')
+            logger.warning("Search for '%s' in '%s' failed: %s", company_name, country, e)
+    if timed_out and not per_country and deadline.expired():
+        raise DeadlineExceeded(company_name)
+    return FanOut(merge_results(company_name, countries, per_country), timed_out, failed)
+
+
+def _match_rank(query, result):
+    symbol = normalize(result.get('symbol'))
+    name = normalize(result.get('name'))
+    if symbol == query:
+        return 0
+    if name == query:
+        return 1
+    if name.startswith(query):
+        return 2
+    if f" {query}" in f" {name}":
+        return 3
+    return 4
+
+
+def merge_results(company_name, countries, per_country):
+    """
+    One ranked list from each country's results, de-duplicated by symbol.
+
+    Results are copied with a ``country`` key added; cached lists are never modified.
+    """
+    query = normalize(company_name)
+    ranked = []
+    for order, country in enumerate(countries):
+        for position, result in enumerate(per_country.get(country, ())):
+            ranked.append(((_match_rank(query, result), position, order), country, result))
+    ranked.sort(key=lambda item: item[0])
+
+    merged, seen = [], set()
+    for _, country, result in ranked:
+        symbol = (result.get('symbol') or '').upper()
+        if symbol and symbol in seen:
+            continue
+        seen.add(symbol)
+        merged.append({**result, 'country': country})
+    return merged
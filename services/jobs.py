@@ -0,0 +1,116 @@
+"""
+Background jobs for slow cold company lookups.
+
+A client opts in with ``?async=true`` or ``Prefer: respond-async``. Lookups that
+can be answered from cache still return synchronously. When a lookup needs the
+upstream provider, it is handed to a bounded thread pool, and the request gets
+``202 Accepted`` with a job id to poll at ``/jobs/<id>``.
+
+Job state is kept in this process and mirrored to the shared cache backend,
+so with ``redis`` or ``sql`` any worker can answer a poll. Identical lookups
+that are already queued or running share one job. When ``JOB_MAX_PENDING``
+jobs are outstanding, new ones are refused instead of queueing without bound.
+"""
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from config import Config
+from services.cache_backend import get_cache_backend, make_key
+from utils.metrics import JOBS_PENDING
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class JobRunner:
+
+    def __init__(self, workers=4, max_pending=100, result_ttl=600):
+        self.max_pending = max_pending
+        self.result_ttl = result_ttl
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='company-job')
+        self._jobs = {}
+        self._active = {}  # dedupe key -> id of the queued/running job
+        self._lock = threading.Lock()
+
+    def submit(self, app, dedupe_key, fn, *args):
+        """
+        Runs ``fn(*args)`` in the pool inside an app context and returns the job's state.
+
+        ``fn`` must return ``(body, status_code)``. Raises JobQueueFull when too many jobs
+        are outstanding.
+        """
+        with self._lock:
+            self._expire()
+            job_id = self._active.get(dedupe_key)
+            if job_id is not None:
+                return dict(self._jobs[job_id])
+            if len(self._active) >= self.max_pending:
+                raise JobQueueFull()
+            job = {'job_id': uuid.uuid4().hex, 'status': 'queued', 'created_ts': int(time.time())}
+            self._jobs[job['job_id']] = job
+            self._active[dedupe_key] = job['job_id']
+            snapshot = dict(job)
+        JOBS_PENDING.inc()
+        self._publish(snapshot)
+        self._executor.submit(self._run, app, job['job_id'], dedupe_key, fn, args)
+        return snapshot
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return dict(job)
+        return get_cache_backend().get(make_key('job', job_id))
+
+    def _run(self, app, job_id, dedupe_key, fn, args):
+        with app.app_context():
+            self._update(job_id, status='running')
+            try:
+                body, status_code = fn(*args)
+                self._update(job_id, status='done', result=body, result_status=status_code)
+            except Exception:
+                logger.exception("Job %s failed", job_id)
+                self._update(job_id, status='failed', result={'error': 'Internal error while fetching company data'},
+                             result_status=500)
+            finally:
+                with self._lock:
+                    self._active.pop(dedupe_key, None)
+                JOBS_PENDING.dec()
+
+    def _update(self, job_id, **changes):
+        with self._lock:
+            job = self._jobs[job_id]
+            job.update(changes)
+            if changes.get('status') in ('done', 'failed'):
+                job['finished_ts'] = int(time.time())
+            snapshot = dict(job)
+        self._publish(snapshot)
+
+    def _publish(self, job):
+        # Shared-cache values must never be mutated afterwards, hence the copies.
+        get_cache_backend().set(make_key('job', job['job_id']), job, self.result_ttl)
+
+    def _expire(self):
+        cutoff = time.time() - self.result_ttl
+        for job_id in [j for j, job in self._jobs.items() if job.get('finished_ts', time.time()) < cutoff]:
+            del self._jobs[job_id]
+
+
+_runner = None
+_runner_lock = threading.Lock()
+
+
+def get_job_runner():
+    """Returns the process-wide job runner sized by ``JOB_WORKERS`` / ``JOB_MAX_PENDING``."""
+    global _runner
+    if _runner is None:
+        with _runner_lock:
+            if _runner is None:
+                _runner = JobRunner(Config.JOB_WORKERS, Config.JOB_MAX_PENDING, Config.JOB_RESULT_TTL)
+    return _runner
@@ -0,0 +1,386 @@
+"""
+Sector and industry peer statistics.
+
+For every (country, sector or industry, fiscal year, metric) the ``peer_stat``
+table keeps the peer count, the mean and 101 quantile breakpoints (p0..p100)
+of revenue and profit. It keeps the same for market cap, with year ``''``.
+Placing a company in its sector takes one indexed read of a few small rows and
+a bisect over the breakpoints, not a scan of every peer's statements. The decoded
+rows are memoised per process for ``PEER_STATS_MEMO_SECONDS``.
+
+Each company's values live in ``peer_member``, one row per group, year and
+metric. Saving a company only touches its own rows (about 22 at most), in the
+same transaction, and marks the groups whose values changed as dirty. Once
+the transaction commits, a background refresher recomputes the dirty groups'
+``peer_stat`` rows from ``peer_member`` every ``PEER_STATS_REFRESH_SECONDS``.
+A sector is therefore recomputed at most once per interval however often its
+companies are saved. Percentiles lag saves by up to one interval. The exception
+is a group a save joins that has no ``peer_stat`` row yet: it has few members,
+so its rows are computed in the save's transaction and the first company in a
+sector gets its percentiles and ``/peers`` summary straight away. Dirty groups are kept in process memory: a hard kill
+forgets them until the group changes again. ``flask peers rebuild`` recomputes
+everything from the company tables, e.g. after a snapshot import.
+"""
+import atexit
+import json
+import logging
+import threading
+import time
+from bisect import bisect_right
+from collections import defaultdict
+
+from sqlalchemy import and_, bindparam, delete, event, insert, or_, select
+
+from config import Config
+from models import db, PeerMember, PeerStat
+from utils.database import RoutingSession, use_primary, write_lock
+
+logger = logging.getLogger(__name__)
+
+STATEMENT_METRICS = ('revenue_usd', 'profit_usd')
+POINT_IN_TIME_YEAR = ''
+GROUP_KINDS = ('sector', 'industry')
+
+_stat_t = PeerStat.__table__
+_percentiles_statement = (
+    select(_stat_t.c.group_kind, _stat_t.c.group_name, _stat_t.c.year, _stat_t.c.metric,
+           _stat_t.c.peer_count, _stat_t.c.quantiles_json)
+    .where(_stat_t.c.country_code == bindparam('country_code'),
+           or_(_stat_t.c.year == bindparam('year'), _stat_t.c.year == POINT_IN_TIME_YEAR),
+           or_(and_(_stat_t.c.group_kind == 'sector', _stat_t.c.group_name == bindparam('sector')),
+               and_(_stat_t.c.group_kind == 'industry', _stat_t.c.group_name == bindparam('industry'))))
+)
+
+_member_t = PeerMember.__table__
+_group_values_statement = select(_member_t.c.value).where(
+    _member_t.c.country_code == bindparam('country_code'), _member_t.c.group_kind == bindparam('group_kind'),
+    _member_t.c.group_name == bindparam('group_name'), _member_t.c.year == bindparam('year'),
+    _member_t.c.metric == bindparam('metric'))
+_group_stat_statement = select(PeerStat).where(
+    PeerStat.country_code == bindparam('country_code'), PeerStat.group_kind == bindparam('group_kind'),
+    PeerStat.group_name == bindparam('group_name'), PeerStat.year == bindparam('year'),
+    PeerStat.metric == bindparam('metric'))
+
+# Session.info key of the groups a transaction changed, queued for refresh on commit
+_DIRTY = 'peer_stats_dirty'
+
+# Decoded stat rows per (country, sector, industry, year), kept for PEER_STATS_MEMO_SECONDS
+_memo = {}
+_MEMO_MAX = 4096
+
+
+def _group_stats(country_code, sector, industry, year):
+    key = (country_code, sector, industry, year)
+    entry = _memo.get(key)
+    if entry is not None and entry[0] > time.monotonic():
+        return entry[1]
+    rows = db.session.execute(_percentiles_statement, {
+        'country_code': country_code, 'year': year or POINT_IN_TIME_YEAR,
+        'sector': sector or '', 'industry': industry or '',
+    })
+    found = {(row.group_kind, row.group_name, row.year, row.metric): (row.peer_count, json.loads(row.quantiles_json))
+             for row in rows}
+    if len(_memo) >= _MEMO_MAX:
+        _memo.clear()
+    _memo[key] = (time.monotonic() + Config.PEER_STATS_MEMO_SECONDS, found)
+    return found
+
+
+def groups_of(sector, industry):
+    """The ``(kind, name)`` peer groups a company with this sector and industry belongs to."""
+    return [(kind, name) for kind, name in zip(GROUP_KINDS, (sector, industry)) if name]
+
+
+def company_values(market_cap, statements):
+    """
+    ``{(year, metric): value}`` a company contributes, from its market cap and
+    ``{year: {metric: value}}`` statements; missing values contribute nothing.
+    """
+    values = {}
+    if market_cap is not None:
+        values[(POINT_IN_TIME_YEAR, 'market_cap_usd')] = market_cap
+    for year, row in statements.items():
+        for metric in STATEMENT_METRICS:
+            if row.get(metric) is not None:
+                values[(year, metric)] = row[metric]
+    return values
+
+
+def quantiles(values):
+    """101 linearly interpolated breakpoints p0..p100 of ``values``."""
+    ordered = sorted(values)
+    last = len(ordered) - 1
+    points = []
+    for p in range(101):
+        pos = last * p / 100
+        lo = int(pos)
+        hi = min(lo + 1, last)
+        points.append(ordered[lo] + (ordered[hi] - ordered[lo]) * (pos - lo))
+    return points
+
+
+def percentile_of(points, value):
+    """Approximate percentile rank (0-100) of ``value`` within the distribution described by ``points``."""
+    i = bisect_right(points, value) - 1
+    if i < 0:
+        return 0.0
+    if i >= 100:
+        return 100.0
+    span = points[i + 1] - points[i]
+    return round(i + ((value - points[i]) / span if span else 0.0), 1)
+
+
+def _apply(stat, values):
+    stat.quantiles_json = json.dumps(quantiles(values), separators=(',', ':'))
+    stat.peer_count = len(values)
+    stat.mean_value = sum(values) / len(values)
+    stat.updated_ts = int(time.time())
+
+
+def update_company(country_code, company_id, groups, values, only=None):
+    """
+    Replaces one company's peer values in the current session (the caller commits).
+
+    ``values`` (from ``company_values``) become its values in each of ``groups``;
+    rows in groups it left are removed. With ``only``, a set of ``(year, metric)``,
+    just those values are replaced. Changed groups are refreshed after the commit.
+    """
+    wanted = {(kind, name, year, metric): value
+              for kind, name in groups for (year, metric), value in values.items()}
+    changed, added = set(), set()
+    for member in db.session.execute(select(PeerMember).where(PeerMember.company_id == company_id)).scalars():
+        key = (member.group_kind, member.group_name, member.year, member.metric)
+        if only is not None and key[2:] not in only:
+            continue
+        value = wanted.pop(key, None)
+        if value is None:
+            db.session.delete(member)
+            changed.add(key)
+        elif member.value != value:
+            member.value = value
+            changed.add(key)
+    for key, value in wanted.items():
+        if only is not None and key[2:] not in only:
+            continue
+        kind, name, year, metric = key
+        db.session.add(PeerMember(country_code=country_code, group_kind=kind, group_name=name, year=year,
+                                  metric=metric, company_id=company_id, value=value))
+        changed.add(key)
+        added.add(key)
+    if added:
+        new = _without_stats(country_code, added)
+        if new:
+            db.session.flush()
+            recompute(sorted((country_code, *key) for key in new))
+            changed -= new
+    if changed:
+        db.session.info.setdefault(_DIRTY, set()).update((country_code, *key) for key in changed)
+
+
+def _without_stats(country_code, keys):
+    """The ``(kind, name, year, metric)`` keys that have no ``peer_stat`` row yet."""
+    existing = db.session.execute(
+        select(_stat_t.c.group_kind, _stat_t.c.group_name, _stat_t.c.year, _stat_t.c.metric)
+        .where(_stat_t.c.country_code == country_code, _stat_t.c.group_name.in_({key[1] for key in keys}))
+    ).all()
+    return set(keys) - {tuple(row) for row in existing}
+
+
+def recompute(groups):
+    """
+    Recomputes the ``peer_stat`` rows of ``(country, kind, name, year, metric)`` groups
+    from ``peer_member`` (the caller commits).
+    """
+    for country_code, kind, name, year, metric in groups:
+        params = {'country_code': country_code, 'group_kind': kind, 'group_name': name,
+                  'year': year, 'metric': metric}
+        values = db.session.execute(_group_values_statement, params).scalars().all()
+        stat = db.session.execute(_group_stat_statement, params).scalar_one_or_none()
+        if not values:
+            if stat is not None:
+                db.session.delete(stat)
+            continue
+        if stat is None:
+            stat = PeerStat(country_code=country_code, group_kind=kind, group_name=name, year=year, metric=metric)
+            db.session.add(stat)
+        _apply(stat, values)
+    _memo.clear()
+
+
+def company_percentiles(country_code, sector, industry, market_cap, latest_statement):
+    """
+    Where a company sits among its sector and industry peers, or None without either.
+
+    ``latest_statement`` is its newest statement row (``year``, ``revenue_usd``,
+    ``profit_usd``) or None. Groups smaller than ``PEER_STATS_MIN_PEERS`` report
+    their peer count but no percentile.
+    """
+    groups = groups_of(sector, industry)
+    if not groups:
+        return None
+    year = latest_statement['year'] if latest_statement else None
+    own = {(POINT_IN_TIME_YEAR, 'market_cap_usd'): market_cap}
+    if year:
+        own.update({(year, metric): latest_statement.get(metric) for metric in STATEMENT_METRICS})
+
+    found = _group_stats(country_code, sector, industry, year)
+
+    result = {}
+    for kind, name in groups:
+        metrics = {}
+        for (stat_year, metric), value in own.items():
+            stat = found.get((kind, name, stat_year, metric))
+            if stat is None or value is None:
+                metrics[metric] = None
+                continue
+            peers, points = stat
+            percentile = percentile_of(points, value) if peers >= Config.PEER_STATS_MIN_PEERS else None
+            metrics[metric] = {'percentile': percentile, 'peers': peers}
+        result[kind] = {'name': name, 'year': year, **metrics}
+    return result
+
+
+def group_summary(country_code, kind, name, year=None):
+    """Distribution summaries of every metric and year stored for one peer group."""
+    stmt = (select(PeerStat.year, PeerStat.metric, PeerStat.peer_count, PeerStat.mean_value, PeerStat.quantiles_json)
+            .where(PeerStat.country_code == country_code, PeerStat.group_kind == kind, PeerStat.group_name == name)
+            .order_by(PeerStat.year.desc(), PeerStat.metric))
+    if year is not None:
+        stmt = stmt.where(PeerStat.year.in_((year, POINT_IN_TIME_YEAR)))
+    summaries = []
+    for row in db.session.execute(stmt):
+        points = json.loads(row.quantiles_json)
+        summaries.append({
+            'year': row.year or None, 'metric': row.metric, 'peers': row.peer_count, 'mean': row.mean_value,
+            'min': points[0], 'p10': points[10], 'p25': points[25], 'median': points[50],
+            'p75': points[75], 'p90': points[90], 'max': points[100],
+        })
+    return summaries
+
+
+def rebuild(company_batches, country_code=None):
+    """
+    Recomputes ``peer_member`` and ``peer_stat`` from ``iter_company_batches`` output and
+    replaces the stored rows (for one country, or all); returns the number of stat rows written.
+    """
+    members = defaultdict(dict)
+    for rows, financials in company_batches:
+        for row in rows:
+            statements = {fin.year: {m: getattr(fin, m) for m in STATEMENT_METRICS}
+                          for fin in financials.get(row.id, ())}
+            values = company_values(row.market_cap_usd, statements)
+            for kind, name in groups_of(row.sector, row.industry):
+                for (year, metric), value in values.items():
+                    members[(row.country_code, kind, name, year, metric)][row.id] = value
+
+    stats, member_rows = [], []
+    for (cc, kind, name, year, metric), group in members.items():
+        stat = PeerStat(country_code=cc, group_kind=kind, group_name=name, year=year, metric=metric)
+        _apply(stat, list(group.values()))
+        stats.append({c.name: getattr(stat, c.name) for c in _stat_t.c if c.name != 'id'})
+        member_rows.extend({'country_code': cc, 'group_kind': kind, 'group_name': name, 'year': year,
+                            'metric': metric, 'company_id': company_id, 'value': value}
+                           for company_id, value in group.items())
+
+    for table, rows in ((PeerStat, stats), (PeerMember, member_rows)):
+        clear = delete(table)
+        if country_code:
+            clear = clear.where(table.country_code == country_code)
+        db.session.execute(clear)
+        for i in range(0, len(rows), 1000):
+            db.session.execute(insert(table), rows[i:i + 1000])
+    db.session.commit()
+    _memo.clear()
+    return len(stats)
+
+
+class StatsRefresher:
+    """Recomputes the peer groups changed by committed saves, in the background."""
+
+    def __init__(self, app, interval=30.0):
+        self.app = app
+        self.interval = interval
+        self._dirty = set()
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = False
+        self._stop = None
+        self._thread = None
+
+    def mark(self, groups):
+        with self._lock:
+            self._dirty.update(groups)
+            if self._thread is None and not self._stopped:
+                self._stop = threading.Event()
+                self._thread = threading.Thread(target=self._run, args=(self._stop,), name='peer-stats-refresher',
+                                                daemon=True)
+                self._thread.start()
+
+    def refresh(self):
+        """Recomputes every group marked so far; returns how many were recomputed."""
+        with self._refresh_lock:
+            with self._lock:
+                groups, self._dirty = self._dirty, set()
+            if not groups:
+                return 0
+            try:
+                with self.app.app_context(), write_lock():
+                    use_primary(db.session)
+                    recompute(sorted(groups))
+                    db.session.commit()
+            except Exception:
+                logger.exception("Refreshing %d peer groups failed; will retry", len(groups))
+                with self._lock:
+                    self._dirty.update(groups)
+                return 0
+            return len(groups)
+
+    def _run(self, stop):
+        while not (self._stopped or stop.is_set()):
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.refresh()
+
+    def drain(self):
+        """Stops the background thread and recomputes what is marked; the next ``mark`` starts a new one."""
+        with self._lock:
+            thread, stop, self._thread = self._thread, self._stop, None
+        if thread is not None:
+            stop.set()
+            self._wake.set()
+            thread.join(timeout=10)
+        return self.refresh()
+
+    def close(self):
+        """Stops the refresher for good and recomputes what is still marked."""
+        self._stopped = True
+        self.drain()
+
+
+_refresher = None
+
+
+def stats_refresher():
+    """The process-wide refresher, or None before ``init_app``."""
+    return _refresher
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _queue_refresh(session):
+    groups = session.info.pop(_DIRTY, None)
+    if groups and _refresher is not None:
+        _refresher.mark(groups)
+
+
+@event.listens_for(RoutingSession, 'after_rollback')
+def _forget_changes(session):
+    session.info.pop(_DIRTY, None)
+
+
+def init_app(app):
+    global _refresher
+    if _refresher is not None:
+        return
+    _refresher = StatsRefresher(app, app.config['PEER_STATS_REFRESH_SECONDS'])
+    atexit.register(_refresher.close)
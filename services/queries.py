@@ -0,0 +1,138 @@
+"""
+Core (ORM-free) read helpers shared by the services, CLI commands and streaming endpoints.
+
+Reads return plain Core rows (tuple-backed, attribute access by column name)
+instead of ORM objects, skipping identity-map and instrumentation overhead; the
+ORM is only used for writes. Companies are walked with keyset pagination on
+``company.id`` so every batch is an indexed range scan, and only one batch is
+held in memory at a time.
+"""
+from collections import defaultdict
+
+from sqlalchemy import Integer, bindparam, select
+
+from models import db, Company, CompanyProfile, FinancialStatement
+from utils.database import recently_written, use_primary
+
+COMPANY_COLUMNS = ('symbol', 'name', 'country_code')
+
+
+def profile_columns():
+    """CompanyProfile data columns (everything except the keys)."""
+    return [c for c in CompanyProfile.__table__.c if c.name not in ('id', 'company_id')]
+
+
+def financial_columns():
+    """FinancialStatement data columns (everything except the keys)."""
+    return [c for c in FinancialStatement.__table__.c if c.name not in ('id', 'company_id')]
+
+
+# Read-path statements are built once and executed with bound parameters, so a
+# hit skips statement construction and cache-key generation as well as the ORM.
+_company_t = Company.__table__
+_profile_t = CompanyProfile.__table__
+_financial_t = FinancialStatement.__table__
+_snapshot_statements = {}
+
+
+def _snapshot_statement(columns):
+    stmt = _snapshot_statements.get(columns)
+    if stmt is None:
+        selected = profile_columns() if columns is None else [_profile_t.c[name] for name in columns]
+        stmt = (
+            select(_company_t.c.id, _company_t.c.symbol, _company_t.c.name, _company_t.c.country_code, *selected)
+            .select_from(_company_t.outerjoin(_profile_t, _profile_t.c.company_id == _company_t.c.id))
+            .where(_company_t.c.country_code == bindparam('country_code'),
+                   _company_t.c.symbol == bindparam('symbol'))
+        )
+        _snapshot_statements[columns] = stmt
+    return stmt
+
+
+_financials_statement = (select(*financial_columns())
+                         .where(_financial_t.c.company_id == bindparam('company_id'))
+                         .order_by(_financial_t.c.year.desc()))
+_financials_limited_statement = _financials_statement.limit(bindparam('limit', type_=Integer))
+
+
+def company_snapshot(country_code, symbol, columns=None):
+    """
+    One Core row with the company's id, symbol, name and country_code plus the named
+    CompanyProfile columns (all of them when ``columns`` is None), or None if unknown.
+
+    Profile columns are None when the company has no profile yet. A company this
+    process saved moments ago is read, with the rest of the session, from the primary.
+    """
+    if recently_written(('company', country_code, symbol)):
+        use_primary(db.session)
+    key = None if columns is None else tuple(sorted(columns))
+    return db.session.execute(_snapshot_statement(key),
+                              {'country_code': country_code, 'symbol': symbol}).first()
+
+
+def company_financials(company_id, limit=None):
+    """The company's FinancialStatement rows as Core rows, newest year first."""
+    if limit:
+        return db.session.execute(_financials_limited_statement, {'company_id': company_id, 'limit': limit}).all()
+    return db.session.execute(_financials_statement, {'company_id': company_id}).all()
+
+
+def list_companies(country_code, limit, after_symbol=None, sector=None, exchange=None):
+    """
+    One page of companies ordered by (country_code, symbol), starting after ``after_symbol``.
+
+    Fetches ``limit + 1`` rows so the caller can tell whether another page exists.
+    """
+    stmt = (
+        select(Company.symbol, Company.name, Company.country_code, CompanyProfile.exchange,
+               CompanyProfile.sector, CompanyProfile.industry, CompanyProfile.market_cap_usd)
+        .outerjoin(CompanyProfile, CompanyProfile.company_id == Company.id)
+        .where(Company.country_code == country_code)
+        .order_by(Company.country_code, Company.symbol)
+        .limit(limit + 1)
+    )
+    if after_symbol is not None:
+        stmt = stmt.where(Company.symbol > after_symbol)
+    if sector:
+        stmt = stmt.where(CompanyProfile.sector == sector)
+    if exchange:
+        stmt = stmt.where(CompanyProfile.exchange == exchange)
+    return db.session.execute(stmt).all()
+
+
+def iter_company_batches(country_code=None, batch_size=500, updated_since=None):
+    """
+    Yields ``(rows, financials)`` batches ordered by company id.
+
+    ``rows`` are Core rows with ``id``, the company columns and the profile
+    columns (None when a company has no profile); ``financials`` maps company id
+    to its FinancialStatement rows, newest year first.
+    """
+    stmt = (
+        select(Company.id, Company.symbol, Company.name, Company.country_code, *profile_columns())
+        .outerjoin(CompanyProfile, CompanyProfile.company_id == Company.id)
+        .order_by(Company.id)
+        .limit(batch_size)
+    )
+    if country_code:
+        stmt = stmt.where(Company.country_code == country_code)
+    if updated_since is not None:
+        stmt = stmt.where(CompanyProfile.last_updated_ts >= updated_since)
+
+    fin_stmt = select(FinancialStatement.company_id, *financial_columns()).order_by(
+        FinancialStatement.company_id, FinancialStatement.year.desc()
+    )
+
+    last_id = 0
+    while True:
+        rows = db.session.execute(stmt.where(Company.id > last_id)).all()
+        if not rows:
+            return
+        ids = [row.id for row in rows]
+        financials = defaultdict(list)
+        for fin in db.session.execute(fin_stmt.where(FinancialStatement.company_id.in_(ids))):
+            financials[fin.company_id].append(fin)
+        yield rows, financials
+        last_id = ids[-1]
+        if len(rows) < batch_size:
+            return
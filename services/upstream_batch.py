@@ -0,0 +1,115 @@
+"""
+Micro-batching of per-symbol upstream fetches.
+
+The provider's profile and quote endpoints accept comma-separated symbols. A
+``MicroBatcher`` collects single-symbol fetches that arrive within
+``UPSTREAM_BATCH_WINDOW_MS`` of each other, up to ``UPSTREAM_BATCH_MAX``
+symbols, and makes one multi-symbol call for all of them.
+
+The first caller opens a batch and hands it to a small sender pool. When no
+call of the same kind is in flight, the batch is sent at once, so a lone
+lookup pays no extra latency. While one is in flight, the sender first waits
+for the window (or until the batch is full), so batches grow with concurrency.
+Concurrent fetches of the same symbol share one slot in the batch.
+
+The call is shared, so it belongs to no single request: it runs outside any
+request context and times out after ``UPSTREAM_TIMEOUT``. Every caller waits
+for it only as long as its own request deadline allows, and raises
+DeadlineExceeded when that runs out; the others still get their results. If
+the call fails, every waiter in the batch sees the same error.
+
+Bulk callers that know their symbols up front use ``prefetch``: the symbols are
+fetched right away in calls of ``UPSTREAM_BATCH_MAX``, and each one's next
+``get`` is answered from the result.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils import deadline
+from utils.deadline import DeadlineExceeded
+from utils.metrics import UPSTREAM_BATCH_SIZE
+
+# How long prefetched values wait for their get()
+PREFETCH_SECONDS = 60
+
+
+class _Batch:
+    def __init__(self, busy):
+        self.busy = busy
+        self.keys = {}  # insertion-ordered set
+        self.full = threading.Event()
+        self.done = threading.Event()
+        self.results = None
+        self.error = None
+
+
+class MicroBatcher:
+    """Coalesces ``get(key)`` calls into ``fetch_many(keys) -> {key: value}`` calls."""
+
+    def __init__(self, name, fetch_many, window=0.01, max_batch=50, workers=8):
+        self.name = name
+        self.fetch_many = fetch_many
+        self.window = window
+        self.max_batch = max_batch
+        self._open = None
+        self._in_flight = 0
+        self._prefetched = {}
+        self._lock = threading.Lock()
+        self._sender = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f'batch-{name}')
+
+    def prefetch(self, keys):
+        """Fetches ``keys`` now in calls of up to ``max_batch``; the next ``get`` of each uses the result."""
+        keys = list(dict.fromkeys(keys))
+        for i in range(0, len(keys), self.max_batch):
+            chunk = keys[i:i + self.max_batch]
+            UPSTREAM_BATCH_SIZE.observe(len(chunk), self.name)
+            results = self.fetch_many(chunk)
+            now = time.monotonic()
+            with self._lock:
+                self._prefetched = {k: v for k, v in self._prefetched.items() if v[0] > now}
+                for key in chunk:
+                    self._prefetched[key] = (now + PREFETCH_SECONDS, results.get(key))
+
+    def get(self, key):
+        """
+        The value fetched for ``key`` (None when the provider returned nothing for it).
+
+        Raises DeadlineExceeded when the current request's budget runs out first.
+        """
+        deadline.upstream_timeout()  # a spent budget does not join a batch
+        with self._lock:
+            prefetched = self._prefetched.pop(key, None)
+            if prefetched is not None and prefetched[0] > time.monotonic():
+                return prefetched[1]
+            batch = self._open
+            if batch is None:
+                batch = self._open = _Batch(busy=self._in_flight > 0)
+                self._in_flight += 1
+                self._sender.submit(self._send, batch)
+            batch.keys[key] = None
+            if len(batch.keys) >= self.max_batch:
+                self._open = None
+                batch.full.set()
+
+        if not batch.done.wait(deadline.remaining()):
+            raise DeadlineExceeded(key)
+        if batch.error is not None:
+            raise batch.error
+        return batch.results.get(key)
+
+    def _send(self, batch):
+        try:
+            if batch.busy:
+                batch.full.wait(self.window)
+            with self._lock:
+                if self._open is batch:
+                    self._open = None
+            UPSTREAM_BATCH_SIZE.observe(len(batch.keys), self.name)
+            batch.results = self.fetch_many(list(batch.keys))
+        except Exception as e:
+            batch.error = e
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+            batch.done.set()
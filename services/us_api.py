@@ -1,176 +1,595 @@
 import requests
 import logging
 import time
+from concurrent.futures import ThreadPoolExecutor
 from config import Config
-from services.base_api import BaseCompanyAPI
+from services import autocomplete, peer_stats
+from services.base_api import BaseCompanyAPI, NotCachedError
+from services.cache_backend import get_cache_backend, make_key
+from services.queries import company_financials, company_snapshot
+from services.upstream_batch import MicroBatcher
+from services.write_behind import search_cache_writer
 from models import db, Company, CompanyProfile, FinancialStatement, SearchCache
 from utils.helpers import match_financial_data
+from utils.metrics import CACHE_LOOKUPS, UPSTREAM_LATENCY, UPSTREAM_REQUESTS
+from utils.timing import span
+from utils.database import mark_written, use_primary, write_lock
+from utils.admission import Overloaded, upstream_slot
+from utils import deadline
+from utils.deadline import DeadlineExceeded
+from utils.rate_limit import RateLimited
+from utils.concurrency import in_current_context
+from logging_config import get_sampled_logger
 
 logger = logging.getLogger(__name__)
+# Cache HIT/MISS lines fire on every request; sampled per LOG_SAMPLE_RATES.
+cache_logger = get_sampled_logger(__name__ + '.cache')
+
+# Longest query the search_cache table can store
+SEARCH_QUERY_MAX_LENGTH = SearchCache.query.type.length
 
 class USCompanyAPI(BaseCompanyAPI):
     def __init__(self):
         self.base_url = Config.API_BASE_URL_US
         self.api_key = Config.API_KEY_US
         self.country_code = 'us'
+        # Concurrent profile/quote fetches share multi-symbol upstream calls
+        window = Config.UPSTREAM_BATCH_WINDOW_MS / 1000
+        self._profile_batcher = MicroBatcher('profile', self._fetch_profiles, window, Config.UPSTREAM_BATCH_MAX,
+                                            Config.UPSTREAM_MAX_CONCURRENCY)
+        self._quote_batcher = MicroBatcher('quote', self._fetch_quotes, window, Config.UPSTREAM_BATCH_MAX,
+                                          Config.UPSTREAM_MAX_CONCURRENCY)
+
+    @property
+    def cache(self):
+        return get_cache_backend()
+
+    def search_company(self, company_name, allow_fetch=True):
+        # 1. Check the shared cache, then the search cache table
+        cache_key = make_key('search', self.country_code, company_name)
+        with span('shared_cache'):
+            shared_results = self.cache.get(cache_key)
+        if shared_results is not None:
+            CACHE_LOOKUPS.inc('shared_search', self.country_code, 'hit')
+            cache_logger.info("[US] Shared Search Cache HIT for query: '%s'", company_name)
+            return shared_results
+        CACHE_LOOKUPS.inc('shared_search', self.country_code, 'miss')
+
+        # Results waiting to be flushed by the write-behind writer are not in the table yet
+        writer = search_cache_writer()
+        pending = writer.get(self.country_code, company_name) if writer else None
+        if pending is not None:
+            CACHE_LOOKUPS.inc('search', self.country_code, 'hit')
+            cache_logger.info("[US] Search Cache HIT (pending write) for query: '%s'", company_name)
+            return pending
 
-    def search_company(self, company_name):
-        # 1. Check the search cache first
         # The original code had a name collision. Corrected to use db.session.query().
-        cached_search = db.session.query(SearchCache).filter_by(query=company_name, country_code=self.country_code).first()
+        with span('search_cache'):
+            cached_search = db.session.query(SearchCache).filter_by(query=company_name, country_code=self.country_code).first()
 
         if cached_search and not cached_search.is_stale(Config.SEARCH_CACHE_TIMEOUT):
-            logger.info(f"[US] Search Cache HIT for query: '{company_name}'")
-            return cached_search.get_results()
+            CACHE_LOOKUPS.inc('search', self.country_code, 'hit')
+            cache_logger.info("[US] Search Cache HIT for query: '%s'", company_name)
+            with span('search_decode'):
+                results = cached_search.get_results()
+            remaining = Config.SEARCH_CACHE_TIMEOUT - (time.time() - cached_search.last_updated_ts)
+            self.cache.set(cache_key, results, remaining)
+            return results
 
-        logger.info(f"[US] Search Cache MISS for query: '{company_name}'. Fetching from API.")
+        if not allow_fetch:
+            raise NotCachedError(company_name)
+        CACHE_LOOKUPS.inc('search', self.country_code, 'stale' if cached_search else 'miss')
+
+        cache_logger.info("[US] Search Cache MISS for query: '%s'. Fetching from API.", company_name)
         
         # 2. If not in cache or stale, fetch from API
         url = f"{self.base_url}/search"
-        params = {'query': company_name, 'limit': 10, 'apikey': self.api_key}
+        params = {'query': company_name, 'limit': Config.SEARCH_RESULT_LIMIT, 'apikey': self.api_key}
         try:
-            response = requests.get(url, params=params, timeout=10)
-            logger.info(f"[US] Search API status: {response.status_code}")
+            with upstream_slot():
+                response = self._get('search', url, params)
+            logger.info("[US] Search API status: %s", response.status_code)
             
             if response.status_code == 200:
                 results = response.json()
-                # 3. Save the new results to the cache
-                if not cached_search:
-                    cached_search = SearchCache(query=company_name, country_code=self.country_code)
-                    db.session.add(cached_search)
-                
-                cached_search.set_results(results)
-                cached_search.last_updated_ts = int(time.time())
-                db.session.commit()
+                # 3. Save the new results to the cache (batched in the background when write-behind is on,
+                #    unless its queue is full). Queries longer than the column are not stored.
+                storable = len(company_name) <= SEARCH_QUERY_MAX_LENGTH
+                queued = storable and writer and writer.enqueue(self.country_code, company_name, results,
+                                                                int(time.time()))
+                if storable and not queued:
+                    with span('search_cache_write'), write_lock():
+                        if not cached_search:
+                            cached_search = SearchCache(query=company_name, country_code=self.country_code)
+                            db.session.add(cached_search)
+                        cached_search.set_results(results)
+                        cached_search.last_updated_ts = int(time.time())
+                        db.session.commit()
+                self.cache.set(cache_key, results, Config.SEARCH_CACHE_TIMEOUT)
+                autocomplete.add_search_results(self.country_code, results)
                 
                 return results
             else:
                 return []
+        except (Overloaded, RateLimited):
+            raise
         except Exception as e:
-            logger.error(f"[US] Error during search: {e}")
+            if deadline.expired():
+                # Out of time: stale results beat none
+                if cached_search:
+                    logger.warning("[US] Search deadline exceeded for '%s'; serving stale results.", company_name)
+                    return cached_search.get_results()
+                raise DeadlineExceeded() from e
+            logger.error("[US] Error during search: %s", e)
             return []
 
-    def get_company_data(self, symbol):
-        logger.info(f"[US] Requesting data for symbol: {symbol}")
+    def get_company_data(self, symbol, selection=None, allow_fetch=True):
+        """
+        Returns formatted company data. Database hits are read with Core selects (no
+        ORM objects); the ORM is only loaded for a refresh. With a FieldSelection, a
+        hit reads only the profile columns it needs (e.g. not the description Text
+        column) and at most ``selection.years`` statement rows; such partial
+        results are not written to the shared cache. With ``allow_fetch=False``,
+        NotCachedError is raised instead of calling the upstream provider.
+        """
+        logger.debug("[US] Requesting data for symbol: %s", symbol)
         
-        # 1. Check the cache first
+        # 1. Check the shared cache, then the database
+        cache_key = make_key('company', self.country_code, symbol)
+        with span('shared_cache'):
+            shared_data = self.cache.get(cache_key)
+        if shared_data is not None:
+            CACHE_LOOKUPS.inc('shared_data', self.country_code, 'hit')
+            cache_logger.info("[US] Shared Cache HIT for symbol: %s", symbol)
+            return shared_data
+        CACHE_LOOKUPS.inc('shared_data', self.country_code, 'miss')
+
+        columns = selection.profile_columns() if selection is not None else None
+        with span('db_lookup'):
+            row = company_snapshot(self.country_code, symbol, columns)
+            has_profile = row is not None and row.last_updated_ts is not None
+
+        now = time.time()
+        statements_fresh = has_profile and self._statements_due(row) > now
+        quote_fresh = has_profile and now - row.last_updated_ts <= Config.QUOTE_CACHE_TIMEOUT
+
+        if statements_fresh and quote_fresh:
+            CACHE_LOOKUPS.inc('data', self.country_code, 'hit')
+            cache_logger.info("[US] Cache HIT for symbol: %s", symbol)
+            with span('format'):
+                data = self._format_data_from_db(row, selection)
+            if selection is None:
+                self.cache.set(cache_key, data, self._fresh_for(row, now))
+            return data
+
+        if not allow_fetch:
+            raise NotCachedError(symbol)
+
+        # Refreshes write through the ORM, and read what they are about to write from the primary
+        use_primary(db.session)
+        mark_written(db.session, ('company', self.country_code, symbol))
         company = Company.query.filter_by(symbol=symbol, country_code=self.country_code).first()
 
-        if company and company.profile and not company.profile.is_stale(Config.CACHE_TIMEOUT):
-            logger.info(f"[US] Cache HIT for symbol: {symbol}")
-            return self._format_data_from_db(company)
+        # 2a. Only the quote is stale: one lightweight call refreshes market cap
+        if statements_fresh:
+            CACHE_LOOKUPS.inc('data', self.country_code, 'quote_stale')
+            cache_logger.info("[US] Quote STALE for symbol: %s. Refreshing quote only.", symbol)
+            with span('upstream_fetch'), upstream_slot():
+                quote = self._fetch_quote(symbol)
+            if quote:
+                with span('save_to_db'), write_lock():
+                    self._save_quote(company.profile, quote)
+                with span('format'):
+                    row = company_snapshot(self.country_code, symbol, columns)
+                    data = self._format_data_from_db(row, selection)
+                if selection is None:
+                    self.cache.set(cache_key, data, self._fresh_for(row))
+                return data
+            if deadline.expired():
+                logger.warning("[US] Quote refresh for %s ran out of time; serving stale data.", symbol)
+                return self._degraded(row, selection)
+            logger.warning("[US] Quote refresh failed for %s; falling back to a full refresh.", symbol)
+        else:
+            CACHE_LOOKUPS.inc('data', self.country_code, 'stale' if has_profile else 'miss')
 
-        logger.info(f"[US] Cache MISS or STALE for symbol: {symbol}. Fetching from API.")
+        cache_logger.info("[US] Cache MISS or STALE for symbol: %s. Fetching from API.", symbol)
         
-        # 2. If not in cache or stale, fetch from API
-        api_data = self._fetch_from_api(symbol)
-        if not api_data:
+        # 2b. Profile and statements missing or stale: fetch everything from the API
+        limit, full_refresh = self._statement_fetch_limit(company)
+        with span('upstream_fetch'), upstream_slot():
+            api_data = self._fetch_from_api(symbol, limit)
+        if api_data is None or api_data.get('partial'):
+            if deadline.expired():
+                # Out of time: answer with what we have rather than nothing
+                if has_profile:
+                    logger.warning("[US] Refresh of %s ran out of time; serving stale data.", symbol)
+                    return self._degraded(row, selection)
+                if api_data:
+                    logger.warning("[US] Statements for %s did not arrive in time; serving the profile only.", symbol)
+                    return self._format_partial(api_data['profile'])
+                raise DeadlineExceeded(symbol)
             return None
         
         # 3. Save to database
-        self._save_to_db(symbol, api_data)
+        with span('save_to_db'), write_lock():
+            self._save_to_db(symbol, api_data, full_refresh)
 
         # 4. Return formatted data
+        with span('format'):
+            row = company_snapshot(self.country_code, symbol)
+            data = self._format_data_from_db(row)
+        if data:
+            self.cache.set(cache_key, data, self._fresh_for(row))
+        return data
+
+    def get_many_company_data(self, symbols):
+        """
+        Returns {symbol: data} for many symbols with one batched shared-cache read.
+
+        Profiles and quotes for the rest are prefetched in multi-symbol calls, then the
+        lookups run concurrently (up to UPSTREAM_MAX_CONCURRENCY at a time).
+        """
+        keys = {make_key('company', self.country_code, symbol): symbol for symbol in symbols}
+        results = {keys[key]: data for key, data in self.cache.get_many(keys).items()}
+        CACHE_LOOKUPS.inc('shared_data', self.country_code, 'hit', amount=len(results))
+        missing = [symbol for symbol in dict.fromkeys(symbols) if symbol not in results]
+        if len(missing) > 1 and Config.UPSTREAM_BATCHING_ENABLED:
+            self.prefetch_company_data(missing)
+            with ThreadPoolExecutor(max_workers=min(len(missing), Config.UPSTREAM_MAX_CONCURRENCY),
+                                    thread_name_prefix='company-batch') as pool:
+                futures = [pool.submit(in_current_context(self.get_company_data), symbol) for symbol in missing]
+                fetched = [(symbol, future.result()) for symbol, future in zip(missing, futures)]
+        else:
+            fetched = ((symbol, self.get_company_data(symbol)) for symbol in missing)
+        for symbol, data in fetched:
+            if data:
+                results[symbol] = data
+        return results
+
+    def prefetch_company_data(self, symbols):
+        """Fetches the profiles and quotes the next lookups of ``symbols`` will need, many per call."""
+        profiles, quotes = [], []
+        now = time.time()
+        for symbol in symbols:
+            row = company_snapshot(self.country_code, symbol, ('last_updated_ts', 'statements_due_ts'))
+            if row is None or row.last_updated_ts is None or self._statements_due(row) <= now:
+                profiles.append(symbol)
+            elif now - row.last_updated_ts > Config.QUOTE_CACHE_TIMEOUT:
+                quotes.append(symbol)
+        try:
+            with upstream_slot():
+                self._profile_batcher.prefetch(profiles)
+                self._quote_batcher.prefetch(quotes)
+        except (Overloaded, RateLimited, DeadlineExceeded):
+            raise
+        except Exception as e:
+            # The lookups fetch whatever is missing themselves
+            logger.warning("[US] Prefetching %d profiles / %d quotes failed: %s", len(profiles), len(quotes), e)
+
+    def list_symbols(self, exchanges):
+        """Stock symbols from the provider's full list, filtered to ``exchanges`` (e.g. NYSE, NASDAQ)."""
+        response = self._get('stock-list', f"{self.base_url}/stock/list", {'apikey': self.api_key})
+        if response.status_code != 200:
+            raise RuntimeError(f"Stock list API returned {response.status_code}")
+        wanted = {e.upper() for e in exchanges}
+        return [s['symbol'] for s in response.json()
+                if s.get('symbol') and s.get('type', 'stock') == 'stock'
+                and (s.get('exchangeShortName') or '').upper() in wanted]
+
+    def has_fresh_data(self, symbol):
+        row = company_snapshot(self.country_code, symbol, ('last_updated_ts', 'statements_due_ts'))
+        return row is not None and row.last_updated_ts is not None and self._statements_due(row) > time.time()
+
+    def refresh_company(self, symbol):
+        use_primary(db.session)
         company = Company.query.filter_by(symbol=symbol, country_code=self.country_code).first()
-        return self._format_data_from_db(company)
+        limit, full_refresh = self._statement_fetch_limit(company)
+        api_data = self._fetch_from_api(symbol, limit)
+        if not api_data or api_data.get('partial'):
+            return False
+        with write_lock():
+            self._save_to_db(symbol, api_data, full_refresh)
+        self.cache.delete(make_key('company', self.country_code, symbol))
+        return True
+
+    def _get(self, endpoint, url, params):
+        """
+        Performs an upstream GET, recording call counts, status codes and latency per endpoint.
+
+        The call times out with the request's deadline; DeadlineExceeded is raised
+        without calling upstream when the budget is already spent.
+        """
+        timeout = deadline.upstream_timeout()
+        start = time.perf_counter()
+        try:
+            with span('upstream'):
+                response = requests.get(url, params=params, timeout=timeout)
+        except Exception:
+            UPSTREAM_REQUESTS.inc(self.country_code, endpoint, 'error')
+            raise
+        finally:
+            UPSTREAM_LATENCY.observe(time.perf_counter() - start, self.country_code, endpoint)
+        UPSTREAM_REQUESTS.inc(self.country_code, endpoint, str(response.status_code))
+        return response
 
-    def _fetch_from_api(self, symbol):
-        """Internal method to fetch all required data from the external API."""
+    def _fetch_quote(self, symbol):
+        """Fetches the quote (price, market cap) for a symbol; returns None on failure."""
         try:
-            profile_url = f"{self.base_url}/profile/{symbol}"
-            profile_res = requests.get(profile_url, params={'apikey': self.api_key}, timeout=10)
-            if profile_res.status_code != 200 or not profile_res.json():
-                logger.error(f"[US] Profile API failed for {symbol}")
+            if Config.UPSTREAM_BATCHING_ENABLED:
+                return self._quote_batcher.get(symbol)
+            return self._fetch_quotes([symbol]).get(symbol)
+        except Exception as e:
+            logger.error("[US] Error fetching quote from API: %s", e)
+            return None
+
+    def _fetch_profile(self, symbol):
+        if Config.UPSTREAM_BATCHING_ENABLED:
+            return self._profile_batcher.get(symbol)
+        return self._fetch_profiles([symbol]).get(symbol)
+
+    def _fetch_profiles(self, symbols):
+        return self._fetch_many('profile', symbols)
+
+    def _fetch_quotes(self, symbols):
+        return self._fetch_many('quote', symbols)
+
+    def _fetch_many(self, endpoint, symbols):
+        """One ``/<endpoint>/<sym1,sym2,...>`` call; returns {requested symbol: item} for the symbols found."""
+        response = self._get(endpoint, f"{self.base_url}/{endpoint}/{','.join(symbols)}", {'apikey': self.api_key})
+        if response.status_code != 200:
+            logger.error("[US] %s API returned %s for %d symbols", endpoint, response.status_code, len(symbols))
+            return {}
+        wanted = {symbol.upper(): symbol for symbol in symbols}
+        return {wanted[item['symbol'].upper()]: item for item in response.json() or ()
+                if (item.get('symbol') or '').upper() in wanted}
+
+    def _fetch_from_api(self, symbol, limit=None):
+        """
+        Internal method to fetch all required data from the external API (``limit`` annual periods).
+
+        When the request's deadline runs out after the profile arrived, returns the
+        profile with ``partial`` set instead of the statements; it must not be saved.
+        """
+        limit = limit or Config.STATEMENT_HISTORY_YEARS
+        try:
+            profile = self._fetch_profile(symbol)
+            if not profile:
+                logger.error("[US] Profile API failed for %s", symbol)
                 return None
-            profile = profile_res.json()[0]
+        except Exception as e:
+            logger.error("[US] Error fetching company data from API: %s", e)
+            return None
 
+        try:
             income_url = f"{self.base_url}/income-statement/{symbol}"
-            income_res = requests.get(income_url, params={'limit': 5, 'apikey': self.api_key}, timeout=10)
+            income_res = self._get('income-statement', income_url, {'limit': limit, 'apikey': self.api_key})
             income_data = income_res.json() if income_res.status_code == 200 else []
 
             balance_url = f"{self.base_url}/balance-sheet-statement/{symbol}"
-            balance_res = requests.get(balance_url, params={'limit': 5, 'apikey': self.api_key}, timeout=10)
+            balance_res = self._get('balance-sheet-statement', balance_url, {'limit': limit, 'apikey': self.api_key})
             balance_data = balance_res.json() if balance_res.status_code == 200 else []
 
             return {'profile': profile, 'financials': income_data, 'balance_sheet': balance_data}
         except Exception as e:
-            logger.error(f"[US] Error fetching company data from API: {e}")
+            if deadline.expired():
+                return {'profile': profile, 'partial': True}
+            logger.error("[US] Error fetching company data from API: %s", e)
             return None
 
-    def _save_to_db(self, symbol, data):
-        """Saves the fetched API data into the database."""
+    def _save_to_db(self, symbol, data, full_refresh=True):
+        """
+        Saves the fetched API data into the database.
+
+        The profile is updated in place and statements are upserted by year, so only
+        rows whose values changed are written. A full refresh also drops years the
+        provider no longer reports (restatements); incremental ones only add/update.
+        """
         profile_data = data['profile']
+        now = int(time.time())
         
         year_wise_data = match_financial_data(data['financials'], data['balance_sheet'], profile_data)
 
+        use_primary(db.session)
+        mark_written(db.session, ('company', self.country_code, symbol))
         company = Company.query.filter_by(symbol=symbol, country_code=self.country_code).first()
         if not company:
             company = Company(symbol=symbol, name=profile_data.get('companyName', ''), country_code=self.country_code)
             db.session.add(company)
         
-        if company.profile:
-            db.session.delete(company.profile)
-
-        new_profile = CompanyProfile(
-            company=company,
-            exchange=profile_data.get('exchangeShortName'),
-            sector=profile_data.get('sector'),
-            industry=profile_data.get('industry'),
-            description=profile_data.get('description'),
-            website=profile_data.get('website'),
-            full_time_employees=profile_data.get('fullTimeEmployees'),
-            market_cap_usd=profile_data.get('mktCap'),
-            last_updated_ts=int(time.time())
-        )
-        db.session.add(new_profile)
-
-        company.financials.delete()
+        profile = company.profile
+        if not profile:
+            profile = CompanyProfile(company=company)
+            db.session.add(profile)
+        profile.exchange = profile_data.get('exchangeShortName')
+        profile.sector = profile_data.get('sector')
+        profile.industry = profile_data.get('industry')
+        profile.description = profile_data.get('description')
+        profile.website = profile_data.get('website')
+        profile.full_time_employees = profile_data.get('fullTimeEmployees')
+        profile.market_cap_usd = profile_data.get('mktCap')
+        profile.last_updated_ts = now
+        if full_refresh:
+            profile.last_full_refresh_ts = now
 
+        existing = {fin.year: fin for fin in company.financials} if company.id else {}
+        fetched_years = set()
+        statements = {}
+        written = 0
         for row in year_wise_data:
             if not row.get('year'): continue
-            statement = FinancialStatement(
-                company=company,
-                year=row['year'],
-                revenue_usd=row.get('revenue_usd'),
-                profit_usd=row.get('profit_usd'),
-                share_capital_usd=row.get('share_capital_usd')
-            )
-            db.session.add(statement)
+            fetched_years.add(row['year'])
+            values = {
+                'revenue_usd': row.get('revenue_usd'),
+                'profit_usd': row.get('profit_usd'),
+                'share_capital_usd': row.get('share_capital_usd')
+            }
+            statements[row['year']] = values
+            statement = existing.get(row['year'])
+            if statement is None:
+                db.session.add(FinancialStatement(company=company, year=row['year'], **values))
+                written += 1
+            elif any(getattr(statement, k) != v for k, v in values.items()):
+                for k, v in values.items():
+                    setattr(statement, k, v)
+                written += 1
+
+        # Keep the newest STATEMENT_HISTORY_YEARS years; on a full refresh also drop
+        # years the provider stopped reporting.
+        kept_years = sorted(set(existing) | fetched_years, reverse=True)[:Config.STATEMENT_HISTORY_YEARS]
+        for year, statement in existing.items():
+            if year not in kept_years or (full_refresh and year not in fetched_years):
+                db.session.delete(statement)
+                written += 1
+            elif year not in statements:
+                statements[year] = {m: getattr(statement, m) for m in peer_stats.STATEMENT_METRICS}
+        statements = {year: values for year, values in statements.items() if year in kept_years}
         
+        latest_year = max((y for y in set(existing) | fetched_years if y.isdigit()), default=None)
+        profile.statements_due_ts = now + self._statement_ttl(latest_year)
+
+        # Replace the company's sector/industry peer values in the same transaction
+        db.session.flush()
+        peer_stats.update_company(self.country_code, company.id,
+                                  peer_stats.groups_of(profile.sector, profile.industry),
+                                  peer_stats.company_values(profile.market_cap_usd, statements))
+
         db.session.commit()
-        logger.info(f"[US] Saved data for {symbol} to database.")
+        autocomplete.add_company(self.country_code, symbol, company.name, profile.exchange, profile.market_cap_usd)
+        logger.info("[US] Saved data for %s to database (%s refresh, %d statement rows written).",
+                    symbol, 'full' if full_refresh else 'incremental', written)
+
+    def _save_quote(self, profile, quote):
+        """Updates the quote-derived fields only; statements keep their own due time."""
+        if quote.get('marketCap') is not None and quote['marketCap'] != profile.market_cap_usd:
+            profile.market_cap_usd = quote['marketCap']
+            peer_stats.update_company(self.country_code, profile.company_id,
+                                      peer_stats.groups_of(profile.sector, profile.industry),
+                                      peer_stats.company_values(profile.market_cap_usd, {}),
+                                      only={(peer_stats.POINT_IN_TIME_YEAR, 'market_cap_usd')})
+        profile.last_updated_ts = int(time.time())
+        db.session.commit()
+
+    @staticmethod
+    def _statement_ttl(latest_year):
+        """
+        Seconds until statements should be re-checked: STATEMENT_CACHE_TIMEOUT, or
+        STATEMENT_RECHECK_INTERVAL while the last completed fiscal year is missing
+        (its annual report is due, so look for it more often until it appears).
+        """
+        last_completed_year = time.gmtime().tm_year - 1
+        if latest_year is None or int(latest_year) < last_completed_year:
+            return Config.STATEMENT_RECHECK_INTERVAL
+        return Config.STATEMENT_CACHE_TIMEOUT
+
+    @staticmethod
+    def _statements_due(profile):
+        # Rows saved before statements_due_ts existed expire with the quote, as before.
+        if profile.statements_due_ts is None:
+            return profile.last_updated_ts + Config.QUOTE_CACHE_TIMEOUT
+        return profile.statements_due_ts
 
-    def _format_data_from_db(self, company):
-        """Formats data from DB objects into the dictionary structure the route expects."""
-        if not company or not company.profile:
+    def _fresh_for(self, profile, now=None):
+        """Seconds until either the quote or the statements of a profile go stale."""
+        now = time.time() if now is None else now
+        quote_due = profile.last_updated_ts + Config.QUOTE_CACHE_TIMEOUT
+        return min(quote_due, self._statements_due(profile)) - now
+
+    def _statement_fetch_limit(self, company):
+        """
+        How many annual periods to request for a refresh, and whether it is a full one.
+
+        Only periods newer than the latest stored fiscal year are fetched, except
+        every STATEMENT_FULL_RECONCILE_INTERVAL when the whole history is re-pulled.
+        """
+        history = Config.STATEMENT_HISTORY_YEARS
+        profile = company.profile if company else None
+        if not profile or not profile.last_full_refresh_ts:
+            return history, True
+        if time.time() - profile.last_full_refresh_ts > Config.STATEMENT_FULL_RECONCILE_INTERVAL:
+            return history, True
+        latest = company.financials.order_by(FinancialStatement.year.desc()).first()
+        if not latest or not latest.year.isdigit():
+            return history, True
+        newer_periods = time.gmtime().tm_year - int(latest.year)
+        return max(1, min(newer_periods, history)), False
+
+    def _degraded(self, row, selection):
+        """Stale stored data, flagged so it is neither shared-cached nor mistaken for fresh."""
+        data = self._format_data_from_db(row, selection)
+        data['degraded'] = 'stale'
+        return data
+
+    def _format_partial(self, profile_data):
+        """A freshly fetched profile without statements, in the shape of ``_format_data_from_db``."""
+        return {
+            'profile': {
+                'companyName': profile_data.get('companyName', ''),
+                'symbol': profile_data.get('symbol'),
+                'exchangeShortName': profile_data.get('exchangeShortName'),
+                'sector': profile_data.get('sector'),
+                'industry': profile_data.get('industry'),
+                'country': self.country_code.upper(),
+                'website': profile_data.get('website'),
+                'description': profile_data.get('description'),
+                'fullTimeEmployees': profile_data.get('fullTimeEmployees'),
+                'mktCap': profile_data.get('mktCap')
+            },
+            'year_wise_financials': [],
+            'degraded': 'partial'
+        }
+
+    def _format_data_from_db(self, row, selection=None):
+        """
+        Formats a ``company_snapshot`` row and its statements into the dictionary structure the route expects.
+
+        With a selection, the row only holds ``selection.profile_columns()``; other
+        profile fields come back as None.
+        """
+        if row is None or row.last_updated_ts is None:
             return None
-        
+
+        wanted = selection.profile_columns() if selection is not None else None
+
+        def column(name):
+            return getattr(row, name) if wanted is None or name in wanted else None
+
+        employees = column('full_time_employees')
+        market_cap = column('market_cap_usd')
         profile_dict = {
-            'companyName': company.name,
-            'symbol': company.symbol,
-            'exchangeShortName': company.profile.exchange,
-            'sector': company.profile.sector,
-            'industry': company.profile.industry,
-            'country': company.country_code.upper(),
-            'website': company.profile.website,
-            'description': company.profile.description,
-            'fullTimeEmployees': company.profile.full_time_employees,
-            'mktCap': company.profile.market_cap_usd
+            'companyName': row.name,
+            'symbol': row.symbol,
+            'exchangeShortName': column('exchange'),
+            'sector': column('sector'),
+            'industry': column('industry'),
+            'country': row.country_code.upper(),
+            'website': column('website'),
+            'description': column('description'),
+            'fullTimeEmployees': employees,
+            'mktCap': market_cap
         }
 
         financials_list = []
-        sorted_financials = company.financials.order_by(FinancialStatement.year.desc()).all()
-        for fin in sorted_financials:
-            financials_list.append({
-                'year': fin.year,
-                'employees': company.profile.full_time_employees,
-                'revenue_usd': fin.revenue_usd,
-                'profit_usd': fin.profit_usd,
-                'share_capital_usd': fin.share_capital_usd,
-                'market_cap_usd': company.profile.market_cap_usd
-            })
+        if selection is None or selection.wants_financials:
+            years = selection.years if selection is not None else None
+            for fin in company_financials(row.id, years):
+                financials_list.append({
+                    'year': fin.year,
+                    'employees': employees,
+                    'revenue_usd': fin.revenue_usd,
+                    'profit_usd': fin.profit_usd,
+                    'share_capital_usd': fin.share_capital_usd,
+                    'market_cap_usd': market_cap
+                })
 
-        return {
+        data = {
             'profile': profile_dict,
             'year_wise_financials': financials_list
         }
+        if selection is None or selection.wants_peers:
+            if financials_list:
+                latest = financials_list[0]
+            else:
+                latest = next((fin._asdict() for fin in company_financials(row.id, 1)), None)
+            data['peer_percentiles'] = peer_stats.company_percentiles(
+                row.country_code, column('sector'), column('industry'), market_cap, latest)
+        return data
@@ -0,0 +1,151 @@
+"""
+Write-behind buffer for search-cache rows.
+
+A search miss no longer inserts into ``search_cache`` and commits on the request
+thread. It drops the results into an in-memory map keyed by (country, query),
+where a later write for the same query replaces an earlier one. A background
+flusher writes the map to the database in one transaction every
+``SEARCH_CACHE_FLUSH_INTERVAL`` seconds, or sooner once
+``SEARCH_CACHE_FLUSH_BATCH`` rows are waiting.
+
+Each flush is a single transaction. If it fails, the rows are retried one at a
+time, and rows that still fail are dropped and counted as ``dropped``, so one
+bad row cannot block every later flush. The queue holds at most
+``SEARCH_CACHE_MAX_PENDING`` rows. When it is full, ``enqueue`` refuses new
+queries and the caller writes them synchronously. Rows that are queued or being
+flushed are still served to readers through ``get``. The queue is drained when
+the process exits normally. A hard kill loses at most one interval of search
+results, and those are simply re-fetched.
+"""
+import atexit
+import json
+import logging
+import threading
+
+from sqlalchemy import delete, insert
+
+from models import db, SearchCache
+from utils.database import write_lock
+from utils.metrics import SEARCH_CACHE_WRITES
+
+logger = logging.getLogger(__name__)
+
+_CHUNK = 500
+
+
+class SearchCacheWriter:
+
+    def __init__(self, app, interval=1.0, batch_size=200, max_pending=10000):
+        self.app = app
+        self.interval = interval
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self._pending = {}
+        self._flushing = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = False
+        self._thread = None
+
+    def enqueue(self, country_code, query, results, updated_ts):
+        """Queues the row; returns False, without queueing it, when the queue is full."""
+        key = (country_code, query)
+        with self._lock:
+            if len(self._pending) >= self.max_pending and key not in self._pending:
+                SEARCH_CACHE_WRITES.inc('overflow')
+                return False
+            self._pending[key] = (results, updated_ts)
+            size = len(self._pending)
+            if self._thread is None and not self._stopped:
+                self._thread = threading.Thread(target=self._run, name='search-cache-flusher', daemon=True)
+                self._thread.start()
+        if size >= self.batch_size:
+            self._wake.set()
+        return True
+
+    def get(self, country_code, query):
+        """Results still waiting to be written for this query, or None."""
+        key = (country_code, query)
+        with self._lock:
+            entry = self._pending.get(key) or self._flushing.get(key)
+        return entry[0] if entry else None
+
+    def flush(self):
+        """Writes everything queued so far; returns the number of rows written."""
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                batch, self._pending = self._pending, {}
+                self._flushing = batch
+            try:
+                with self.app.app_context():
+                    written = self._write_batch(batch)
+            finally:
+                with self._lock:
+                    self._flushing = {}
+            SEARCH_CACHE_WRITES.inc('ok', amount=written)
+            return written
+
+    def _write_batch(self, batch):
+        try:
+            self._write(batch)
+            return len(batch)
+        except Exception as e:
+            logger.warning("Search cache flush of %d rows failed, retrying row by row: %s", len(batch), e)
+        written = 0
+        for key, entry in batch.items():
+            try:
+                self._write({key: entry})
+                written += 1
+            except Exception as e:
+                logger.error("Dropping search cache row %s: %s", key, e)
+                SEARCH_CACHE_WRITES.inc('dropped')
+        return written
+
+    def _write(self, batch):
+        keys = list(batch)
+        with write_lock(), db.engine.begin() as conn:
+            for i in range(0, len(keys), _CHUNK):
+                chunk = keys[i:i + _CHUNK]
+                for country_code in {cc for cc, _ in chunk}:
+                    queries = [q for cc, q in chunk if cc == country_code]
+                    conn.execute(delete(SearchCache).where(SearchCache.country_code == country_code,
+                                                           SearchCache.query.in_(queries)))
+                conn.execute(insert(SearchCache), [
+                    {'country_code': cc, 'query': q, 'results_json': json.dumps(batch[(cc, q)][0]),
+                     'last_updated_ts': batch[(cc, q)][1]}
+                    for cc, q in chunk
+                ])
+
+    def _run(self):
+        while not self._stopped:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
+
+    def close(self):
+        """Stops the flusher and drains the queue."""
+        self._stopped = True
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+        self.flush()
+
+
+_writer = None
+
+
+def search_cache_writer():
+    """The process-wide writer, or None when ``SEARCH_CACHE_WRITE_BEHIND`` is off."""
+    return _writer
+
+
+def init_app(app):
+    global _writer
+    if not app.config['SEARCH_CACHE_WRITE_BEHIND'] or _writer is not None:
+        return
+    _writer = SearchCacheWriter(app, app.config['SEARCH_CACHE_FLUSH_INTERVAL'], app.config['SEARCH_CACHE_FLUSH_BATCH'],
+                                app.config['SEARCH_CACHE_MAX_PENDING'])
+    atexit.register(_writer.close)
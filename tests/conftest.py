@@ -0,0 +1,84 @@
+"""
+Shared fixtures.
+
+The app is imported once, against a throwaway SQLite file and an offline
+upstream (``benchmarks.stub_upstream``). The shared cache and the search-cache
+write-behind are off unless a test turns them on.
+"""
+import os
+import sys
+import tempfile
+from unittest import mock
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Must be set before config.py is imported. A file, not :memory:, so worker threads share the data.
+_db_dir = tempfile.mkdtemp(prefix='company-data-tests-')
+os.environ.update({
+    'DATABASE_URL': 'sqlite:///' + os.path.join(_db_dir, 'test.db'),
+    'API_BASE_URL_US': 'http://upstream.invalid/api/v3',
+    'API_KEY_US': 'test',
+    'CACHE_BACKEND': 'none',
+    'SEARCH_CACHE_WRITE_BEHIND': 'false',
+    'LOG_LEVEL': 'CRITICAL',
+})
+
+from benchmarks.stub_upstream import StubUpstream  # noqa: E402
+
+
+class RecordingUpstream(StubUpstream):
+    """StubUpstream that also remembers every URL it answered."""
+
+    def __init__(self):
+        super().__init__()
+        self.urls = []
+
+    def __call__(self, url, params=None, timeout=None, **kwargs):
+        self.urls.append(url)
+        return super().__call__(url, params, timeout, **kwargs)
+
+    def calls_to(self, endpoint):
+        """The path argument (e.g. ``AAPL,MSFT``) of every call to ``endpoint``."""
+        return [url.rsplit('/', 1)[1] for url in self.urls if url.rsplit('/', 2)[-2] == endpoint]
+
+
+@pytest.fixture
+def app():
+    from app import app
+    from models import db
+    from services import autocomplete, peer_stats
+    from services.factory import APIServiceFactory
+    from utils import database
+
+    with app.app_context():
+        db.create_all()
+        yield app
+        db.session.remove()
+        peer_stats.stats_refresher().drain()
+        db.drop_all()
+    peer_stats._memo.clear()
+    autocomplete._indexes.clear()
+    database._written.clear()
+    for service in APIServiceFactory._services.values():
+        service._profile_batcher._prefetched.clear()
+        service._quote_batcher._prefetched.clear()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def upstream():
+    stub = RecordingUpstream()
+    with mock.patch('requests.get', stub):
+        yield stub
+
+
+@pytest.fixture
+def service(app):
+    from services.factory import APIServiceFactory
+    return APIServiceFactory.get_service('us')
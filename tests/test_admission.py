@@ -0,0 +1,76 @@
+import threading
+import time
+
+import pytest
+from flask import g
+
+from utils import admission
+from utils.admission import AdmissionLimiter, Overloaded, upstream_slot
+from utils.deadline import DeadlineExceeded
+from utils.metrics import ADMISSION_REJECTED
+
+ROUTE = 'company.get_company_metrics'
+
+
+def _rejected(reason):
+    return ADMISSION_REJECTED._values.get((ROUTE, reason), 0)
+
+
+def test_limiter_sheds_when_the_queue_is_full():
+    limiter = AdmissionLimiter('route', max_concurrent=1, max_queue=0, timeout=1)
+    limiter.acquire()
+
+    with pytest.raises(Overloaded) as e:
+        limiter.acquire()
+    assert e.value.reason == 'queue_full'
+
+
+def test_limiter_times_out_waiting_for_a_slot():
+    limiter = AdmissionLimiter('route', max_concurrent=1, max_queue=1, timeout=0.05)
+    limiter.acquire()
+
+    with pytest.raises(Overloaded) as e:
+        limiter.acquire()
+    assert e.value.reason == 'timeout'
+    assert limiter.waiting == 0
+
+
+def test_released_slot_goes_to_the_waiter():
+    limiter = AdmissionLimiter('route', max_concurrent=1, max_queue=1, timeout=5)
+    limiter.acquire()
+    admitted = threading.Event()
+    waiter = threading.Thread(target=lambda: (limiter.acquire(), admitted.set()))
+    waiter.start()
+
+    limiter.release()
+    waiter.join(5)
+    assert admitted.is_set() and limiter.active == 1
+
+
+def test_upstream_bound_requests_are_shed_with_503_while_hits_are_served(client, upstream, monkeypatch):
+    assert client.get('/company/us/Apple').status_code == 200
+    monkeypatch.setitem(admission._limiters, ROUTE, AdmissionLimiter(ROUTE, 0, 0, 0.1))
+
+    assert client.get('/company/us/Apple').status_code == 200
+    response = client.get('/company/us/Microsoft')
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '5'
+
+
+@pytest.mark.parametrize('budget, busy', [(-1, False), (0.1, True)])
+def test_spent_deadline_is_not_counted_as_overload(app, monkeypatch, budget, busy):
+    """Already expired on arrival, or ran out while waiting for a busy slot."""
+    limiter = AdmissionLimiter(ROUTE, 1, 1, 5)
+    if busy:
+        limiter.acquire()
+    monkeypatch.setitem(admission._limiters, ROUTE, limiter)
+    shed, deadline = _rejected('timeout'), _rejected('deadline')
+
+    with app.app_context(), app.test_request_context('/company/us/Apple'):
+        g._deadline = time.monotonic() + budget
+        with pytest.raises(DeadlineExceeded):
+            with upstream_slot():
+                pass
+
+    assert (_rejected('timeout'), _rejected('deadline')) == (shed, deadline + 1)
+    assert limiter.active == int(busy) and limiter.waiting == 0
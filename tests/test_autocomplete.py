@@ -0,0 +1,75 @@
+from models import db, Company
+from services.autocomplete import PrefixIndex
+
+
+def _suggest(client, q, limit=10):
+    return [r['symbol'] for r in client.get(f'/autocomplete/us?q={q}&limit={limit}').get_json()['results']]
+
+
+def test_index_matches_symbol_name_and_word_starts():
+    index = PrefixIndex()
+    index.add('META', 'Meta Platforms, Inc.', 'NASDAQ', 10)
+    index.add('PLTR', 'Palantir Technologies', 'NYSE', 5)
+
+    assert [r['symbol'] for r in index.search('plat', 5)] == ['META']
+    assert [r['symbol'] for r in index.search('p', 5)] == ['META', 'PLTR']
+    assert [r['symbol'] for r in index.search('pltr', 5)] == ['PLTR']
+    assert index.search('  ', 5) == []
+
+
+def test_lookups_outrank_market_cap():
+    index = PrefixIndex()
+    index.add('BIG', 'Acme Big', None, 100)
+    index.add('SMALL', 'Acme Small', None, 1)
+
+    index.record_hit('SMALL')
+
+    assert [r['symbol'] for r in index.search('acme', 5)] == ['SMALL', 'BIG']
+
+
+def test_renamed_company_stops_matching_its_old_name():
+    index = PrefixIndex()
+    index.add('META', 'Facebook, Inc.')
+    keys = len(index._keys)
+
+    index.add('META', 'Meta Platforms, Inc.')
+
+    assert index.search('face', 5) == []
+    assert [r['name'] for r in index.search('plat', 5)] == ['Meta Platforms, Inc.']
+    assert [r['symbol'] for r in index.search('meta', 5)] == ['META']
+    for _ in range(5):
+        index.add('META', 'Facebook, Inc.')
+        index.add('META', 'Meta Platforms, Inc.')
+    # 'meta', 'meta platforms inc', 'platforms inc', 'inc': nothing left over from the flips
+    assert len(index._keys) == keys + 1
+
+
+def test_bulk_renames_drop_every_old_key():
+    index = PrefixIndex()
+    index.add_many((f'S{i}', f'Old Name {i}', None, None) for i in range(100))
+
+    index.add_many((f'S{i}', f'New Title {i}', None, None) for i in range(100))
+
+    assert index.search('old', 5) == [] and index.search('name', 5) == []
+    assert len(index.search('new', 200)) == 100
+    assert index._keys == sorted(index._keys)
+
+
+def test_suggestions_come_from_stored_companies_and_searches(client, upstream):
+    db.session.add(Company(symbol='ZZZ', name='Zebra Zone', country_code='us'))
+    db.session.commit()
+    client.get('/search/us/Micro')
+    calls = upstream.calls
+
+    assert _suggest(client, 'zeb') == ['ZZZ']
+    assert 'MICR' in _suggest(client, 'micro')
+    assert upstream.calls == calls
+
+
+def test_saved_companies_are_suggested_without_a_refresh(client, upstream):
+    assert _suggest(client, 'goog') == []
+
+    client.get('/company/us?symbols=GOOG')
+
+    assert _suggest(client, 'goog') == ['GOOG']
+    assert _suggest(client, 'goog corp') == ['GOOG']
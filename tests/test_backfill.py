@@ -0,0 +1,25 @@
+from sqlalchemy import insert
+
+from models import db, BackfillItem
+
+
+def _add(country_code, symbol, status, attempts=1):
+    db.session.execute(insert(BackfillItem), [{'run_name': 'nightly', 'country_code': country_code, 'symbol': symbol,
+                                               'status': status, 'attempts': attempts}])
+    db.session.commit()
+
+
+def test_retry_failed_and_status_stay_within_the_country(app, upstream):
+    _add('us', 'AAPL', 'failed')
+    _add('gb', 'VOD', 'failed')
+    runner = app.test_cli_runner()
+
+    result = runner.invoke(args=['backfill', 'run', '--name', 'nightly', '--retry-failed', '--rate', '0'])
+
+    assert result.exit_code == 0, result.output
+    statuses = {(item.country_code, item.symbol): item.status for item in BackfillItem.query}
+    assert statuses == {('us', 'AAPL'): 'done', ('gb', 'VOD'): 'failed'}
+    output = runner.invoke(args=['backfill', 'status', '--name', 'nightly']).output
+    assert '1/1 complete' in output and 'failed' not in output
+    output = runner.invoke(args=['backfill', 'status', '--name', 'nightly', '--country', 'gb', '--failures']).output
+    assert '0/1 complete' in output and 'VOD' in output
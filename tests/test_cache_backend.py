@@ -0,0 +1,130 @@
+import threading
+
+import pytest
+
+from benchmarks import fake_redis
+from config import Config
+from models import db, CacheEntry
+from services import cache_backend
+from services.cache_backend import (InProcessCacheBackend, NullCacheBackend, RedisCacheBackend, SQLCacheBackend,
+                                    create_cache_backend, make_key)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(cache_backend, 'time', clock)
+    return clock
+
+
+@pytest.fixture
+def redis_url():
+    fake_redis._store.clear()
+    server = fake_redis.ThreadedServer(('127.0.0.1', 0), fake_redis.RESPHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield 'redis://127.0.0.1:%d/0' % server.server_address[1]
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(params=['memory', 'redis', 'sql'])
+def backend(request):
+    if request.param == 'memory':
+        return InProcessCacheBackend()
+    if request.param == 'redis':
+        return RedisCacheBackend(request.getfixturevalue('redis_url'))
+    request.getfixturevalue('app')
+    return SQLCacheBackend()
+
+
+def test_get_many_returns_only_found_keys(backend):
+    backend.set_many({'a': {'x': 1}, 'b': [1, 2]}, ttl=60)
+    backend.set('c', 'three', ttl=60)
+
+    assert backend.get_many(['a', 'b', 'c', 'missing']) == {'a': {'x': 1}, 'b': [1, 2], 'c': 'three'}
+    assert backend.get('missing') is None
+    assert backend.get_many([]) == {}
+
+
+def test_set_many_overwrites_and_delete_removes(backend):
+    backend.set_many({'a': 1, 'b': 2}, ttl=60)
+    backend.set_many({'a': 10}, ttl=60)
+    backend.delete('b')
+
+    assert backend.get_many(['a', 'b']) == {'a': 10}
+
+
+def test_non_positive_ttl_is_not_stored(backend):
+    backend.set('a', 1, ttl=0)
+
+    assert backend.get('a') is None
+
+
+@pytest.mark.parametrize('name', ['memory', 'sql'])
+def test_entries_expire_after_their_ttl(name, clock, request):
+    if name == 'sql':
+        request.getfixturevalue('app')
+    backend = create_cache_backend(name)
+    backend.set('short', 1, ttl=10)
+    backend.set('long', 2, ttl=100)
+
+    clock.now += 10
+    assert backend.get_many(['short', 'long']) == {'long': 2}
+    clock.now += 90
+    assert backend.get('long') is None
+
+
+def test_memory_backend_evicts_least_recently_used():
+    backend = InProcessCacheBackend(max_entries=2)
+    backend.set_many({'a': 1, 'b': 2}, ttl=60)
+    backend.get('a')
+    backend.set('c', 3, ttl=60)
+
+    assert backend.get_many(['a', 'b', 'c']) == {'a': 1, 'c': 3}
+
+
+def test_bumping_the_key_version_misses_old_entries(monkeypatch):
+    backend = InProcessCacheBackend()
+    old_key = make_key('company', 'us', 'AAPL')
+    backend.set(old_key, 'old', ttl=60)
+
+    monkeypatch.setattr(Config, 'CACHE_KEY_VERSION', Config.CACHE_KEY_VERSION + 1)
+    new_key = make_key('company', 'us', 'AAPL')
+
+    assert new_key != old_key
+    assert new_key.startswith(f'cd:v{Config.CACHE_KEY_VERSION}:company:')
+    assert backend.get(new_key) is None
+
+
+def test_redis_backend_fails_open_when_the_server_is_down():
+    backend = RedisCacheBackend('redis://127.0.0.1:1/0')
+
+    backend.set('a', 1, ttl=60)
+    assert backend.get_many(['a']) == {}
+
+
+def test_sql_backend_fails_open_on_database_errors(app):
+    backend = SQLCacheBackend()
+    CacheEntry.__table__.drop(db.engine)
+
+    backend.set('a', 1, ttl=60)
+    backend.delete('a')
+    assert backend.get_many(['a']) == {}
+
+
+def test_create_cache_backend_defaults_to_none():
+    assert isinstance(create_cache_backend(None), NullCacheBackend)
+    with pytest.raises(ValueError):
+        create_cache_backend('memcached')
@@ -0,0 +1,41 @@
+from models import BackfillItem
+
+SYMBOLS = ['AAPL', 'MSFT', 'GOOG', 'AMZN', 'META', 'NFLX', 'NVDA', 'TSLA', 'ORCL', 'IBM']
+
+
+def test_batch_route_fetches_cold_profiles_in_one_call(client, upstream):
+    response = client.get('/company/us?symbols=' + ','.join(SYMBOLS))
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert [r['symbol'] for r in body['results']] == SYMBOLS
+    assert body['not_found'] == []
+    assert [sorted(call.split(',')) for call in upstream.calls_to('profile')] == [sorted(SYMBOLS)]
+    # Statements have no multi-symbol endpoint
+    assert sorted(upstream.calls_to('income-statement')) == sorted(SYMBOLS)
+
+
+def test_batch_route_serves_warm_symbols_without_upstream(client, upstream):
+    client.get('/company/us?symbols=AAPL,MSFT')
+    calls = upstream.calls
+
+    response = client.get('/company/us?symbols=msft,AAPL&fields=sector')
+
+    assert upstream.calls == calls
+    results = response.get_json()['results']
+    assert [r['symbol'] for r in results] == ['MSFT', 'AAPL']
+    assert set(results[0]['company_info']) == {'sector'}
+
+
+def test_batch_route_validates_symbols(client, upstream):
+    assert client.get('/company/us').status_code == 400
+    assert client.get('/company/us?symbols=' + ','.join(f'S{i}' for i in range(101))).status_code == 400
+    assert client.get('/company/xx?symbols=AAPL').status_code == 404
+
+
+def test_backfill_prefetches_each_chunk_of_profiles(app, upstream):
+    result = app.test_cli_runner().invoke(args=['backfill', 'run', *SYMBOLS, '--rate', '0', '--name', 'batch'])
+
+    assert result.exit_code == 0, result.output
+    assert BackfillItem.query.filter_by(run_name='batch', status='done').count() == len(SYMBOLS)
+    assert [sorted(call.split(',')) for call in upstream.calls_to('profile')] == [sorted(SYMBOLS)]
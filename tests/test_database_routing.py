@@ -0,0 +1,48 @@
+import pytest
+from sqlalchemy import create_engine, select
+
+from config import Config
+from models import db, Company
+from services.queries import company_snapshot
+from utils import database
+from utils.database import mark_written
+
+
+@pytest.fixture
+def replica(app, monkeypatch, tmp_path):
+    """An empty replica bound next to the primary: whatever a read finds came from the primary."""
+    engine = create_engine('sqlite:///' + str(tmp_path / 'replica.db'))
+    db.metadata.create_all(engine)
+    monkeypatch.setitem(db.engines, 'replica_0', engine)
+    monkeypatch.setattr(database, '_replica_keys', ['replica_0'])
+    yield engine
+    engine.dispose()
+
+
+def _save(symbol):
+    db.session.add(Company(symbol=symbol, name=symbol, country_code='us'))
+    mark_written(db.session, ('company', 'us', symbol))
+    db.session.commit()
+
+
+def test_writer_reads_its_write_from_primary_while_other_reads_use_replica(app, replica):
+    _save('AAPL')
+
+    # The writing session and any read of the written company go to the primary
+    assert company_snapshot('us', 'AAPL') is not None
+    with app.app_context():
+        assert company_snapshot('us', 'AAPL') is not None
+    # A read in another request that touched nothing just written goes to the replica
+    with app.app_context():
+        assert db.session.get_bind(clause=select(Company)) is replica
+        assert company_snapshot('us', 'MSFT') is None
+        assert db.session.get_bind(clause=select(Company)) is replica
+
+
+def test_replica_serves_written_rows_once_the_window_passes(app, replica, monkeypatch):
+    _save('AAPL')
+    monkeypatch.setattr(Config, 'REPLICA_READ_YOUR_WRITES_SECONDS', 0)
+
+    assert db.session.get_bind(clause=select(Company)) is replica
+    with app.app_context():
+        assert company_snapshot('us', 'AAPL') is None
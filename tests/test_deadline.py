@@ -0,0 +1,22 @@
+import pytest
+from flask import Flask
+
+from config import Config
+from utils import deadline
+
+
+@pytest.mark.parametrize('header, expected', [
+    ('5', 5.0),
+    (None, Config.REQUEST_DEADLINE_SECONDS),
+    ('abc', Config.REQUEST_DEADLINE_SECONDS),
+    ('0', Config.REQUEST_DEADLINE_SECONDS),
+    ('-1', Config.REQUEST_DEADLINE_SECONDS),
+    ('nan', Config.REQUEST_DEADLINE_SECONDS),
+    ('inf', Config.REQUEST_DEADLINE_SECONDS),
+    ('1e9', Config.REQUEST_DEADLINE_MAX_SECONDS),
+])
+def test_client_budget(header, expected):
+    app = Flask(__name__)
+    headers = {} if header is None else {Config.REQUEST_DEADLINE_HEADER: header}
+    with app.test_request_context(headers=headers):
+        assert deadline._budget() == expected
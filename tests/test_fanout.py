@@ -0,0 +1,44 @@
+import pytest
+
+from services.factory import APIServiceFactory
+from utils import admission, rate_limit
+from utils.admission import AdmissionLimiter, upstream_slot
+from utils.rate_limit import MemoryTokenBuckets
+
+
+class OtherCountry:
+    """A second country whose search is upstream-bound."""
+
+    def search_company(self, company_name, allow_fetch=True):
+        with upstream_slot():
+            return [{'symbol': 'ZZ1', 'name': f'{company_name} Zed'}]
+
+
+@pytest.fixture
+def one_slot_one_miss(app, monkeypatch):
+    """Each route gets one upstream slot, no queue, and one miss per minute."""
+    for route in ('search.search_companies', 'company.get_many_company_metrics'):
+        monkeypatch.setitem(admission._limiters, route, AdmissionLimiter(route, 1, 0, 1))
+    monkeypatch.setattr(rate_limit, '_storage', MemoryTokenBuckets())
+    monkeypatch.setitem(rate_limit._limits, 'miss', ({}, (1, 60.0)))
+    monkeypatch.setattr(rate_limit, '_api_keys', {})
+
+
+def test_fan_out_charges_one_miss_and_takes_one_slot(client, upstream, one_slot_one_miss, monkeypatch):
+    monkeypatch.setitem(APIServiceFactory._services, 'zz', OtherCountry())
+
+    response = client.get('/search/us,zz/Apple')
+
+    assert response.status_code == 200, response.get_json()
+    body = response.get_json()
+    assert body['timed_out'] == [] and body['failed'] == []
+    assert {r['country'] for r in body['results']} == {'us', 'zz'}
+    assert admission._limiters['search.search_companies'].active == 0
+
+
+def test_batch_lookup_charges_one_miss_and_takes_one_slot(client, upstream, one_slot_one_miss):
+    response = client.get('/company/us?symbols=AAPL,MSFT,GOOG')
+
+    assert response.status_code == 200, response.get_json()
+    assert len(response.get_json()['results']) == 3
+    assert admission._limiters['company.get_many_company_metrics'].active == 0
@@ -0,0 +1,27 @@
+def test_fields_and_years_project_the_company_response(client, upstream):
+    full = client.get('/company/us/Apple').get_json()
+    assert len(full['year_wise_financials']) > 1
+
+    body = client.get('/company/us/Apple?fields=sector,revenue_usd&years=1').get_json()
+
+    assert body['company_info'] == {'sector': full['company_info']['sector']}
+    latest = full['year_wise_financials'][0]
+    assert body['year_wise_financials'] == [{'year': latest['year'], 'revenue_usd': latest['revenue_usd']}]
+    assert 'peer_percentiles' not in body and 'data_quality' not in body
+
+
+def test_section_names_select_whole_sections(client, upstream):
+    full = client.get('/company/us/Apple').get_json()
+
+    body = client.get('/company/us/Apple?fields=company_info').get_json()
+
+    assert body['company_info'] == full['company_info']
+    assert 'year_wise_financials' not in body
+
+
+def test_unknown_fields_are_rejected(client, upstream):
+    response = client.get('/company/us/Apple?fields=sector,bogus')
+
+    assert response.status_code == 400
+    assert "'bogus'" in response.get_json()['error']
+    assert upstream.calls == 0
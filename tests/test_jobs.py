@@ -0,0 +1,53 @@
+import threading
+import time
+
+import pytest
+
+from services.jobs import JobQueueFull, JobRunner
+
+
+def _poll(client, url, timeout=5):
+    end = time.monotonic() + timeout
+    while True:
+        job = client.get(url).get_json()
+        if job['status'] in ('done', 'failed') or time.monotonic() > end:
+            return job
+        time.sleep(0.01)
+
+
+def test_cold_async_lookup_returns_a_job_to_poll(client, upstream):
+    response = client.get('/company/us/Apple?async=true')
+
+    assert response.status_code == 202
+    assert response.headers['Location'] == response.get_json()['status_url']
+    job = _poll(client, response.headers['Location'])
+    assert job['status'] == 'done' and job['result_status'] == 200
+    assert job['result']['symbol'] == 'APPL'
+
+    # Now cached, so answered synchronously
+    response = client.get('/company/us/Apple', headers={'Prefer': 'respond-async'})
+    assert response.status_code == 200
+    assert response.get_json() == job['result']
+
+
+def test_unknown_job_is_404(client):
+    assert client.get('/jobs/does-not-exist').status_code == 404
+
+
+def test_identical_lookups_share_a_job_and_the_queue_is_bounded(app):
+    runner = JobRunner(workers=1, max_pending=2)
+    release = threading.Event()
+
+    def lookup(name):
+        release.wait(5)
+        return {'name': name}, 200
+
+    first = runner.submit(app, 'a', lookup, 'a')
+    assert runner.submit(app, 'a', lookup, 'a')['job_id'] == first['job_id']
+    runner.submit(app, 'b', lookup, 'b')
+    with pytest.raises(JobQueueFull):
+        runner.submit(app, 'c', lookup, 'c')
+
+    release.set()
+    runner._executor.shutdown(wait=True)
+    assert runner.get(first['job_id'])['result'] == {'name': 'a'}
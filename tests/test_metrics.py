@@ -0,0 +1,32 @@
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import OperationalError
+
+from models import db
+from utils.metrics import DB_QUERY_LATENCY
+
+
+def _observed(operation):
+    state = DB_QUERY_LATENCY._values.get((operation,))
+    return state[2] if state else 0
+
+
+def test_failed_statements_leave_no_timing_state_on_the_connection(app):
+    selects = _observed('SELECT')
+    with db.engine.connect() as conn:
+        for _ in range(3):
+            with pytest.raises(OperationalError):
+                conn.execute(text('SELECT * FROM no_such_table'))
+        conn.execute(text('SELECT 1'))
+
+        assert not any('query_start' in key for key in conn.info)
+    assert _observed('SELECT') == selects + 1
+
+
+def test_metrics_endpoint_renders_request_counts(client):
+    client.get('/companies/us')
+
+    body = client.get('/metrics').get_data(as_text=True)
+
+    assert 'http_requests_total{' in body
+    assert 'db_query_duration_seconds_bucket{' in body
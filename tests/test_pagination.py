@@ -0,0 +1,45 @@
+from utils.pagination import decode_cursor, encode_cursor
+
+SYMBOLS = ['AMZN', 'AAPL', 'META', 'MSFT', 'GOOG']
+
+
+def _walk(client, url):
+    """Every page of ``url``, following ``next_cursor`` until it runs out."""
+    pages, cursor = [], None
+    while True:
+        body = client.get(url + (f'&cursor={cursor}' if cursor else '')).get_json()
+        pages.append([r['symbol'] for r in body['results']])
+        cursor = body['next_cursor']
+        if cursor is None:
+            return pages
+
+
+def test_cursor_round_trip():
+    assert decode_cursor(encode_cursor('us', 'AAPL'), 2) == ['us', 'AAPL']
+
+
+def test_companies_pages_follow_symbol_order(client, upstream):
+    client.get('/company/us?symbols=' + ','.join(SYMBOLS))
+
+    pages = _walk(client, '/companies/us?limit=2')
+
+    assert pages == [['AAPL', 'AMZN'], ['GOOG', 'META'], ['MSFT']]
+
+
+def test_companies_rejects_bad_and_foreign_cursors(client):
+    assert client.get('/companies/us?cursor=not-a-cursor').status_code == 400
+    assert client.get('/companies/us?cursor=' + encode_cursor('us')).status_code == 400
+    response = client.get('/companies/us?cursor=' + encode_cursor('gb', 'VOD'))
+    assert response.status_code == 400
+    assert 'different country' in response.get_json()['error']
+
+
+def test_search_pages_keep_the_ranking(client, upstream):
+    everything = _walk(client, '/search/us/Micro?limit=100')[0]
+
+    pages = _walk(client, '/search/us/Micro?limit=2')
+
+    assert len(everything) > 2
+    assert [symbol for page in pages for symbol in page] == everything
+    assert all(len(page) == 2 for page in pages[:-1])
+    assert client.get('/search/us/Micro?cursor=%%%').status_code == 400
@@ -0,0 +1,29 @@
+from services import peer_stats
+
+INDUSTRY = 'Synthetic Industry'  # every stub profile's industry
+
+
+def _market_cap_peers(client, symbol):
+    result = client.get(f'/company/us?symbols={symbol}').get_json()['results'][0]
+    return result['peer_percentiles']['industry']['market_cap_usd']['peers']
+
+
+def test_first_company_in_a_group_gets_statistics_with_its_save(client, upstream):
+    assert client.get(f'/peers/us?industry={INDUSTRY}').status_code == 404
+
+    assert _market_cap_peers(client, 'AAPL') == 1
+
+    response = client.get(f'/peers/us?industry={INDUSTRY}')
+    assert response.status_code == 200
+    assert {s['metric']: s['peers'] for s in response.get_json()['statistics']}['market_cap_usd'] == 1
+
+
+def test_later_saves_show_up_after_a_refresh(client, upstream):
+    client.get('/company/us?symbols=AAPL')
+    client.get('/company/us?symbols=MSFT')
+    assert _market_cap_peers(client, 'MSFT') == 1
+
+    assert peer_stats.stats_refresher().refresh() > 0
+
+    assert _market_cap_peers(client, 'MSFT') == 2
+    assert _market_cap_peers(client, 'AAPL') == 2
@@ -0,0 +1,77 @@
+import pytest
+
+from utils import rate_limit
+from utils.rate_limit import MemoryTokenBuckets, RateLimited, charge_miss, parse_limit
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def limits(app, monkeypatch):
+    """In-memory buckets with 2 requests and 1 miss per minute for every route."""
+    monkeypatch.setattr(rate_limit, '_storage', MemoryTokenBuckets())
+    monkeypatch.setitem(rate_limit._limits, 'request', ({}, (2, 60.0)))
+    monkeypatch.setitem(rate_limit._limits, 'miss', ({}, (1, 60.0)))
+    monkeypatch.setattr(rate_limit, '_api_keys', {'good-key': 'key:good'})
+
+
+def _request(app, ip='10.0.0.1', headers=None):
+    """``_before_request`` for a fresh request; None when it is let through."""
+    with app.app_context(), app.test_request_context('/company/us/Apple', headers=headers,
+                                                     environ_base={'REMOTE_ADDR': ip}):
+        return rate_limit._before_request()
+
+
+def test_parse_limit():
+    assert parse_limit('120/60') == (120, 60.0)
+    assert parse_limit('5') == (5, 1.0)
+
+
+def test_bucket_refills_at_its_rate(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limit, 'time', clock)
+    buckets = MemoryTokenBuckets()
+
+    assert [buckets.consume('a', 2, 60).allowed for _ in range(3)] == [True, True, False]
+    assert buckets.consume('b', 2, 60).allowed
+    rejected = buckets.consume('a', 2, 60)
+    assert rejected.remaining == 0 and rejected.reset == pytest.approx(30)
+
+    clock.now += 30
+    assert buckets.consume('a', 2, 60).allowed
+    assert not buckets.consume('a', 2, 60).allowed
+
+
+def test_request_budget_is_per_client(app, limits):
+    assert _request(app) is None
+    assert _request(app) is None
+
+    body, status = _request(app)
+    assert status == 429
+    assert int(body.headers['Retry-After']) >= 1
+    assert _request(app, ip='10.0.0.2') is None
+
+
+def test_only_configured_api_keys_get_their_own_bucket(app, limits):
+    for _ in range(2):
+        _request(app)
+
+    assert _request(app, headers={'X-API-Key': 'good-key'}) is None
+    assert _request(app, headers={'X-API-Key': 'made-up'})[1] == 429
+
+
+def test_miss_budget_is_charged_once_per_request(app, limits):
+    with app.app_context(), app.test_request_context('/company/us/Apple'):
+        charge_miss()
+        charge_miss()
+
+    with app.app_context(), app.test_request_context('/company/us/Apple'):
+        with pytest.raises(RateLimited) as e:
+            charge_miss()
+    assert not e.value.decision.allowed
@@ -0,0 +1,49 @@
+import gzip
+import json
+
+from models import db
+from services import peer_stats
+
+SYMBOLS = 'AAPL,MSFT,GOOG'
+
+
+def test_export_then_import_restores_companies_and_searches(app, client, upstream, tmp_path):
+    client.get(f'/company/us?symbols={SYMBOLS}')
+    peer_stats.stats_refresher().refresh()
+    before = client.get(f'/company/us?symbols={SYMBOLS}').get_json()
+    search = client.get('/search/us/Micro').get_json()
+    path = str(tmp_path / 'snapshot.ndjson.gz')
+    runner = app.test_cli_runner()
+
+    result = runner.invoke(args=['snapshot', 'export', path])
+    assert result.exit_code == 0, result.output
+
+    db.session.remove()
+    db.drop_all()
+    db.create_all()
+    result = runner.invoke(args=['snapshot', 'import', path])
+    assert result.exit_code == 0, result.output
+    assert 'Imported 3 of 3 companies and 1 search results' in result.output
+    assert runner.invoke(args=['peers', 'rebuild']).exit_code == 0
+
+    calls = upstream.calls
+    assert client.get(f'/company/us?symbols={SYMBOLS}').get_json() == before
+    assert client.get('/search/us/Micro').get_json() == search
+    assert upstream.calls == calls
+
+
+def test_import_refuses_a_truncated_snapshot(app, client, upstream, tmp_path):
+    client.get(f'/company/us?symbols={SYMBOLS}')
+    path = str(tmp_path / 'snapshot.ndjson.gz')
+    runner = app.test_cli_runner()
+    runner.invoke(args=['snapshot', 'export', path])
+    with gzip.open(path, 'rt') as f:
+        lines = f.readlines()
+    assert json.loads(lines[-1])['t'] == 'end'
+    with gzip.open(path, 'wt') as f:
+        f.writelines(lines[:-1])
+
+    result = runner.invoke(args=['snapshot', 'import', path])
+
+    assert result.exit_code != 0
+    assert 'truncated' in result.output
@@ -0,0 +1,38 @@
+import pytest
+
+from utils import timing
+
+
+@pytest.fixture
+def profiling(app, monkeypatch, tmp_path):
+    monkeypatch.setitem(app.config, 'PROFILING_ENABLED', True)
+    monkeypatch.setitem(app.config, 'PROFILING_TOKEN', 'secret')
+    monkeypatch.setitem(app.config, 'PROFILE_DIR', str(tmp_path))
+    return tmp_path
+
+
+def test_token_request_is_profiled(client, profiling):
+    response = client.get('/companies/us', headers={'X-Profile-Token': 'secret'})
+
+    assert (profiling / response.headers['X-Profile-File']).exists()
+    assert not timing._profile_lock.locked()
+    assert 'X-Profile-File' not in client.get('/companies/us').headers
+
+
+def test_only_one_request_is_profiled_at_a_time(client, profiling):
+    with timing._profile_lock:
+        response = client.get('/companies/us', headers={'X-Profile-Token': 'secret'})
+
+    assert response.status_code == 200
+    assert 'X-Profile-File' not in response.headers
+
+
+def test_profiling_slot_is_freed_when_the_response_is_never_finished(app, client, profiling, monkeypatch):
+    """A later-registered after_request hook raises before ours runs; teardown still frees the slot."""
+    def fail(response):
+        raise RuntimeError('boom')
+    monkeypatch.setattr(app, 'testing', False)
+    monkeypatch.setitem(app.after_request_funcs, None, [*app.after_request_funcs[None], fail])
+
+    assert client.get('/companies/us', headers={'X-Profile-Token': 'secret'}).status_code == 500
+    assert not timing._profile_lock.locked()
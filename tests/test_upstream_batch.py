@@ -0,0 +1,175 @@
+import threading
+import time
+
+import pytest
+from flask import Flask, g
+
+from services.upstream_batch import MicroBatcher
+from utils import deadline
+from utils.deadline import DeadlineExceeded
+
+
+class Upstream:
+    """fetch_many stand-in: records each call, optionally blocking or failing."""
+
+    def __init__(self, delay=0.0, error=None):
+        self.delay = delay
+        self.error = error
+        self.calls = []
+        self.saw_deadline = []
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self, keys):
+        self.calls.append(list(keys))
+        self.saw_deadline.append(deadline.remaining())
+        self.release.wait(5)
+        time.sleep(self.delay)
+        if self.error is not None:
+            raise self.error
+        return {key: key.lower() for key in keys}
+
+
+def run(fn, *args):
+    """Runs fn on a thread; returns (thread, outcome) where outcome holds the result or the exception."""
+    outcome = {}
+
+    def target():
+        try:
+            outcome['value'] = fn(*args)
+        except Exception as e:
+            outcome['error'] = e
+    thread = threading.Thread(target=target)
+    thread.start()
+    return thread, outcome
+
+
+def wait_for(condition, timeout=2):
+    end = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > end:
+            raise AssertionError("condition not met in time")
+        time.sleep(0.001)
+
+
+def in_flight(batcher, upstream):
+    """Starts a lone fetch of 'X' and waits until its call is blocked upstream."""
+    upstream.release.clear()
+    started = run(batcher.get, 'X')
+    wait_for(lambda: upstream.calls)
+    return started
+
+
+def make(upstream, window=0.5, max_batch=50):
+    return MicroBatcher('test', upstream, window, max_batch, workers=4)
+
+
+def test_lone_fetch_is_sent_without_waiting():
+    upstream = Upstream()
+    batcher = make(upstream, window=1.0)
+    start = time.monotonic()
+    assert batcher.get('AAPL') == 'aapl'
+    assert time.monotonic() - start < 0.5
+    assert upstream.calls == [['AAPL']]
+
+
+def test_fetches_during_a_call_share_the_next_one():
+    upstream = Upstream()
+    batcher = make(upstream, window=0.2)
+    first, first_outcome = in_flight(batcher, upstream)
+    waiters = [run(batcher.get, key) for key in ('A', 'B', 'B', 'C')]
+    wait_for(lambda: batcher._open is not None and len(batcher._open.keys) == 3)
+    upstream.release.set()
+    for thread, _ in [(first, first_outcome)] + waiters:
+        thread.join(2)
+
+    assert upstream.calls[0] == ['X']
+    assert sorted(upstream.calls[1]) == ['A', 'B', 'C']
+    assert first_outcome['value'] == 'x'
+    assert [outcome['value'] for _, outcome in waiters] == ['a', 'b', 'b', 'c']
+
+
+def test_full_batch_is_sent_before_the_window_ends():
+    upstream = Upstream()
+    batcher = make(upstream, window=5.0, max_batch=2)
+    first = in_flight(batcher, upstream)
+    waiters = [run(batcher.get, key) for key in ('A', 'B')]
+    wait_for(lambda: len(upstream.calls) == 2, timeout=1)
+    upstream.release.set()
+    for thread, _ in waiters + [first]:
+        thread.join(2)
+    assert sorted(upstream.calls[1]) == ['A', 'B']
+    assert [outcome['value'] for _, outcome in waiters] == ['a', 'b']
+
+
+def test_failed_call_fails_every_waiter():
+    upstream = Upstream(error=RuntimeError('provider down'))
+    batcher = make(upstream, window=0.2)
+    first, first_outcome = in_flight(batcher, upstream)
+    waiters = [run(batcher.get, key) for key in ('A', 'B')]
+    wait_for(lambda: batcher._open is not None and len(batcher._open.keys) == 2)
+    upstream.release.set()
+    for thread, _ in [(first, first_outcome)] + waiters:
+        thread.join(2)
+
+    assert len(upstream.calls) == 2
+    for outcome in [first_outcome] + [outcome for _, outcome in waiters]:
+        assert isinstance(outcome['error'], RuntimeError)
+    # The batcher recovers for the next fetch
+    upstream.error = None
+    assert batcher.get('D') == 'd'
+
+
+def test_prefetched_values_answer_the_next_get():
+    upstream = Upstream()
+    batcher = make(upstream, max_batch=2)
+    batcher.prefetch(['A', 'B', 'C', 'A'])
+    assert upstream.calls == [['A', 'B'], ['C']]
+    assert batcher.get('B') == 'b'
+    assert len(upstream.calls) == 2
+    assert batcher.get('B') == 'b'
+    assert len(upstream.calls) == 3
+
+
+@pytest.fixture
+def app():
+    app = Flask(__name__)
+    deadline.init_app(app)
+    return app
+
+
+def with_budget(app, batcher, key, budget=None):
+    headers = {} if budget is None else {'X-Request-Timeout': str(budget)}
+    with app.test_request_context(headers=headers):
+        app.preprocess_request()
+        return batcher.get(key)
+
+
+def test_short_deadline_does_not_fail_the_rest_of_the_batch(app):
+    upstream = Upstream(delay=0.3)
+    batcher = make(upstream, window=0.5, max_batch=2)
+    first, _ = in_flight(batcher, upstream)
+    short = run(with_budget, app, batcher, 'A', 0.1)
+    wait_for(lambda: batcher._open is not None)
+    default = run(with_budget, app, batcher, 'B')
+    upstream.release.set()
+    for thread, _ in (short, default):
+        thread.join(3)
+    first.join(2)
+
+    assert isinstance(short[1]['error'], DeadlineExceeded)
+    assert default[1]['value'] == 'b'
+    assert upstream.calls[1] == ['A', 'B']
+    # The shared call is not bound by any caller's deadline
+    assert upstream.saw_deadline == [None, None]
+
+
+def test_spent_budget_does_not_join_a_batch(app):
+    upstream = Upstream()
+    batcher = make(upstream)
+    with app.test_request_context():
+        app.preprocess_request()
+        g._deadline = time.monotonic()
+        with pytest.raises(DeadlineExceeded):
+            batcher.get('A')
+    assert upstream.calls == []
@@ -0,0 +1,103 @@
+import time
+
+import pytest
+from sqlalchemy import select
+
+from models import db, SearchCache
+from services import write_behind
+from services.write_behind import SearchCacheWriter
+
+
+def _rows():
+    return {(row.country_code, row.query): row.get_results() for row in db.session.scalars(select(SearchCache))}
+
+
+def _wait_for(condition, timeout=5):
+    end = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > end:
+            pytest.fail('timed out')
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def writer(app):
+    writer = SearchCacheWriter(app, interval=60, batch_size=3, max_pending=4)
+    yield writer
+    writer.close()
+
+
+def test_flush_writes_the_queue_in_one_transaction(writer, monkeypatch):
+    writes = []
+    write = writer._write
+    monkeypatch.setattr(writer, '_write', lambda batch: (writes.append(len(batch)), write(batch)))
+    writer.enqueue('us', 'apple', [{'symbol': 'AAPL'}], 1)
+    writer.enqueue('us', 'apple', [{'symbol': 'AAPL'}, {'symbol': 'APLE'}], 2)
+    writer.enqueue('gb', 'apple', [], 3)
+
+    assert _rows() == {}
+    assert writer.flush() == 2
+    assert writes == [2]
+    assert _rows() == {('us', 'apple'): [{'symbol': 'AAPL'}, {'symbol': 'APLE'}], ('gb', 'apple'): []}
+    assert writer.flush() == 0
+
+
+def test_full_batch_wakes_the_flusher(writer):
+    for i in range(3):
+        writer.enqueue('us', f'q{i}', [i], 1)
+
+    _wait_for(lambda: len(_rows()) == 3)
+
+
+def test_pending_and_in_flight_rows_are_readable(writer, monkeypatch):
+    seen = []
+    write = writer._write
+    monkeypatch.setattr(writer, '_write', lambda batch: (seen.append(writer.get('us', 'apple')), write(batch)))
+    writer.enqueue('us', 'apple', ['AAPL'], 1)
+
+    assert writer.get('us', 'apple') == ['AAPL']
+    assert writer.get('us', 'pear') is None
+    writer.flush()
+    assert seen == [['AAPL']]
+    assert writer.get('us', 'apple') is None
+
+
+def test_a_bad_row_is_dropped_without_blocking_the_rest(writer):
+    writer.enqueue('us', 'good', ['ok'], 1)
+    writer.enqueue('us', 'bad', [object()], 1)  # not JSON-serialisable
+    writer.enqueue('gb', 'good', ['ok'], 1)
+
+    assert writer.flush() == 2
+    assert _rows() == {('us', 'good'): ['ok'], ('gb', 'good'): ['ok']}
+    writer.enqueue('us', 'later', ['ok'], 1)
+    assert writer.flush() == 1
+
+
+def test_full_queue_refuses_new_queries(writer):
+    for i in range(4):
+        assert writer.enqueue('us', f'q{i}', [], 1)
+
+    assert not writer.enqueue('us', 'q4', [], 1)
+    assert writer.enqueue('us', 'q0', ['replaced'], 2)
+
+
+def test_close_drains_the_queue(app):
+    writer = SearchCacheWriter(app, interval=60)
+    writer.enqueue('us', 'apple', ['AAPL'], 1)
+
+    writer.close()
+
+    assert _rows() == {('us', 'apple'): ['AAPL']}
+
+
+def test_search_reads_results_waiting_in_the_buffer(app, service, upstream, monkeypatch):
+    monkeypatch.setattr(write_behind, '_writer', SearchCacheWriter(app, interval=60))
+
+    first = service.search_company('apple')
+    calls = upstream.calls
+
+    assert _rows() == {}
+    assert service.search_company('apple') == first
+    assert upstream.calls == calls
+    write_behind._writer.close()
+    assert _rows() == {('us', 'apple'): first}
@@ -0,0 +1,160 @@
+"""
+Admission control for requests that have to wait on the upstream provider.
+
+Only the miss path is limited. A request takes a slot from its route's limiter
+just before calling upstream, so cache hits never queue behind cold lookups and
+always have worker capacity. At most ``UPSTREAM_MAX_CONCURRENCY`` upstream-bound
+requests per route run at once (overridable per endpoint with
+``UPSTREAM_ROUTE_LIMITS="company.get_company_metrics=4,search.search_companies=8"``).
+Up to ``UPSTREAM_MAX_QUEUE`` more wait up to ``UPSTREAM_QUEUE_TIMEOUT`` seconds
+(or what is left of the request's deadline) for a slot. Anything beyond that is shed with ``503`` and ``Retry-After``.
+A request that fans its upstream work out to several threads still takes one slot.
+A request whose deadline is already spent, or runs out while it waits, raises
+DeadlineExceeded instead: the server is not overloaded, the client's budget is
+gone, so it gets the deadline handling (stale data or ``504``).
+
+Work outside a request (async jobs, CLI) is not limited here; the job pool is
+already bounded.
+"""
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import current_app, has_request_context, jsonify, request
+
+from config import Config
+from utils import deadline
+from utils.concurrency import request_state
+from utils.deadline import DeadlineExceeded
+from utils.metrics import ADMISSION_QUEUE_DEPTH, ADMISSION_REJECTED
+from utils.rate_limit import charge_miss
+
+
+class Overloaded(Exception):
+    """Raised when an upstream-bound request cannot be admitted in time."""
+
+    def __init__(self, route, reason):
+        super().__init__(f"{route}: {reason}")
+        self.route = route
+        self.reason = reason
+
+
+class AdmissionLimiter:
+    """Concurrency limit with a bounded wait queue and a per-request deadline."""
+
+    def __init__(self, name, max_concurrent, max_queue, timeout):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self.active = 0
+        self.waiting = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, timeout=None):
+        """Waits at most ``timeout`` seconds (when shorter than the limiter's own) for a slot."""
+        with self._cond:
+            if self.active < self.max_concurrent and not self.waiting:
+                self.active += 1
+                return
+            if self.waiting >= self.max_queue:
+                raise Overloaded(self.name, 'queue_full')
+            self.waiting += 1
+            ADMISSION_QUEUE_DEPTH.set(self.waiting, self.name)
+            deadline = time.monotonic() + (self.timeout if timeout is None else min(self.timeout, timeout))
+            try:
+                while self.active >= self.max_concurrent:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise Overloaded(self.name, 'timeout')
+                    self._cond.wait(remaining)
+                self.active += 1
+            finally:
+                self.waiting -= 1
+                ADMISSION_QUEUE_DEPTH.set(self.waiting, self.name)
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify()
+
+
+def _parse_route_limits(spec):
+    limits = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        name, _, limit = item.partition('=')
+        limits[name.strip()] = int(limit)
+    return limits
+
+
+_route_limits = _parse_route_limits(Config.UPSTREAM_ROUTE_LIMITS)
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(route):
+    limiter = _limiters.get(route)
+    if limiter is None:
+        with _limiters_lock:
+            limiter = _limiters.get(route)
+            if limiter is None:
+                limiter = _limiters[route] = AdmissionLimiter(
+                    route, _route_limits.get(route, Config.UPSTREAM_MAX_CONCURRENCY),
+                    Config.UPSTREAM_MAX_QUEUE, Config.UPSTREAM_QUEUE_TIMEOUT)
+    return limiter
+
+
+def _admit(limiter):
+    if deadline.expired():
+        ADMISSION_REJECTED.inc(limiter.name, 'deadline')
+        raise DeadlineExceeded()
+    try:
+        limiter.acquire(deadline.remaining())
+    except Overloaded as e:
+        if e.reason == 'timeout' and deadline.expired():
+            ADMISSION_REJECTED.inc(e.route, 'deadline')
+            raise DeadlineExceeded() from e
+        ADMISSION_REJECTED.inc(e.route, e.reason)
+        raise
+
+
+@contextmanager
+def upstream_slot():
+    """
+    Holds one of the current route's upstream slots; raises Overloaded if none frees up in time,
+    or DeadlineExceeded if the request's deadline runs out first.
+
+    A request holds one slot however many of its threads (fan-out, batch lookups) are
+    inside ``upstream_slot`` at once; it is released when the last of them leaves.
+    Also charges the client's per-route miss budget (RateLimited when exhausted).
+    """
+    charge_miss()
+    if not (Config.ADMISSION_CONTROL_ENABLED and has_request_context()):
+        yield
+        return
+    limiter = get_limiter(request.endpoint or 'unknown')
+    state = request_state()
+    with state.lock:
+        holders = getattr(state, 'upstream_holders', 0)
+        if not holders:
+            _admit(limiter)
+        state.upstream_holders = holders + 1
+    try:
+        yield
+    finally:
+        with state.lock:
+            state.upstream_holders -= 1
+            if not state.upstream_holders:
+                limiter.release()
+
+
+def _handle_overloaded(e):
+    current_app.logger.warning("Shedding upstream-bound request (%s)", e)
+    response = jsonify({'error': 'Server is busy fetching data for other requests, please retry shortly'})
+    response.headers['Retry-After'] = str(Config.ADMISSION_RETRY_AFTER)
+    return response, 503
+
+
+def init_app(app):
+    """Turns Overloaded raised anywhere in a request into an early 503."""
+    app.register_error_handler(Overloaded, _handle_overloaded)
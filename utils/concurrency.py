@@ -0,0 +1,50 @@
+"""
+Running part of a request's work on other threads.
+
+``in_current_context(fn)`` wraps ``fn`` for a thread pool. Under a request it
+runs with a copy of the request context, so admission control, rate limits and
+the request's deadline still apply to its upstream calls. Outside a request it
+runs in an app context of its own. Either way the thread gets its own DB session.
+
+A copied request context comes with a fresh ``g``, so per-request state that
+must be seen by every thread doing the request's work (the miss-budget charge,
+the upstream slot) lives in ``request_state()``, which is handed to those
+threads by reference.
+"""
+import threading
+
+from flask import copy_current_request_context, current_app, g, has_request_context
+
+from utils import deadline
+
+
+class RequestState:
+    """Attributes shared by a request and its worker threads; guard read-modify-writes with ``lock``."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+
+
+def request_state():
+    """The current request's shared state (created on first use)."""
+    state = g.get('_request_state')
+    if state is None:
+        state = g._request_state = RequestState()
+    return state
+
+
+def in_current_context(fn):
+    if has_request_context():
+        state = request_state()
+        carried = deadline.carry(fn)
+
+        def run_in_request(*args, **kwargs):
+            g._request_state = state
+            return carried(*args, **kwargs)
+        return copy_current_request_context(run_in_request)
+    app = current_app._get_current_object()
+
+    def run(*args, **kwargs):
+        with app.app_context():
+            return fn(*args, **kwargs)
+    return run
@@ -0,0 +1,188 @@
+"""
+Database engine tuning and read/write routing.
+
+SQLite production mode (``SQLITE_PRODUCTION_MODE=true``) applies WAL and related
+pragmas to every new connection and serialises writes within the process
+through a FIFO write queue, so concurrent commits wait their turn instead of
+failing with "database is locked". Reads are not queued, and under WAL they
+keep running while a write is in progress.
+
+When ``DATABASE_REPLICA_URLS`` is set, ``RoutingSession`` sends plain SELECTs
+to a replica and everything else (flushes, DML, reads inside a transaction
+that has written) to the primary. The read-your-writes window
+(``REPLICA_READ_YOUR_WRITES_SECONDS``) is scoped to what was written, not to the
+process: after a commit that wrote, the rest of that session (one request or
+app context) reads from the primary, and writers name the rows they saved with
+``mark_written`` so later requests reading those rows call ``use_primary`` while
+``recently_written`` says a replica may still lag. Everyone else keeps reading
+from the replicas. The window only covers this process's own commits, so code
+that reads rows in order to write them (refreshes, saves) calls ``use_primary``
+first: a replica lagging another worker's save would otherwise make it insert a
+company that already exists.
+"""
+import random
+import threading
+import time
+from contextlib import nullcontext
+
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event
+from sqlalchemy.sql import Select
+
+from config import Config
+
+
+class WriteQueue:
+    """Re-entrant FIFO lock: writers are admitted strictly in arrival order."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._next_ticket = 0
+        self._now_serving = 0
+        self._owner = None
+        self._depth = 0
+
+    def __enter__(self):
+        me = threading.get_ident()
+        with self._cond:
+            if self._owner == me:
+                self._depth += 1
+                return self
+            ticket = self._next_ticket
+            self._next_ticket += 1
+            while ticket != self._now_serving:
+                self._cond.wait()
+            self._owner = me
+            self._depth = 1
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        with self._cond:
+            self._depth -= 1
+            if self._depth == 0:
+                self._owner = None
+                self._now_serving += 1
+                self._cond.notify_all()
+        return False
+
+
+_write_queue = WriteQueue()
+_write_queue_enabled = False
+
+
+def write_lock():
+    """Context manager around a block that writes and commits; a no-op unless SQLite production mode is on."""
+    return _write_queue if _write_queue_enabled else nullcontext()
+
+
+def enable_write_queue():
+    """Serialises writes in this process even outside SQLite production mode (e.g. multi-threaded CLI jobs)."""
+    global _write_queue_enabled
+    _write_queue_enabled = True
+
+
+def is_sqlite(uri):
+    return uri.startswith('sqlite')
+
+
+def sqlite_pragmas():
+    return [
+        'PRAGMA journal_mode=WAL',
+        'PRAGMA synchronous=NORMAL',
+        f'PRAGMA busy_timeout={int(Config.SQLITE_BUSY_TIMEOUT_MS)}',
+        f'PRAGMA mmap_size={int(Config.SQLITE_MMAP_SIZE)}',
+        # Negative cache_size is in KiB rather than pages.
+        f'PRAGMA cache_size=-{int(Config.SQLITE_CACHE_SIZE_KB)}',
+        'PRAGMA temp_store=MEMORY',
+    ]
+
+
+def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    try:
+        for pragma in sqlite_pragmas():
+            cursor.execute(pragma)
+    finally:
+        cursor.close()
+
+
+REPLICA_BIND_PREFIX = 'replica_'
+_replica_keys = []
+# Recently written keys -> monotonic commit time; pruned once it grows past this
+_written = {}
+_WRITTEN_PRUNE_AT = 10000
+_written_lock = threading.Lock()
+
+
+def mark_written(session, key):
+    """Records that ``key`` (e.g. ``('company', 'us', 'AAPL')``) is written by the session's transaction."""
+    session.info.setdefault('written_keys', set()).add(key)
+
+
+def recently_written(key):
+    """True while a replica may not yet have this process's last commit of ``key``."""
+    written_at = _written.get(key)
+    return written_at is not None and time.monotonic() - written_at < Config.REPLICA_READ_YOUR_WRITES_SECONDS
+
+
+def use_primary(session):
+    """Sends the session's reads to the primary until its transaction commits or rolls back."""
+    session.info['primary'] = True
+
+
+class RoutingSession(Session):
+    """Session that serves pure reads from a replica and everything else from the primary."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and _replica_keys and isinstance(clause, Select)
+                and not self._flushing and not self.info.get('wrote')
+                and not self.info.get('primary')
+                and time.monotonic() - self.info.get('last_write', float('-inf'))
+                >= Config.REPLICA_READ_YOUR_WRITES_SECONDS):
+            return self._db.engines[random.choice(_replica_keys)]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _mark_session_wrote(session, flush_context):
+    session.info['wrote'] = True
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def _record_commit(session):
+    session.info.pop('primary', None)
+    keys = session.info.pop('written_keys', ())
+    if session.info.pop('wrote', False):
+        now = session.info['last_write'] = time.monotonic()
+        if keys:
+            with _written_lock:
+                if len(_written) >= _WRITTEN_PRUNE_AT:
+                    cutoff = now - Config.REPLICA_READ_YOUR_WRITES_SECONDS
+                    for key in [k for k, t in _written.items() if t < cutoff]:
+                        del _written[key]
+                _written.update(dict.fromkeys(keys, now))
+
+
+@event.listens_for(RoutingSession, 'after_rollback')
+def _reset_session_wrote(session):
+    session.info.pop('wrote', None)
+    session.info.pop('primary', None)
+    session.info.pop('written_keys', None)
+
+
+def init_app(app, db):
+    """Applies engine-level tuning and replica routing for the configured database."""
+    global _write_queue_enabled, _replica_keys
+    _replica_keys = [key for key in app.config.get('SQLALCHEMY_BINDS') or {} if key.startswith(REPLICA_BIND_PREFIX)]
+    if _replica_keys:
+        app.logger.info("Routing reads to %d replica(s)", len(_replica_keys))
+
+    uri = app.config['SQLALCHEMY_DATABASE_URI']
+    if not (app.config['SQLITE_PRODUCTION_MODE'] and is_sqlite(uri)):
+        return
+    with app.app_context():
+        engine = db.engine
+        if not event.contains(engine, 'connect', _apply_sqlite_pragmas):
+            event.listen(engine, 'connect', _apply_sqlite_pragmas)
+    _write_queue_enabled = True
+    app.logger.info("SQLite production mode enabled (WAL, serialized writes)")
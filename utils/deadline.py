@@ -0,0 +1,86 @@
+"""
+Per-request deadlines for work that waits on the upstream provider.
+
+Every request gets a budget of ``REQUEST_DEADLINE_SECONDS``. A client can ask
+for a different one with the ``REQUEST_DEADLINE_HEADER`` header
+(``X-Request-Timeout: 5``), capped at ``REQUEST_DEADLINE_MAX_SECONDS``. Each
+upstream call times out after the remaining budget, or after ``UPSTREAM_TIMEOUT``
+if that is sooner. Once the budget is spent, no new call is started:
+``upstream_timeout`` raises DeadlineExceeded, and the services answer with stale
+or partial data where they have any. Otherwise the request fails with ``504``.
+
+Outside a request (async jobs, CLI commands) there is no deadline, and calls
+use ``UPSTREAM_TIMEOUT``.
+"""
+import math
+import time
+
+from flask import current_app, g, has_request_context, jsonify, request
+
+from config import Config
+
+# Below this much budget an upstream call is not worth starting
+MIN_CALL_SECONDS = 0.05
+
+
+class DeadlineExceeded(Exception):
+    """Raised when the request's budget ran out before the upstream data it needs arrived."""
+
+
+def _budget():
+    raw = request.headers.get(Config.REQUEST_DEADLINE_HEADER)
+    try:
+        seconds = float(raw) if raw is not None else Config.REQUEST_DEADLINE_SECONDS
+    except ValueError:
+        seconds = Config.REQUEST_DEADLINE_SECONDS
+    if not math.isfinite(seconds) or seconds <= 0:
+        seconds = Config.REQUEST_DEADLINE_SECONDS
+    return min(seconds, Config.REQUEST_DEADLINE_MAX_SECONDS)
+
+
+def remaining():
+    """Seconds left in the current request's budget, or None when there is no deadline."""
+    if not has_request_context():
+        return None
+    deadline = g.get('_deadline')
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def expired():
+    left = remaining()
+    return left is not None and left <= MIN_CALL_SECONDS
+
+
+def upstream_timeout():
+    """Timeout for the next upstream call; raises DeadlineExceeded when the budget is spent."""
+    left = remaining()
+    if left is None:
+        return Config.UPSTREAM_TIMEOUT
+    if left <= MIN_CALL_SECONDS:
+        raise DeadlineExceeded()
+    return min(Config.UPSTREAM_TIMEOUT, left)
+
+
+def carry(fn):
+    """Wraps ``fn`` so that, run under a copied request context in another thread, it keeps this request's deadline."""
+    deadline = g.get('_deadline') if has_request_context() else None
+
+    def run(*args, **kwargs):
+        if deadline is not None:
+            g._deadline = deadline
+        return fn(*args, **kwargs)
+    return run
+
+
+def _before_request():
+    g._deadline = time.monotonic() + _budget()
+
+
+def _handle_deadline_exceeded(e):
+    current_app.logger.warning("Request deadline exceeded on %s", request.endpoint)
+    return jsonify({'error': 'The data provider did not answer within the request deadline, please retry'}), 504
+
+
+def init_app(app):
+    app.before_request(_before_request)
+    app.register_error_handler(DeadlineExceeded, _handle_deadline_exceeded)
@@ -0,0 +1,109 @@
+"""
+Sparse field selection for company responses (``?fields=`` and ``?years=``).
+
+``fields`` is a comma-separated list of section names (``company_info``,
+``year_wise_financials``, ``peer_percentiles``, ``data_quality``) and/or individual fields from those
+sections, e.g. ``fields=sector,revenue_usd,market_cap_usd&years=2``. Naming a
+field pulls in its section with only the named fields. The identifying keys
+(``search_query``, ``matched_company``, ``symbol``) and each row's ``year`` are
+always returned.
+"""
+
+SECTIONS = ('company_info', 'year_wise_financials', 'peer_percentiles', 'data_quality')
+INFO_FIELDS = ('name', 'symbol', 'exchange', 'sector', 'industry', 'country', 'website', 'description')
+FINANCIAL_FIELDS = ('employees', 'revenue_usd', 'profit_usd', 'share_capital_usd', 'market_cap_usd')
+
+# CompanyProfile columns each response field is built from
+_INFO_PROFILE_COLUMNS = {
+    'exchange': 'exchange', 'sector': 'sector', 'industry': 'industry',
+    'website': 'website', 'description': 'description',
+}
+_FINANCIAL_PROFILE_COLUMNS = {'employees': 'full_time_employees', 'market_cap_usd': 'market_cap_usd'}
+
+
+class FieldSelection:
+    """Parsed ``fields``/``years`` parameters; ``None`` is used instead when neither is given."""
+
+    def __init__(self, sections, info_fields, financial_fields, years=None):
+        self.sections = frozenset(sections)
+        self.info_fields = frozenset(info_fields)
+        self.financial_fields = frozenset(financial_fields)
+        self.years = years
+
+    @classmethod
+    def parse(cls, fields, years):
+        """Builds a selection from raw query parameters; raises ValueError on unknown names."""
+        if not fields and not years:
+            return None
+
+        if years:
+            try:
+                years = int(years)
+            except ValueError:
+                raise ValueError('years must be a positive integer') from None
+            if years < 1:
+                raise ValueError('years must be a positive integer')
+        else:
+            years = None
+
+        if not fields:
+            return cls(SECTIONS, INFO_FIELDS, FINANCIAL_FIELDS, years)
+
+        sections, info, financial = set(), set(), set()
+        for name in filter(None, (part.strip() for part in fields.split(','))):
+            if name == 'company_info':
+                sections.add(name)
+                info.update(INFO_FIELDS)
+            elif name == 'year_wise_financials':
+                sections.add(name)
+                financial.update(FINANCIAL_FIELDS)
+            elif name in ('peer_percentiles', 'data_quality'):
+                sections.add(name)
+            elif name in INFO_FIELDS:
+                sections.add('company_info')
+                info.add(name)
+            elif name in FINANCIAL_FIELDS:
+                sections.add('year_wise_financials')
+                financial.add(name)
+            else:
+                raise ValueError(f"Unknown field '{name}'. Valid fields: "
+                                 f"{', '.join(SECTIONS + INFO_FIELDS + FINANCIAL_FIELDS)}")
+        return cls(sections, info, financial, years)
+
+    @property
+    def wants_financials(self):
+        return 'year_wise_financials' in self.sections
+
+    @property
+    def wants_peers(self):
+        return 'peer_percentiles' in self.sections
+
+    def profile_columns(self):
+        """Names of the CompanyProfile columns needed to build the selected fields."""
+        columns = {'last_updated_ts', 'statements_due_ts'}
+        columns.update(_INFO_PROFILE_COLUMNS[f] for f in self.info_fields if f in _INFO_PROFILE_COLUMNS)
+        if self.wants_financials:
+            columns.update(_FINANCIAL_PROFILE_COLUMNS[f] for f in self.financial_fields
+                           if f in _FINANCIAL_PROFILE_COLUMNS)
+        if self.wants_peers:
+            columns.update(('sector', 'industry', 'market_cap_usd'))
+        return columns
+
+    def apply(self, result):
+        """Projects a full company response down to the selected sections, fields and years."""
+        projected = {key: result[key] for key in ('search_query', 'matched_company', 'symbol') if key in result}
+        if 'company_info' in self.sections:
+            projected['company_info'] = {k: v for k, v in result['company_info'].items() if k in self.info_fields}
+        if self.wants_financials:
+            rows = result['year_wise_financials']
+            if self.years:
+                rows = rows[:self.years]
+            projected['year_wise_financials'] = [
+                {'year': row['year'], **{k: v for k, v in row.items() if k in self.financial_fields}}
+                for row in rows
+            ]
+        if self.wants_peers:
+            projected['peer_percentiles'] = result.get('peer_percentiles')
+        if 'data_quality' in self.sections:
+            projected['data_quality'] = result['data_quality']
+        return projected
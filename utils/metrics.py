@@ -0,0 +1,216 @@
+"""
+Minimal in-process metrics registry rendered in the Prometheus text format.
+
+Each metric keeps a dict keyed by label-value tuples behind one lock, so an
+update is a dict lookup plus an addition. Values are per process; when running
+several gunicorn workers, scrape each worker or aggregate in Prometheus.
+"""
+import threading
+import time
+from bisect import bisect_left
+
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    pairs.extend(f'{n}="{v}"' for n, v in extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in list(self._metrics):
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+
+class _Metric:
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=(), registry=REGISTRY):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        registry.register(self)
+
+    def _header(self):
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        lines = self._header()
+        for labels, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, *labels, amount=1):
+        self.inc(*labels, amount=-amount)
+
+    def set(self, value, *labels):
+        with self._lock:
+            self._values[labels] = value
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS, registry=REGISTRY):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames, registry)
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(labels)
+            if state is None:
+                # Per-bucket (non-cumulative) counts, then sum and count.
+                state = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def render(self):
+        with self._lock:
+            items = sorted((labels, [list(s[0]), s[1], s[2]]) for labels, s in self._values.items())
+        lines = self._header()
+        for labels, (counts, total, count) in items:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                label_str = _format_labels(self.labelnames, labels, (('le', _format_value(bound)),))
+                lines.append(f"{self.name}_bucket{label_str} {cumulative}")
+            label_str = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{label_str} {_format_value(total)}")
+            lines.append(f"{self.name}_count{label_str} {count}")
+        return lines
+
+
+# --- Application metrics ---
+
+HTTP_REQUESTS = Counter('http_requests_total', 'HTTP requests handled.', ('endpoint', 'method', 'status'))
+HTTP_LATENCY = Histogram('http_request_duration_seconds', 'HTTP request latency.', ('endpoint',))
+HTTP_IN_FLIGHT = Gauge('http_requests_in_flight', 'HTTP requests currently being handled.', ('endpoint',))
+
+CACHE_LOOKUPS = Counter('cache_lookups_total', 'Cache lookups by cache layer, country and result (hit/miss/stale).',
+                        ('cache', 'country', 'result'))
+
+UPSTREAM_REQUESTS = Counter('upstream_requests_total', 'Calls to the upstream data provider.',
+                            ('country', 'endpoint', 'status'))
+UPSTREAM_LATENCY = Histogram('upstream_request_duration_seconds', 'Upstream data provider latency.',
+                             ('country', 'endpoint'))
+UPSTREAM_BATCH_SIZE = Histogram('upstream_batch_size', 'Symbols per batched upstream call.', ('endpoint',),
+                                buckets=(1, 2, 5, 10, 20, 50, 100))
+
+ADMISSION_REJECTED = Counter('admission_rejected_total',
+                             'Upstream-bound requests not admitted, by route and reason '
+                             '(queue_full, timeout or deadline).', ('route', 'reason'))
+ADMISSION_QUEUE_DEPTH = Gauge('admission_queue_depth', 'Requests waiting for an upstream slot, by route.', ('route',))
+
+RATE_LIMITED = Counter('rate_limited_total', 'Requests rejected with 429, by route and budget (request/miss).',
+                       ('route', 'budget'))
+
+SEARCH_FANOUT = Counter('search_fanout_total',
+                        'Per-provider outcomes of multi-country searches (ok/timeout/error/rejected).',
+                        ('country', 'result'))
+
+SEARCH_CACHE_WRITES = Counter('search_cache_writes_total', 'Write-behind search-cache rows (ok/dropped/overflow).',
+                              ('result',))
+
+JOBS_PENDING = Gauge('jobs_pending', 'Async company lookups queued or running.')
+
+DB_QUERY_LATENCY = Histogram('db_query_duration_seconds', 'Database statement execution time.', ('operation',),
+                             buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0))
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # Kept on the execution context, which is discarded with the statement, so a
+    # statement that raises leaves nothing behind on the pooled connection.
+    if context is not None:
+        context._query_start = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    start = getattr(context, '_query_start', None)
+    if start is None:
+        return
+    elapsed = time.perf_counter() - start
+    operation = statement.split(None, 1)[0].upper() if statement else ''
+    DB_QUERY_LATENCY.observe(elapsed, operation)
+
+
+def _before_request():
+    g._metrics_start = time.perf_counter()
+    g._metrics_endpoint = request.endpoint or 'unmatched'
+    HTTP_IN_FLIGHT.inc(g._metrics_endpoint)
+
+
+def _after_request(response):
+    start = g.get('_metrics_start')
+    if start is not None:
+        endpoint = g._metrics_endpoint
+        HTTP_LATENCY.observe(time.perf_counter() - start, endpoint)
+        HTTP_REQUESTS.inc(endpoint, request.method, str(response.status_code))
+    return response
+
+
+def _teardown_request(exc):
+    endpoint = g.pop('_metrics_endpoint', None)
+    if endpoint is not None:
+        HTTP_IN_FLIGHT.dec(endpoint)
+
+
+def init_app(app):
+    """Hooks request and database timing into the app."""
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)
+    if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
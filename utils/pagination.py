@@ -0,0 +1,29 @@
+import base64
+import json
+
+
+def encode_cursor(*values):
+    """Opaque, URL-safe cursor for the keyset position after ``values``."""
+    raw = json.dumps(values, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token, size):
+    """Returns the keyset values from a cursor, raising ValueError if it is malformed."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, UnicodeError) as e:
+        raise ValueError('Invalid cursor') from e
+    if not isinstance(values, list) or len(values) != size:
+        raise ValueError('Invalid cursor')
+    return values
+
+
+def page_limit(raw, default, maximum):
+    """Clamps a client-supplied page size."""
+    try:
+        limit = int(raw) if raw is not None else default
+    except ValueError:
+        limit = default
+    return max(1, min(limit, maximum))
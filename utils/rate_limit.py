@@ -0,0 +1,209 @@
+"""
+Per-client inbound rate limiting.
+
+Each client, identified by its ``RATE_LIMIT_KEY_HEADER`` (``X-API-Key``) value
+when that is one of ``RATE_LIMIT_API_KEYS``, or else its IP, has two token
+buckets per route:
+
+  request  charged for every request to the route
+  miss     charged once per request that has to call the upstream provider
+
+so cache hits are cheap against the budget while cold lookups are throttled
+much harder. Limits are ``count/seconds`` specs: ``RATE_LIMIT_DEFAULT`` /
+``RATE_LIMIT_MISS_DEFAULT``, overridable per endpoint with ``RATE_LIMITS`` /
+``RATE_LIMITS_MISS`` ("search.search_companies=30/60,company.get_company_metrics=60/60").
+Responses carry ``RateLimit-Limit`` / ``RateLimit-Remaining`` / ``RateLimit-Reset``;
+rejected ones are ``429`` with ``Retry-After``.
+
+Buckets live in process memory by default (a dict lookup under a lock). With
+``RATE_LIMIT_STORAGE=redis`` they are shared through ``CACHE_REDIS_URL`` as
+fixed windows of the bucket's period, failing open if Redis is unreachable.
+
+Unknown key values are ignored, so a client cannot get fresh buckets by sending
+a new key on every request. Behind a reverse proxy, set ``TRUSTED_PROXY_COUNT``
+so the IP is the client's rather than the proxy's.
+"""
+import hashlib
+import logging
+import math
+import threading
+import time
+from collections import namedtuple
+
+from flask import current_app, g, has_request_context, jsonify, request
+
+from config import Config
+from services.cache_backend import RedisCacheBackend, RedisError, make_key
+from utils.concurrency import request_state
+from utils.metrics import RATE_LIMITED
+
+logger = logging.getLogger(__name__)
+
+Decision = namedtuple('Decision', 'allowed limit remaining reset')
+
+# Blueprints that are never limited (scrapes and health checks)
+EXEMPT_BLUEPRINTS = ('metrics',)
+
+
+class RateLimited(Exception):
+    def __init__(self, decision):
+        super().__init__('rate limit exceeded')
+        self.decision = decision
+
+
+class MemoryTokenBuckets:
+    """Token buckets refilled continuously at ``limit / period`` tokens per second."""
+
+    SWEEP_EVERY = 10000
+
+    def __init__(self):
+        self._buckets = {}
+        self._lock = threading.Lock()
+        self._calls = 0
+
+    def consume(self, key, limit, period):
+        rate = limit / period
+        now = time.monotonic()
+        with self._lock:
+            tokens, last, _ = self._buckets.get(key, (limit, now, period))
+            tokens = min(limit, tokens + (now - last) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now, period)
+            self._calls += 1
+            if self._calls % self.SWEEP_EVERY == 0:
+                self._sweep(now)
+        # When rejected: seconds until the next token; otherwise until the bucket is full again
+        reset = (1 - tokens) / rate if not allowed else (limit - tokens) / rate
+        return Decision(allowed, limit, int(tokens), reset)
+
+    def _sweep(self, now):
+        # A bucket idle for a whole period has refilled and is no different from a new one.
+        self._buckets = {key: bucket for key, bucket in self._buckets.items() if now - bucket[1] < bucket[2]}
+
+
+class RedisWindowBuckets:
+    """Shared fixed-window counters: one pipelined INCR/EXPIRE round trip per check."""
+
+    def __init__(self, url, timeout):
+        self._redis = RedisCacheBackend(url, timeout=timeout)
+
+    def consume(self, key, limit, period):
+        now = time.time()
+        window = int(now // period)
+        redis_key = f"{key}:{window}"
+        try:
+            count, _ = self._redis.execute([['INCR', redis_key], ['EXPIRE', redis_key, math.ceil(period)]])
+        except (OSError, ConnectionError, RedisError) as e:
+            logger.warning("Rate limit storage unavailable, allowing request: %s", e)
+            return Decision(True, limit, limit, period)
+        return Decision(count <= limit, limit, max(0, limit - count), (window + 1) * period - now)
+
+
+def parse_limit(spec):
+    """``"120/60"`` -> ``(120, 60.0)``."""
+    count, _, period = spec.partition('/')
+    return int(count), float(period or 1)
+
+
+def _parse_route_limits(spec):
+    limits = {}
+    for item in filter(None, (part.strip() for part in spec.split(','))):
+        name, _, limit = item.partition('=')
+        limits[name.strip()] = parse_limit(limit.strip())
+    return limits
+
+
+_limits = {
+    'request': (_parse_route_limits(Config.RATE_LIMITS), parse_limit(Config.RATE_LIMIT_DEFAULT)),
+    'miss': (_parse_route_limits(Config.RATE_LIMITS_MISS), parse_limit(Config.RATE_LIMIT_MISS_DEFAULT)),
+}
+_storage = None
+# Configured API key -> its bucket id (a digest, so keys stay out of logs and Redis)
+_api_keys = {}
+
+
+def _client_id():
+    client = _api_keys.get(request.headers.get(Config.RATE_LIMIT_KEY_HEADER))
+    return client or request.remote_addr or 'unknown'
+
+
+def _consume(budget):
+    route = request.endpoint or 'unmatched'
+    per_route, default = _limits[budget]
+    limit, period = per_route.get(route, default)
+    decision = _storage.consume(make_key('ratelimit', budget, route, _client_id()), limit, period)
+    current = g.get('_rate_limit')
+    if current is None or decision.remaining < current.remaining or not decision.allowed:
+        g._rate_limit = decision
+    if not decision.allowed:
+        RATE_LIMITED.inc(route, budget)
+    return decision
+
+
+def _enabled():
+    return (_storage is not None and has_request_context()
+            and request.blueprint not in EXEMPT_BLUEPRINTS)
+
+
+def charge_miss():
+    """
+    Charges the current request's miss budget once, however many of its threads call
+    upstream; raises RateLimited when it is exhausted.
+    """
+    if not _enabled():
+        return
+    state = request_state()
+    with state.lock:
+        if getattr(state, 'miss_charged', False):
+            return
+        state.miss_charged = True
+    decision = _consume('miss')
+    if not decision.allowed:
+        raise RateLimited(decision)
+
+
+def _too_many_requests(decision):
+    response = jsonify({'error': 'Rate limit exceeded, please slow down'})
+    response.headers['Retry-After'] = str(max(1, math.ceil(decision.reset)))
+    return response, 429
+
+
+def _before_request():
+    if not _enabled():
+        return None
+    decision = _consume('request')
+    if not decision.allowed:
+        return _too_many_requests(decision)
+    return None
+
+
+def _after_request(response):
+    decision = g.get('_rate_limit')
+    if decision is not None:
+        response.headers['RateLimit-Limit'] = str(decision.limit)
+        response.headers['RateLimit-Remaining'] = str(decision.remaining)
+        response.headers['RateLimit-Reset'] = str(max(0, math.ceil(decision.reset)))
+    return response
+
+
+def _handle_rate_limited(e):
+    current_app.logger.info("Rate limited %s on %s", _client_id(), request.endpoint)
+    return _too_many_requests(e.decision)
+
+
+def init_app(app):
+    """Installs the per-request check and headers when ``RATE_LIMIT_ENABLED`` is on."""
+    global _storage, _api_keys
+    if not app.config['RATE_LIMIT_ENABLED']:
+        return
+    _api_keys = {key: 'key:' + hashlib.sha256(key.encode()).hexdigest()[:16]
+                 for key in app.config['RATE_LIMIT_API_KEYS']}
+    if app.config['RATE_LIMIT_STORAGE'] == 'redis':
+        _storage = RedisWindowBuckets(app.config['CACHE_REDIS_URL'], app.config['CACHE_REDIS_TIMEOUT'])
+    else:
+        _storage = MemoryTokenBuckets()
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.register_error_handler(RateLimited, _handle_rate_limited)
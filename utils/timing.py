@@ -0,0 +1,125 @@
+"""
+Per-request span timings and on-demand profiling.
+
+``span(name)`` records how long a block took on the current request; the
+totals are sent back in a ``Server-Timing`` header and, for debug requests,
+inside the JSON body. Outside a request (CLI, benchmarks) spans are no-ops.
+
+Only one request per process is profiled at a time. cProfile hooks the whole
+interpreter, so a request picked for profiling while another one is being
+profiled runs without a profiler.
+"""
+import cProfile
+import json
+import os
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from flask import current_app, g, has_request_context, request
+
+# Held by the request being profiled
+_profile_lock = threading.Lock()
+
+
+@contextmanager
+def span(name):
+    if not has_request_context():
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        spans = g.get('_timing_spans')
+        if spans is None:
+            spans = g._timing_spans = {}
+        total, count = spans.get(name, (0.0, 0))
+        spans[name] = (total + elapsed, count + 1)
+
+
+def _summary():
+    spans = g.get('_timing_spans') or {}
+    summary = [(name, total * 1000, count) for name, (total, count) in spans.items()]
+    start = g.get('_timing_start')
+    if start is not None:
+        summary.append(('total', (time.perf_counter() - start) * 1000, 1))
+    return summary
+
+
+def _server_timing_header(summary):
+    entries = []
+    for name, dur_ms, count in summary:
+        entry = f"{name};dur={dur_ms:.2f}"
+        if count > 1:
+            entry += f';desc="{count} calls"'
+        entries.append(entry)
+    return ', '.join(entries)
+
+
+def _wants_debug_timing():
+    return current_app.config['TIMING_DEBUG_ENABLED'] and (
+        request.args.get('debug') == 'timing' or request.headers.get('X-Debug-Timing') == '1'
+    )
+
+
+def _should_profile(config):
+    if not config['PROFILING_ENABLED']:
+        return False
+    token = config['PROFILING_TOKEN']
+    if token and request.headers.get('X-Profile-Token') == token:
+        return True
+    return config['PROFILE_SAMPLE_RATE'] > 0 and random.random() < config['PROFILE_SAMPLE_RATE']
+
+
+def _before_request():
+    g._timing_start = time.perf_counter()
+    if _should_profile(current_app.config) and _profile_lock.acquire(blocking=False):
+        profiler = cProfile.Profile()
+        g._profiler = profiler
+        profiler.enable()
+
+
+def _stop_profiler():
+    """Stops this request's profiler, if it has one, and frees the profiling slot; returns the profiler."""
+    profiler = g.pop('_profiler', None)
+    if profiler is not None:
+        try:
+            profiler.disable()
+        finally:
+            _profile_lock.release()
+    return profiler
+
+
+def _after_request(response):
+    profiler = _stop_profiler()
+    if profiler is not None:
+        profile_dir = current_app.config['PROFILE_DIR']
+        os.makedirs(profile_dir, exist_ok=True)
+        filename = f"{int(time.time())}-{request.endpoint or 'unmatched'}-{uuid.uuid4().hex[:8]}.prof"
+        profiler.dump_stats(os.path.join(profile_dir, filename))
+        response.headers['X-Profile-File'] = filename
+
+    summary = _summary()
+    response.headers['Server-Timing'] = _server_timing_header(summary)
+
+    if response.is_json and _wants_debug_timing():
+        body = response.get_json(silent=True)
+        if isinstance(body, dict):
+            body['_timing'] = {name: {'ms': round(dur_ms, 3), 'count': count} for name, dur_ms, count in summary}
+            response.set_data(json.dumps(body))
+    return response
+
+
+def _teardown_request(exc):
+    _stop_profiler()
+
+
+def init_app(app):
+    """Adds Server-Timing headers to every response and enables guarded profiling."""
+    app.before_request(_before_request)
+    app.after_request(_after_request)
+    app.teardown_request(_teardown_request)